@@ -0,0 +1,188 @@
+from typing import List, Tuple, Optional, Union
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from topsis import METRICS, topsis_cache, topsis_scores
+from rsm import rsm
+from sp_cs import sp_cs
+from export import HIGHER_IS_BETTER
+
+Number = Union[float, int]
+Agreement = Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]  # (nazwy wariantów, tau-b, rho, pokrycie top-k)
+
+TOP_K = 10  # liczba najlepszych elementów porównywanych miarą pokrycia
+
+_worker = {}  # stan procesu roboczego (rangi wszystkich wariantów)
+
+
+def variant_keys(D: List[List[Number]], W_max: List[bool], W: Optional[List[Number]] = None,
+                 methods: Tuple[str, ...] = ("TOPSIS", "RSM", "SP-CS"), metrics: Tuple[str, ...] = METRICS,
+                 seed: int = 0) -> Tuple[List[str], np.ndarray]:
+    """
+    Rankingi wszystkich wariantów metoda x metryka w jednej postaci: wyższa wartość oznacza lepszą pozycję
+    :param D: (List[List[Number]]) : macierz decyzyjna D[n x m]
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów
+    :param W: (List[Number]) : wektor wag (tylko TOPSIS, domyślnie równe)
+    :param methods: (Tuple[str, ...]) : porównywane metody
+    :param metrics: (Tuple[str, ...]) : porównywane metryki
+    :param seed: (int) : ziarno losowania punktów metody SP-CS
+    :return: (Tuple[List[str], np.ndarray]) : nazwy wariantów, klucze rankingów [warianty x m]
+    """
+    D = np.asarray(D, dtype=float)
+    if W is None:
+        W = [1.0 for _ in range(D.shape[0])]
+    names, keys = [], []
+    for method in methods:
+        if method not in ("TOPSIS", "RSM", "SP-CS"):  # metody zależne od metryki
+            raise ValueError("Nieznana metoda: {}".format(method))
+        for metric in metrics:
+            if method == "TOPSIS":
+                score = topsis_scores(topsis_cache(D, W_max, metric), W)[0]
+            elif method == "RSM":
+                score = np.asarray(rsm(D, W_max, metric)[0], dtype=float)
+            else:
+                random.seed(seed)  # te same losowe punkty odniesienia dla każdej metryki
+                score = np.asarray(sp_cs(D, W_max, metric)[0], dtype=float)
+            key = score if HIGHER_IS_BETTER[method] else -score
+            names.append('{} / {}'.format(method, metric))
+            keys.append(np.nan_to_num(key, nan=-np.inf))  # brak współczynnika - najgorsza pozycja
+    return names, np.vstack(keys)
+
+
+def dense_ranks(key: np.ndarray) -> np.ndarray:
+    """
+    Rangi gęste: równe wartości dostają tę samą rangę, kolejne wartości kolejne liczby od 0
+    :param key: (np.ndarray) : wektor wartości
+    :return: (np.ndarray) : wektor rang
+    """
+    return np.unique(key, return_inverse=True)[1].reshape(-1).astype(np.int64)
+
+
+def _tie_pairs(counts: np.ndarray) -> int:
+    """
+    Liczba par elementów w grupach równych wartości
+    :param counts: (np.ndarray) : liczebności grup
+    """
+    counts = counts.astype(np.int64)
+    return int((counts * (counts - 1) // 2).sum())
+
+
+def count_inversions(y: np.ndarray) -> int:
+    """
+    Liczba par i < j z y[i] > y[j] liczona sortowaniem przez scalanie: na każdym poziomie wszystkie pary sąsiednich
+    bloków są scalane naraz. Najmłodszy bit klucza oznacza prawą połowę, więc przy remisach lewa połowa jest pierwsza,
+    a liczba większych elementów lewej połowy przed elementem prawej wynika z jego pozycji w scalonym bloku
+    :param y: (np.ndarray) : wektor rang (liczby całkowite nieujemne)
+    :return: (int) : liczba inwersji
+    """
+    m = len(y)
+    if m < 2:
+        return 0
+    size = 1 << (m - 1).bit_length()
+    a = np.full(size, int(y.max()) + 1, dtype=np.int64)  # dopełnienie największą wartością na końcu nie tworzy inwersji
+    a[:m] = y
+    swaps = 0
+    width = 1
+    while width < size:
+        rows = a.reshape(-1, 2 * width) << 1
+        rows[:, width:] |= 1
+        rows.sort(axis=1)  # scalenie posortowanych połówek
+        # element j prawej połowy na pozycji p ma przed sobą p - j elementów lewej, pozostałe są od niego większe
+        right_positions = int(np.count_nonzero(rows & 1, axis=0) @ np.arange(2 * width))
+        swaps += rows.shape[0] * width * (3 * width - 1) // 2 - right_positions
+        a = (rows >> 1).ravel()
+        width *= 2
+    return swaps
+
+
+def kendall_tau_b(x: np.ndarray, y: np.ndarray) -> float:
+    """
+    Współczynnik tau-b Kendalla w czasie O(m log m) (algorytm Knighta): elementy są sortowane po x (remisy po y),
+    a pary niezgodne to inwersje w tak ułożonym y
+    :param x: (np.ndarray) : rangi gęste pierwszego rankingu
+    :param y: (np.ndarray) : rangi gęste drugiego rankingu
+    :return: (float) : tau-b (NaN, gdy jeden z rankingów jest stały)
+    """
+    m = len(x)
+    order = np.argsort(x * (int(y.max(initial=0)) + 1) + y)
+    xs, ys = x[order], y[order]
+    n0 = m * (m - 1) // 2
+    n1 = _tie_pairs(np.bincount(x))
+    n2 = _tie_pairs(np.bincount(y))
+    boundaries = np.flatnonzero((xs[1:] != xs[:-1]) | (ys[1:] != ys[:-1]))
+    n3 = _tie_pairs(np.diff(np.concatenate(([0], boundaries + 1, [m]))))  # remisy w obu rankingach
+    swaps = count_inversions(ys)
+    denominator = np.sqrt(float(n0 - n1) * float(n0 - n2))
+    if denominator == 0:
+        return float('nan')
+    return float(n0 - n1 - n2 + n3 - 2 * swaps) / denominator
+
+
+def average_ranks(ranks: np.ndarray) -> np.ndarray:
+    """
+    Rangi średnie (remisy dostają średnią z zajmowanych pozycji) z rang gęstych
+    :param ranks: (np.ndarray) : rangi gęste
+    :return: (np.ndarray) : rangi średnie od 1
+    """
+    counts = np.bincount(ranks)
+    ends = np.cumsum(counts)
+    return ((ends - counts + 1 + ends) / 2.0)[ranks]
+
+
+def _init_worker(ranks: np.ndarray) -> None:
+    _worker['ranks'] = ranks
+
+
+def _kendall_pair(pair: Tuple[int, int]) -> float:
+    ranks = _worker['ranks']
+    return kendall_tau_b(ranks[pair[0]], ranks[pair[1]])
+
+
+def rank_agreement(names: List[str], keys: np.ndarray, top_k: int = TOP_K,
+                   workers: Optional[int] = None) -> Agreement:
+    """
+    Zgodność każdej pary rankingów: tau-b Kendalla, rho Spearmana i pokrycie najlepszych elementów. Pary dla tau-b
+    są liczone równolegle
+    :param names: (List[str]) : nazwy wariantów
+    :param keys: (np.ndarray) : klucze rankingów [warianty x m] (wyższa wartość - lepsza pozycja)
+    :param top_k: (int) : liczba najlepszych elementów dla miary pokrycia
+    :param workers: (int) : liczba procesów (domyślnie liczba rdzeni)
+    :return: (Agreement) : nazwy wariantów, macierze tau-b, rho i pokrycia top-k
+    """
+    keys = np.asarray(keys, dtype=float)
+    v, m = keys.shape
+    ranks = np.vstack([dense_ranks(key) for key in keys])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rho = np.atleast_2d(np.corrcoef(np.vstack([average_ranks(r) for r in ranks])))
+
+    k = min(top_k, m)
+    top = [set(np.argpartition(-key, k - 1)[:k].tolist()) if 0 < k < m else set(range(m)) for key in keys]
+    overlap = np.array([[len(a & b) / max(k, 1) for b in top] for a in top])
+
+    tau = np.eye(v)
+    pairs = [(i, j) for i in range(v) for j in range(i + 1, v)]
+    if pairs:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(ranks,)) as executor:
+            for (i, j), value in zip(pairs, executor.map(_kendall_pair, pairs)):
+                tau[i, j] = tau[j, i] = value
+    return names, tau, rho, overlap
+
+
+def agreement_report(agreement: Agreement, limit: int = 10) -> str:
+    """
+    Opis najmniej zgodnych par rankingów
+    :param agreement: (Agreement) : wynik funkcji rank_agreement
+    :param limit: (int) : liczba opisanych par
+    :return: (str) : raport tekstowy
+    """
+    names, tau, rho, overlap = agreement
+    pairs = [(i, j) for i in range(len(names)) for j in range(i + 1, len(names))]
+    pairs.sort(key=lambda pair: np.nan_to_num(tau[pair], nan=np.inf))
+    report = ''
+    for i, j in pairs[:limit]:
+        report += '{} | {} : tau-b {:.3f}, rho {:.3f}, top-k {:.0%}\n'.format(names[i], names[j], tau[i, j],
+                                                                             rho[i, j], overlap[i, j])
+    return report
@@ -0,0 +1,175 @@
+from typing import List, Tuple, Optional, Dict, Callable
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from itertools import combinations
+import hashlib
+import io
+import multiprocessing
+import threading
+import numpy as np
+
+Panel = Tuple[int, ...]  # indeksy kryteriów na wykresie (para albo trójka dla widoku 3D)
+
+LEGEND_LIMIT = 20  # powyżej tej liczby elementów nie są podpisywane w legendzie
+CACHE_LIMIT = 256  # liczba zapamiętanych wykresów
+TITLES = {"TOPSIS": "Parametry mieszkań na tle punktów idealnych metody TOPSIS",
+          "RSM": "Wykres elementów dla metody RSM"}
+
+
+def fingerprint(*parts) -> str:
+    """
+    Skrót danych do rozpoznawania zapamiętanych wykresów
+    :param parts: tablice, listy i napisy opisujące dane lub wynik
+    :return: (str) : skrót sha1
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, str):
+            digest.update(part.encode('utf-8'))
+        elif isinstance(part, (list, tuple)) and part and isinstance(part[0], str):
+            digest.update('\x00'.join(part).encode('utf-8'))
+        else:
+            array = np.ascontiguousarray(np.asarray(part, dtype=float))
+            digest.update(str(array.shape).encode('ascii'))
+            digest.update(array.tobytes())
+        digest.update(b'\x01')
+    return digest.hexdigest()
+
+
+def render_panel(points: np.ndarray, references: List[Tuple[str, np.ndarray]], labels: List[str],
+                 axis_names: List[str], title: str) -> bytes:
+    """
+    Narysowanie jednego wykresu poza gui (backend Agg) i zapis do PNG. Funkcja jest wywoływana w procesach
+    roboczych
+    :param points: (np.ndarray) : współrzędne elementów [2 lub 3 x m]
+    :param references: (List[Tuple[str, np.ndarray]]) : punkty odniesienia (etykieta, współrzędne)
+    :param labels: (List[str]) : nazwy elementów (puste, gdy elementów jest za dużo na legendę)
+    :param axis_names: (List[str]) : nazwy kryteriów na osiach
+    :param title: (str) : tytuł wykresu
+    :return: (bytes) : obraz PNG
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = Figure(figsize=(6.4, 4.8), dpi=100)
+    FigureCanvasAgg(figure)
+    three_d = len(points) == 3
+    ax = figure.add_subplot(111, projection='3d') if three_d else figure.add_subplot()
+    if labels:
+        for i, label in enumerate(labels):
+            ax.scatter(*points[:, i], label=label)
+    else:
+        ax.scatter(*points, s=4, alpha=0.5, label="Elementy")  # jedno wywołanie dla wszystkich elementów
+    for label, point in references:
+        ax.scatter(*point, marker="s", label=label)
+    if three_d:
+        ax.set(xlabel=axis_names[0], ylabel=axis_names[1], zlabel=axis_names[2], title=title)
+        ax.legend(prop={'size': 5})
+    else:
+        ax.set(xlabel=axis_names[0], ylabel=axis_names[1], title=title)
+        ax.legend(prop={'size': 7})
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def panels(method: str, n: int) -> List[Panel]:
+    """
+    Lista wykresów dla metody: wszystkie pary kryteriów i widok 3D metody RSM dla 3 kryteriów
+    :param method: (str) : nazwa metody
+    :param n: (int) : liczba kryteriów
+    :return: (List[Panel]) : indeksy kryteriów kolejnych wykresów
+    """
+    result = list(combinations(range(n), 2))
+    if method == "RSM" and n == 3:
+        result.append((0, 1, 2))
+    return result
+
+
+class ChartRenderer:
+    """
+    Renderowanie wykresów wszystkich par kryteriów w procesach roboczych. Gotowe obrazy są zapamiętywane według
+    skrótu danych i wyniku, więc ponowne przeglądanie par nie wymaga rysowania
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        :param workers: (int) : liczba procesów (domyślnie liczba rdzeni)
+        """
+        self.workers = workers
+        self.executor = None
+        self.cache = OrderedDict()  # klucz -> obraz PNG
+        self.pending = {}  # klucz -> zadanie w toku
+        self.lock = threading.Lock()  # _store działa w wątku zwrotnym puli, a get i render_all w wątku gui
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:  # procesy bez kopii gui (spawn zamiast fork)
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Zapamiętany obraz
+        :param key: (str) : klucz wykresu
+        :return: (Optional[bytes]) : obraz PNG albo None
+        """
+        with self.lock:
+            image = self.cache.get(key)
+            if image is not None:
+                self.cache.move_to_end(key)
+        return image
+
+    def _store(self, key: str, future: Future, callback: Optional[Callable[[str], None]]) -> None:
+        with self.lock:
+            self.pending.pop(key, None)
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                if isinstance(future.exception(), BrokenProcessPool):
+                    self.executor = None  # następne zlecenie uruchomi nowe procesy
+                return
+            self.cache[key] = future.result()
+            while len(self.cache) > CACHE_LIMIT:
+                self.cache.popitem(last=False)  # usunięcie najdawniej używanego
+        if callback is not None:
+            callback(key)
+
+    def render_all(self, method: str, N: List[List[float]], references: List[Tuple[str, List[float]]],
+                   items_names: List[str], c_names: List[str], key_prefix: str,
+                   callback: Optional[Callable[[str], None]] = None) -> Dict[str, Panel]:
+        """
+        Zlecenie narysowania wszystkich wykresów, których nie ma w pamięci
+        :param method: (str) : nazwa metody
+        :param N: (List[List[float]]) : współrzędne elementów [n x m]
+        :param references: (List[Tuple[str, List[float]]]) : punkty odniesienia (etykieta, współrzędne)
+        :param items_names: (List[str]) : lista nazw elementów
+        :param c_names: (List[str]) : lista nazw kryteriów
+        :param key_prefix: (str) : skrót danych i wyniku
+        :param callback: (Callable[[str], None]) : funkcja wywoływana z kluczem gotowego wykresu (z innego wątku)
+        :return: (Dict[str, Panel]) : klucze wykresów i odpowiadające im indeksy kryteriów
+        """
+        N = np.asarray(N, dtype=float)
+        labels = list(items_names) if len(items_names) <= LEGEND_LIMIT else []
+        keys = {}
+        for panel in panels(method, len(c_names)):
+            key = key_prefix + ':' + '-'.join(str(j) for j in panel)
+            keys[key] = panel
+            idx = list(panel)
+            panel_references = [(label, np.asarray(point, dtype=float)[idx]) for label, point in references]
+            with self.lock:
+                if key in self.cache or key in self.pending:
+                    continue
+                future = self._executor().submit(render_panel, N[idx], panel_references, labels,
+                                                 [c_names[j] for j in idx], TITLES.get(method, ''))
+                self.pending[key] = future
+            # poza blokadą: gotowe zadanie wywołuje _store od razu w tym wątku
+            future.add_done_callback(lambda f, k=key: self._store(k, f, callback))
+        return keys
+
+    def shutdown(self) -> None:
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,217 @@
+from typing import List, Tuple, Optional, Union, Dict
+import ast
+import re
+import numpy as np
+from data_source import DataSource, Filter, open_source
+
+Number = Union[float, int]
+
+COMPARE_OPS = {ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>=', ast.Eq: '=', ast.NotEq: '!='}
+MIRRORED_OPS = {'<': '>', '<=': '>=', '>': '<', '>=': '<=', '=': '=', '!=': '!='}  # zamiana stron porównania
+BIN_OPS = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}
+CRITERION_ALIAS = re.compile(r'^k(\d+)$')  # skrót kN = Kryterium N
+
+
+class Constraints:
+    """
+    Twarde ograniczenia na kryteria. Proste ograniczenia postaci `kryterium` op liczba są przekazywane do źródła
+    danych jako filtry, a pozostałe wyrażenia są liczone na kolumnach macierzy jako maski logiczne
+    """
+
+    def __init__(self, expressions: Optional[List[str]] = None,
+                 bounds: Optional[List[Tuple[str, Optional[Number], Optional[Number]]]] = None):
+        """
+        :param expressions: (List[str]) : wyrażenia logiczne, np. "`Cena za metr kwadratowy` <= 90 and k4 < 5"
+        :param bounds: (List[Tuple[str, Number, Number]]) : ograniczenia (kryterium, dolna, górna), None - brak granicy
+        """
+        self.expressions = [e.strip() for e in (expressions or []) if e.strip()]
+        self.bounds = list(bounds or [])
+
+    @classmethod
+    def parse(cls, text: str) -> 'Constraints':
+        """
+        Utworzenie ograniczeń z tekstu podanego w gui (wyrażenia oddzielone średnikiem)
+        :param text: (str) : tekst z ograniczeniami
+        :return: (Constraints) : ograniczenia
+        """
+        return cls(text.split(';'))
+
+    def __bool__(self) -> bool:
+        return bool(self.expressions or self.bounds)
+
+    def split(self, all_names: List[str]) -> Tuple[List[Filter], List[ast.AST], Dict[str, str]]:
+        """
+        Podział ograniczeń na filtry dla źródła danych i wyrażenia liczone na macierzy
+        :param all_names: (List[str]) : nazwy wszystkich kryteriów ze źródła
+        :return: (Tuple[List[Filter], List[ast.AST], Dict[str, str]]) : filtry, drzewa wyrażeń,
+        słownik nazw zastępczych kolumn
+        """
+        filters = []
+        for name, low, high in self.bounds:
+            if low is not None:
+                filters.append((name, '>=', low))
+            if high is not None:
+                filters.append((name, '<=', high))
+
+        trees = []
+        names = {}  # nazwa zastępcza -> nazwa kryterium
+        for expression in self.expressions:
+            used = {}
+            tree = _parse(expression, all_names, used)
+            simple = _as_filter(tree, used)
+            if simple is not None:
+                filters.append(simple)  # wykonane przez źródło danych
+            else:
+                trees.append(tree)
+                names.update(used)
+        return filters, trees, names
+
+
+def _parse(expression: str, all_names: List[str], names: Dict[str, str]) -> ast.AST:
+    """
+    Zamiana nazw kryteriów na identyfikatory i sprawdzenie składni wyrażenia
+    :param expression: (str) : wyrażenie z nazwami w `` albo skrótami kN
+    :param all_names: (List[str]) : nazwy wszystkich kryteriów ze źródła
+    :param names: (Dict[str, str]) : słownik nazw zastępczych uzupełniany w trakcie
+    :return: (ast.AST) : drzewo wyrażenia
+    """
+    def replace(match):
+        name = match.group(1)
+        if name not in all_names:
+            raise ValueError("Nieznane kryterium: {}".format(name))
+        key = '_c{}'.format(all_names.index(name))
+        names[key] = name
+        return key
+
+    code = re.sub(r'`([^`]*)`', replace, expression)
+    try:
+        tree = ast.parse(code, mode='eval').body
+    except SyntaxError:
+        raise ValueError("Niepoprawne wyrażenie: {}".format(expression))
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            alias = CRITERION_ALIAS.match(node.id)
+            if alias is not None and 1 <= int(alias.group(1)) <= len(all_names):
+                names[node.id] = all_names[int(alias.group(1)) - 1]
+            elif node.id not in names:
+                raise ValueError("Nieznane kryterium: {}".format(node.id))
+        elif isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError("Niedozwolona stała w wyrażeniu: {}".format(expression))
+        elif not isinstance(node, (ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.Compare,
+                                   ast.BinOp, ast.Constant, ast.Load) + tuple(COMPARE_OPS) + tuple(BIN_OPS)):
+            raise ValueError("Niedozwolona operacja w wyrażeniu: {}".format(expression))
+    return tree
+
+
+def _as_filter(tree: ast.AST, names: Dict[str, str]) -> Optional[Filter]:
+    """
+    Rozpoznanie ograniczenia postaci kryterium op liczba, które można wykonać w źródle danych
+    :param tree: (ast.AST) : drzewo wyrażenia
+    :param names: (Dict[str, str]) : słownik nazw zastępczych
+    :return: (Optional[Filter]) : filtr albo None, gdy wyrażenie jest złożone
+    """
+    if not isinstance(tree, ast.Compare) or len(tree.ops) != 1:
+        return None
+    left, right, op = tree.left, tree.comparators[0], COMPARE_OPS[type(tree.ops[0])]
+    if isinstance(left, ast.Name) and isinstance(right, ast.Constant):
+        return names[left.id], op, right.value
+    if isinstance(left, ast.Constant) and isinstance(right, ast.Name):
+        return names[right.id], MIRRORED_OPS[op], left.value
+    return None
+
+
+def _evaluate(node: ast.AST, columns: Dict[str, np.ndarray]):
+    """
+    Wektorowe wyliczenie wyrażenia na kolumnach macierzy
+    :param node: (ast.AST) : węzeł drzewa wyrażenia
+    :param columns: (Dict[str, np.ndarray]) : kolumny kryteriów pod nazwami zastępczymi
+    :return: wartość lub maska logiczna dla wszystkich elementów
+    """
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        return columns[node.id]
+    if isinstance(node, ast.BinOp):
+        return BIN_OPS[type(node.op)](_evaluate(node.left, columns), _evaluate(node.right, columns))
+    if isinstance(node, ast.UnaryOp):
+        value = _evaluate(node.operand, columns)
+        return np.logical_not(value) if isinstance(node.op, ast.Not) else np.negative(value)
+    if isinstance(node, ast.BoolOp):
+        values = [_evaluate(v, columns) for v in node.values]
+        if isinstance(node.op, ast.And):
+            return np.logical_and.reduce(values)
+        return np.logical_or.reduce(values)
+    # porównanie łańcuchowe, np. 40 <= `Metraż` <= 60
+    left = _evaluate(node.left, columns)
+    mask = True
+    for op, comparator in zip(node.ops, node.comparators):
+        right = _evaluate(comparator, columns)
+        if isinstance(op, ast.Lt):
+            mask = mask & (left < right)
+        elif isinstance(op, ast.LtE):
+            mask = mask & (left <= right)
+        elif isinstance(op, ast.Gt):
+            mask = mask & (left > right)
+        elif isinstance(op, ast.GtE):
+            mask = mask & (left >= right)
+        elif isinstance(op, ast.Eq):
+            mask = mask & (left == right)
+        else:
+            mask = mask & (left != right)
+        left = right
+    return mask
+
+
+def screen(D: np.ndarray, c_names: List[str], trees: List[ast.AST], names: Dict[str, str]) -> np.ndarray:
+    """
+    Maska elementów spełniających wszystkie wyrażenia
+    :param D: (np.ndarray) : macierz decyzyjna D[n x m]
+    :param c_names: (List[str]) : nazwy kryteriów w wierszach macierzy D
+    :param trees: (List[ast.AST]) : drzewa wyrażeń
+    :param names: (Dict[str, str]) : słownik nazw zastępczych
+    :return: (np.ndarray) : maska logiczna długości m
+    """
+    columns = {key: D[c_names.index(name)] for key, name in names.items()}
+    mask = np.ones(D.shape[1], dtype=bool)
+    for tree in trees:
+        mask &= np.broadcast_to(np.asarray(_evaluate(tree, columns), dtype=bool), mask.shape)
+    return mask
+
+
+def load_screened(file_name: Union[str, DataSource], criteria: List[int], filters: Optional[List[Filter]] = None,
+                  constraints: Optional[Constraints] = None) \
+        -> Tuple[np.ndarray, List[str], List[str], List[float], List[bool]]:
+    """
+    Wczytanie macierzy decyzyjnej z odrzuceniem elementów poza twardymi ograniczeniami, zanim trafią do
+    normalizacji i liczenia odległości
+    :param file_name: (Union[str, DataSource]) : nazwa pliku albo źródło danych
+    :param criteria: (List[int]) : lista wybranych kryteriów (numeracja od 1)
+    :param filters: (List[Filter]) : dodatkowe filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia
+    :return: (Tuple[np.ndarray, List[str], List[str], List[float], List[bool]]) : macierz decyzyjna D[n x m],
+    lista nazw kryteriów, lista nazw elementów, wektor wag i wektor maksymalizacji wybranych kryteriów
+    """
+    source = open_source(file_name)
+    if not constraints:
+        return source.load(criteria, filters)
+
+    all_names = source.criteria_names()
+    pushed, trees, names = constraints.split(all_names)
+    criteria = sorted(criteria)
+    extra = sorted(set(all_names.index(name) + 1 for name in names.values()) - set(criteria))
+    D, c_names, items_names, W, W_max = source.load(criteria + extra, list(filters or []) + pushed)
+    if trees:
+        mask = screen(D, c_names, trees, names)
+        D = D[:, mask]
+        items_names = [name for name, keep in zip(items_names, mask) if keep]
+    if not items_names:
+        raise ValueError("Żaden element nie spełnia ograniczeń")
+
+    if extra:  # kolumny potrzebne tylko do ograniczeń nie wchodzą do rankingu
+        keep = [idx for idx, k in enumerate(sorted(criteria + extra)) if k in criteria]
+        D = D[keep]
+        c_names = [c_names[idx] for idx in keep]
+        W = [W[idx] for idx in keep if idx < len(W)]
+        W_max = [W_max[idx] for idx in keep if idx < len(W_max)]
+    return D, c_names, items_names, W, W_max
@@ -0,0 +1,348 @@
+from typing import List, Tuple, Optional, Union, Iterator, Sequence
+import os
+import sqlite3
+from contextlib import closing
+import numpy as np
+import pandas as pd
+
+Number = Union[float, int]
+Filter = Tuple[str, str, Number]  # (nazwa kolumny, operator, wartość)
+
+SKIPPED_COLUMNS = ('Lp.', 'Nazwa')  # kolumny, które nie są kryteriami
+META_COLUMNS = ('Wagi', 'Maksymalizacja')  # kolumny opisujące kryteria (po jednym wierszu na kryterium)
+OPERATORS = ('<', '<=', '>', '>=', '=', '!=')  # operatory dozwolone w filtrach
+BATCH_SIZE = 50000  # domyślna liczba wierszy w jednej paczce
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+
+class DataSource:
+    """
+    Bazowe źródło danych dla metod rankingowych. Źródło zwraca tylko kolumny wybranych kryteriów i nazwy
+    elementów, a wiersze dostarcza paczkami
+    """
+
+    def criteria_names(self) -> List[str]:
+        """
+        Nazwy wszystkich kryteriów w kolejności ze źródła
+        :return: (List[str]) : lista nazw kryteriów
+        """
+        raise NotImplementedError
+
+    def criteria_meta(self) -> Tuple[List[float], List[bool]]:
+        """
+        Wagi i wektor maksymalizacji dla wszystkich kryteriów ze źródła
+        :return: (Tuple[List[float], List[bool]]) : wektor wag, wektor maksymalizacji
+        """
+        raise NotImplementedError
+
+    def iter_batches(self, columns: Sequence[str], filters: Optional[List[Filter]] = None,
+                     batch_size: int = BATCH_SIZE) -> Iterator[Tuple[List[str], np.ndarray]]:
+        """
+        Strumieniowe pobieranie wierszy spełniających filtry
+        :param columns: (Sequence[str]) : nazwy pobieranych kolumn kryteriów
+        :param filters: (List[Filter]) : lista filtrów (kolumna, operator, wartość)
+        :param batch_size: (int) : liczba wierszy w paczce
+        :return: (Iterator[Tuple[List[str], np.ndarray]]) : paczki nazw elementów i macierzy [len(columns) x b]
+        """
+        raise NotImplementedError
+
+    def count(self, filters: Optional[List[Filter]] = None) -> int:
+        """
+        Liczba wierszy spełniających filtry
+        :param filters: (List[Filter]) : lista filtrów (kolumna, operator, wartość)
+        :return: (int) : liczba elementów
+        """
+        return sum(len(names) for names, _ in self.iter_batches([], filters))
+
+    def multiplicity(self, items_names: List[str]) -> np.ndarray:
+        """
+        Liczba elementów źródła reprezentowanych przez każdy z elementów (większa od 1 tylko po scaleniu elementów)
+        :param items_names: (List[str]) : nazwy elementów zwrócone przez źródło
+        :return: (np.ndarray) : wektor liczebności
+        """
+        return np.ones(len(items_names))
+
+    def sample(self, columns: Sequence[str], size: int, filters: Optional[List[Filter]] = None,
+               seed: int = 0) -> Tuple[List[str], np.ndarray]:
+        """
+        Losowa próbka wierszy spełniających filtry
+        :param columns: (Sequence[str]) : nazwy pobieranych kolumn kryteriów
+        :param size: (int) : liczba wierszy w próbce (najwyżej)
+        :param filters: (List[Filter]) : lista filtrów (kolumna, operator, wartość)
+        :param seed: (int) : ziarno losowania
+        :return: (Tuple[List[str], np.ndarray]) : nazwy elementów i macierz [len(columns) x size]
+        """
+        rng = np.random.default_rng(seed)
+        names, values, keys = [], np.empty((len(columns), 0)), np.empty(0)
+        for batch_names, batch in self.iter_batches(columns, filters):  # próbka z rezerwuaru po paczkach
+            names, values = names + batch_names, np.hstack([values, batch])
+            keys = np.concatenate([keys, rng.random(len(batch_names))])
+            if len(keys) > size:  # zostają wiersze z najmniejszymi losowymi kluczami
+                keep = np.sort(np.argpartition(keys, size - 1)[:size])
+                names, values, keys = [names[i] for i in keep], values[:, keep], keys[keep]
+        return names, values
+
+    def frame(self) -> pd.DataFrame:
+        """
+        Całe źródło jako DataFrame (do podglądu w arkuszu)
+        :return: (pd.DataFrame) : tabela z danymi
+        """
+        raise NotImplementedError
+
+    def load(self, criteria: List[int], filters: Optional[List[Filter]] = None, batch_size: int = BATCH_SIZE) \
+            -> Tuple[np.ndarray, List[str], List[str], List[float], List[bool]]:
+        """
+        Wczytanie macierzy decyzyjnej dla wybranych kryteriów
+        :param criteria: (List[int]) : lista numerów wybranych kryteriów (numeracja od 1)
+        :param filters: (List[Filter]) : lista filtrów (kolumna, operator, wartość)
+        :param batch_size: (int) : liczba wierszy w paczce
+        :return: (Tuple[np.ndarray, List[str], List[str], List[float], List[bool]]) : macierz decyzyjna D[n x m],
+        lista nazw kryteriów, lista nazw elementów, wektor wag i wektor maksymalizacji wybranych kryteriów
+        """
+        all_names = self.criteria_names()
+        criteria = sorted(criteria)
+        c_names = [all_names[k - 1] for k in criteria]  # projekcja - tylko wybrane kolumny
+        W_all, W_max_all = self.criteria_meta()
+        W = [W_all[k - 1] for k in criteria if k - 1 < len(W_all)]
+        W_max = [W_max_all[k - 1] for k in criteria if k - 1 < len(W_max_all)]
+
+        items_names = []
+        blocks = []
+        for names, values in self.iter_batches(c_names, filters, batch_size):
+            items_names.extend(names)
+            blocks.append(values)
+        if blocks:
+            D = np.hstack(blocks)
+        else:
+            D = np.empty((len(c_names), 0))
+        return D, c_names, items_names, W, W_max
+
+
+def check_filters(filters: Optional[List[Filter]], allowed: Sequence[str]) -> List[Filter]:
+    """
+    Sprawdzenie poprawności filtrów
+    :param filters: (List[Filter]) : lista filtrów (kolumna, operator, wartość)
+    :param allowed: (Sequence[str]) : nazwy kolumn, po których można filtrować
+    :return: (List[Filter]) : lista filtrów
+    """
+    if not filters:
+        return []
+    for column, op, _ in filters:
+        if column not in allowed:
+            raise ValueError("Nieznana kolumna w filtrze: {}".format(column))
+        if op not in OPERATORS:
+            raise ValueError("Nieznany operator w filtrze: {}".format(op))
+    return list(filters)
+
+
+class ExcelSource(DataSource):
+    """
+    Źródło danych z pliku .xlsx w układzie: Lp., Nazwa, kryteria..., Wagi, Maksymalizacja
+    """
+
+    def __init__(self, file_name: str):
+        """
+        :param file_name: (str) : nazwa pliku
+        """
+        self.file_name = file_name
+        self._columns = None
+
+    def _header(self) -> List[str]:
+        if self._columns is None:
+            self._columns = pd.read_excel(self.file_name, nrows=0).columns.tolist()  # tylko nagłówek
+        return self._columns
+
+    def criteria_names(self) -> List[str]:
+        names = []
+        for j in self._header():
+            if j in SKIPPED_COLUMNS:
+                continue
+            if j == 'Wagi':
+                break
+            names.append(j)
+        return names
+
+    def criteria_meta(self) -> Tuple[List[float], List[bool]]:
+        df = pd.read_excel(self.file_name, usecols=list(META_COLUMNS))
+        return df['Wagi'].dropna().tolist(), df['Maksymalizacja'].dropna().tolist()
+
+    def iter_batches(self, columns: Sequence[str], filters: Optional[List[Filter]] = None,
+                     batch_size: int = BATCH_SIZE) -> Iterator[Tuple[List[str], np.ndarray]]:
+        filters = check_filters(filters, self.criteria_names() + ['Nazwa'])
+        usecols = ['Nazwa'] + [c for c in self.criteria_names() if c in columns or c in [f[0] for f in filters]]
+        df = pd.read_excel(self.file_name, usecols=usecols)  # projekcja kolumn już przy wczytaniu
+        df = df[df['Nazwa'].notna()]
+        mask = np.ones(len(df), dtype=bool)
+        for column, op, value in filters:  # plik .xlsx nie ma zapytań, więc filtrujemy od razu po wczytaniu
+            if pd.api.types.is_numeric_dtype(df[column]):
+                mask &= _compare(df[column].to_numpy(dtype=float), op, value)
+            else:  # kolumna tekstowa (np. Nazwa) porównywana jak tekst
+                mask &= _compare(df[column].astype(str).to_numpy(), op, str(value))
+        df = df[mask]
+        values = df[list(columns)].to_numpy(dtype=float).T
+        names = df['Nazwa'].astype(str).tolist()
+        for start in range(0, len(names), batch_size):
+            yield names[start:start + batch_size], values[:, start:start + batch_size]
+
+    def frame(self) -> pd.DataFrame:
+        return pd.read_excel(self.file_name)
+
+
+class SqliteSource(DataSource):
+    """
+    Źródło danych z bazy SQLite. Tabela z elementami zawiera kolumnę Nazwa i kolumny kryteriów, a tabela
+    z kryteriami wiersze (Nazwa, Waga, Maksymalizacja) w kolejności kryteriów
+    """
+
+    def __init__(self, file_name: str, table: str = 'przedmioty', criteria_table: str = 'kryteria'):
+        """
+        :param file_name: (str) : nazwa pliku bazy
+        :param table: (str) : nazwa tabeli z elementami
+        :param criteria_table: (str) : nazwa tabeli z wagami i maksymalizacją kryteriów
+        """
+        self.file_name = file_name
+        self.table = table
+        self.criteria_table = criteria_table
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.file_name)
+
+    def criteria_names(self) -> List[str]:
+        with closing(self._connect()) as con:
+            info = con.execute('PRAGMA table_info({})'.format(quote(self.table))).fetchall()
+        return [row[1] for row in info if row[1] not in SKIPPED_COLUMNS and row[1] not in META_COLUMNS]
+
+    def criteria_meta(self) -> Tuple[List[float], List[bool]]:
+        with closing(self._connect()) as con:
+            rows = dict((name, (w, w_max)) for name, w, w_max in con.execute(
+                'SELECT Nazwa, Waga, Maksymalizacja FROM {}'.format(quote(self.criteria_table))))
+        W = []
+        W_max = []
+        for name in self.criteria_names():  # kolejność jak w tabeli z elementami
+            if name in rows:
+                W.append(rows[name][0])
+                W_max.append(bool(rows[name][1]))
+        return W, W_max
+
+    def _where(self, filters: Optional[List[Filter]]) -> Tuple[str, List[Number]]:
+        filters = check_filters(filters, self.criteria_names() + ['Nazwa'])
+        if not filters:
+            return '', []
+        conditions = ['{} {} ?'.format(quote(column), op) for column, op, _ in filters]
+        return ' WHERE ' + ' AND '.join(conditions), [value for _, _, value in filters]
+
+    def iter_batches(self, columns: Sequence[str], filters: Optional[List[Filter]] = None,
+                     batch_size: int = BATCH_SIZE) -> Iterator[Tuple[List[str], np.ndarray]]:
+        unknown = set(columns) - set(self.criteria_names())
+        if unknown:
+            raise ValueError("Nieznane kolumny: {}".format(', '.join(sorted(unknown))))
+        where, params = self._where(filters)  # filtry wykonywane przez bazę
+        select = ', '.join(['Nazwa'] + [quote(c) for c in columns])
+        sql = 'SELECT {} FROM {}{} ORDER BY rowid'.format(select, quote(self.table), where)
+        with closing(self._connect()) as con:
+            cursor = con.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                cols = list(zip(*rows))  # wiersze -> kolumny
+                values = np.array(cols[1:], dtype=float).reshape(len(columns), len(rows))
+                yield [str(name) for name in cols[0]], values
+
+    def sample(self, columns: Sequence[str], size: int, filters: Optional[List[Filter]] = None,
+               seed: int = 0) -> Tuple[List[str], np.ndarray]:
+        unknown = set(columns) - set(self.criteria_names())
+        if unknown:
+            raise ValueError("Nieznane kolumny: {}".format(', '.join(sorted(unknown))))
+        where, params = self._where(filters)
+        select = ', '.join(['Nazwa'] + [quote(c) for c in columns])
+        with closing(self._connect()) as con:
+            # losowanie spośród rowid wierszy spełniających filtry: pełna próbka mimo luk w numeracji i filtrów,
+            # a wartości kryteriów pobierane są tylko dla wylosowanych wierszy
+            candidates = np.fromiter((row[0] for row in con.execute(
+                'SELECT rowid FROM {}{}'.format(quote(self.table), where), params)), dtype=np.int64)
+            rowids = np.sort(np.random.default_rng(seed).choice(candidates, size=min(size, len(candidates)),
+                                                                replace=False))
+            rows = []
+            for start in range(0, len(rowids), 900):  # limit parametrów zapytania SQLite
+                chunk = rowids[start:start + 900].tolist()
+                sql = 'SELECT {} FROM {} WHERE rowid IN ({}) ORDER BY rowid'.format(
+                    select, quote(self.table), ', '.join('?' * len(chunk)))
+                rows += con.execute(sql, chunk).fetchall()
+        cols = list(zip(*rows)) if rows else [[] for _ in range(len(columns) + 1)]
+        values = np.array(cols[1:], dtype=float).reshape(len(columns), len(rows))
+        return [str(name) for name in cols[0]], values
+
+    def count(self, filters: Optional[List[Filter]] = None) -> int:
+        where, params = self._where(filters)
+        with closing(self._connect()) as con:
+            return con.execute('SELECT COUNT(*) FROM {}{}'.format(quote(self.table), where), params).fetchone()[0]
+
+    def frame(self) -> pd.DataFrame:
+        with closing(self._connect()) as con:
+            return pd.read_sql('SELECT * FROM {}'.format(quote(self.table)), con)
+
+
+def quote(identifier: str) -> str:
+    """
+    Cytowanie nazwy kolumny lub tabeli w zapytaniu SQL
+    :param identifier: (str) : nazwa
+    :return: (str) : nazwa w cudzysłowie
+    """
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _compare(values: np.ndarray, op: str, value: Number) -> np.ndarray:
+    """
+    Wektorowe porównanie kolumny z wartością
+    :param values: (np.ndarray) : wartości kolumny
+    :param op: (str) : operator
+    :param value: (Number) : wartość graniczna
+    :return: (np.ndarray) : maska logiczna
+    """
+    if op == '<':
+        return values < value
+    if op == '<=':
+        return values <= value
+    if op == '>':
+        return values > value
+    if op == '>=':
+        return values >= value
+    if op == '=':
+        return values == value
+    return values != value
+
+
+def open_source(file_name: Union[str, DataSource]) -> DataSource:
+    """
+    Wybór źródła danych na podstawie rozszerzenia pliku
+    :param file_name: (Union[str, DataSource]) : nazwa pliku albo gotowe źródło
+    :return: (DataSource) : źródło danych
+    """
+    if isinstance(file_name, DataSource):
+        return file_name
+    if os.path.splitext(file_name)[1].lower() in SQLITE_EXTENSIONS:
+        return SqliteSource(file_name)
+    return ExcelSource(file_name)
+
+
+def excel_to_sqlite(file_name: str, db_name: str, table: str = 'przedmioty', criteria_table: str = 'kryteria') -> None:
+    """
+    Przeniesienie bazy z pliku .xlsx do bazy SQLite
+    :param file_name: (str) : nazwa pliku .xlsx
+    :param db_name: (str) : nazwa pliku bazy SQLite
+    :param table: (str) : nazwa tabeli z elementami
+    :param criteria_table: (str) : nazwa tabeli z wagami i maksymalizacją kryteriów
+    :return: None
+    """
+    source = ExcelSource(file_name)
+    c_names = source.criteria_names()
+    W, W_max = source.criteria_meta()
+    df = pd.read_excel(file_name, usecols=['Nazwa'] + c_names)
+    df = df[df['Nazwa'].notna()]
+    k = min(len(W), len(W_max))  # kryteria z podaną wagą i kierunkiem
+    meta = pd.DataFrame({'Nazwa': c_names[:k], 'Waga': W[:k], 'Maksymalizacja': [int(bool(v)) for v in W_max[:k]]})
+    with closing(sqlite3.connect(db_name)) as con:
+        df.to_sql(table, con, if_exists='replace', index=False)
+        meta.to_sql(criteria_table, con, if_exists='replace', index=False)
+        con.commit()
@@ -0,0 +1,172 @@
+from typing import List, Tuple, Optional, Union, Iterator, Sequence, NamedTuple
+from collections import Counter
+import numpy as np
+import pandas as pd
+from data_source import DataSource, Filter, BATCH_SIZE, open_source
+from watch import row_hashes
+
+
+class Groups(NamedTuple):
+    """
+    Podział elementów na grupy o identycznych wektorach kryteriów
+    """
+    first: np.ndarray  # indeks pierwszego elementu (reprezentanta) każdej grupy, w kolejności źródła
+    inverse: np.ndarray  # numer grupy każdego elementu
+    counts: np.ndarray  # liczebność grup
+
+
+def quantize(D: np.ndarray, decimals: Optional[int] = None) -> np.ndarray:
+    """
+    Zaokrąglenie wartości kryteriów przed porównaniem (None - porównanie dokładne)
+    :param D: (np.ndarray) : macierz decyzyjna D[n x m]
+    :param decimals: (int) : liczba miejsc po przecinku
+    :return: (np.ndarray) : macierz do porównywania elementów
+    """
+    Q = np.asarray(D, dtype=float) if decimals is None else np.round(np.asarray(D, dtype=float), decimals)
+    return Q + 0.0  # -0.0 i 0.0 dają ten sam skrót
+
+
+def group_duplicates(D: np.ndarray, decimals: Optional[int] = None) -> Groups:
+    """
+    Grupowanie elementów po skrótach wektorów kryteriów, z kontrolą kolizji skrótów
+    :param D: (np.ndarray) : macierz decyzyjna D[n x m]
+    :param decimals: (int) : liczba miejsc po przecinku przy porównaniu (None - dokładnie)
+    :return: (Groups) : grupy elementów
+    """
+    Q = quantize(D, decimals)
+    if Q.shape[1] == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return Groups(empty, empty, empty)
+    _, first, inverse, counts = np.unique(row_hashes(Q), return_index=True, return_inverse=True,
+                                          return_counts=True)
+    if not np.array_equal(Q[:, first[inverse]], Q, equal_nan=True):  # kolizja skrótów: porównanie całych wektorów
+        _, first, inverse, counts = np.unique(np.nan_to_num(Q, nan=np.inf), axis=1, return_index=True,
+                                              return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    order = np.argsort(first, kind='stable')  # grupy w kolejności pierwszego wystąpienia
+    position = np.empty_like(order)
+    position[order] = np.arange(len(order))
+    return Groups(first[order], position[inverse], counts[order])
+
+
+def group_label(members: List[str]) -> str:
+    """
+    Nazwa grupy: nazwa reprezentanta i liczba pozostałych elementów
+    :param members: (List[str]) : nazwy elementów grupy
+    :return: (str) : nazwa grupy
+    """
+    return members[0] if len(members) == 1 else '{} (+{})'.format(members[0], len(members) - 1)
+
+
+def unique_labels(labels: List[str]) -> List[str]:
+    """
+    Rozróżnienie powtarzających się nazw grup numerem grupy (np. dwie grupy "X (+1)" albo elementy o tej samej
+    nazwie i różnych wartościach), żeby nazwa z wyniku metody wskazywała jedną grupę
+    :param labels: (List[str]) : nazwy grup
+    :return: (List[str]) : unikalne nazwy grup
+    """
+    counts = Counter(labels)
+    used = set(labels)
+    result = []
+    for group, label in enumerate(labels):
+        if counts[label] > 1:
+            label = '{} [{}]'.format(label, group + 1)
+            while label in used:
+                label += "'"
+            used.add(label)
+        result.append(label)
+    return result
+
+
+class CollapsedSource(DataSource):
+    """
+    Źródło danych, w którym elementy o identycznych (po zaokrągleniu) wartościach wszystkich kryteriów są scalone
+    w jeden element. Metody rankingowe liczą każdą grupę raz, a funkcja expand rozwija wynik na wszystkie elementy
+    """
+
+    def __init__(self, source: Union[str, DataSource], decimals: Optional[int] = None):
+        """
+        :param source: (Union[str, DataSource]) : nazwa pliku albo źródło danych
+        :param decimals: (int) : liczba miejsc po przecinku przy porównaniu (None - dokładnie)
+        """
+        self.source = open_source(source)
+        self.decimals = decimals
+        self._groups = None  # (filtry, wartości reprezentantów, nazwy grup, liczebności grup)
+        self.members = []  # nazwy elementów każdej grupy (indeks - numer grupy)
+        self.index = {}  # nazwa grupy -> numer grupy
+
+    def criteria_names(self) -> List[str]:
+        return self.source.criteria_names()
+
+    def criteria_meta(self) -> Tuple[List[float], List[bool]]:
+        return self.source.criteria_meta()
+
+    def frame(self) -> pd.DataFrame:
+        return self.source.frame()
+
+    def groups(self, filters: Optional[List[Filter]] = None) -> Tuple[np.ndarray, List[str]]:
+        """
+        Grupy elementów spełniających filtry (wynik zapamiętany dla ostatnich filtrów)
+        :param filters: (List[Filter]) : lista filtrów (kolumna, operator, wartość)
+        :return: (Tuple[np.ndarray, List[str]]) : wartości wszystkich kryteriów reprezentantów, nazwy grup
+        """
+        key = list(filters or [])
+        if self._groups is None or self._groups[0] != key:
+            all_criteria = list(range(1, len(self.criteria_names()) + 1))
+            D, _, items_names, _, _ = self.source.load(all_criteria, key)
+            groups = group_duplicates(D, self.decimals)
+            members = [[] for _ in range(len(groups.first))]
+            for name, group in zip(items_names, groups.inverse.tolist()):
+                members[group].append(name)
+            labels = unique_labels([group_label(names) for names in members])
+            self.members = members
+            self.index = {label: group for group, label in enumerate(labels)}
+            self._groups = (key, D[:, groups.first], labels, groups.counts)
+        return self._groups[1], self._groups[2]
+
+    def iter_batches(self, columns: Sequence[str], filters: Optional[List[Filter]] = None,
+                     batch_size: int = BATCH_SIZE) -> Iterator[Tuple[List[str], np.ndarray]]:
+        values, labels = self.groups(filters)
+        all_names = self.criteria_names()
+        values = values[[all_names.index(column) for column in columns]]
+        for start in range(0, len(labels), batch_size):
+            yield labels[start:start + batch_size], values[:, start:start + batch_size]
+
+    def count(self, filters: Optional[List[Filter]] = None) -> int:
+        return len(self.groups(filters)[1])
+
+    def multiplicity(self, items_names: List[str]) -> np.ndarray:
+        counts = self._groups[3] if self._groups is not None else []
+        return np.asarray([counts[self.index[name]] if name in self.index else 1 for name in items_names], dtype=float)
+
+    def expand(self, items_names: List[str]) -> Tuple[List[str], np.ndarray]:
+        """
+        Rozwinięcie wyniku liczonego dla grup na wszystkie elementy grup
+        :param items_names: (List[str]) : nazwy grup z wyniku metody
+        :return: (Tuple[List[str], np.ndarray]) : nazwy elementów, indeks grupy w wyniku dla każdego elementu
+        (np. scores[idx], D[:, idx])
+        """
+        names, idx = [], []
+        for i, label in enumerate(items_names):
+            members = self.members[self.index[label]] if label in self.index else [label]
+            names.extend(members)
+            idx.extend([i] * len(members))
+        return names, np.asarray(idx, dtype=np.int64)
+
+
+def collapse(D: List[List[float]], items_names: List[str], decimals: Optional[int] = None) \
+        -> Tuple[np.ndarray, List[str], Groups]:
+    """
+    Scalenie duplikatów w gotowej macierzy decyzyjnej
+    :param D: (List[List[float]]) : macierz decyzyjna D[n x m]
+    :param items_names: (List[str]) : lista nazw elementów
+    :param decimals: (int) : liczba miejsc po przecinku przy porównaniu (None - dokładnie)
+    :return: (Tuple[np.ndarray, List[str], Groups]) : macierz reprezentantów, nazwy grup, grupy (wynik metody
+    dla wszystkich elementów to score[groups.inverse])
+    """
+    D = np.asarray(D, dtype=float)
+    groups = group_duplicates(D, decimals)
+    members = {}  # numer grupy -> nazwy elementów
+    for name, group in zip(items_names, groups.inverse.tolist()):
+        members.setdefault(group, []).append(name)
+    return D[:, groups.first], unique_labels([group_label(members[g]) for g in range(len(groups.first))]), groups
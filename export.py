@@ -0,0 +1,131 @@
+from typing import List, Tuple, Union, Iterator
+import os
+import numpy as np
+import pandas as pd
+
+Number = Union[float, int]
+
+# kierunek sortowania rankingu metod
+HIGHER_IS_BETTER = {"TOPSIS": True, "RSM": False, "SP-CS": True, "PROMETHEE II": True}
+CHUNK_SIZE = 100000  # liczba wierszy zapisywanych naraz
+XLSX_MAX_ROWS = 1048576  # limit wierszy arkusza Excel (z nagłówkiem)
+FORMATS = ('.csv', '.xlsx', '.parquet')
+
+
+def rank_order(score: List[float], reverse: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Kolejność elementów w rankingu i ich pozycje
+    :param score: (List[float]) : wektor współczynników skoringowych
+    :param reverse: (bool) : czy wyższy współczynnik oznacza lepszą pozycję
+    :return: (Tuple[np.ndarray, np.ndarray]) : indeksy elementów od najlepszego, pozycja każdego elementu (od 1)
+    """
+    score = np.asarray(score, dtype=float)
+    order = np.argsort(-score if reverse else score, kind='stable')
+    rank = np.empty(len(score), dtype=np.int64)
+    rank[order] = np.arange(1, len(score) + 1)
+    return order, rank
+
+
+def _chunks(items_names: List[str], score: np.ndarray, D: np.ndarray, order: np.ndarray,
+            chunk_size: int) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Kolejne fragmenty rankingu w postaci kolumn
+    :return: (Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]) : nazwy, współczynniki, pozycje,
+    wartości kryteriów [n x b]
+    """
+    names = np.asarray(items_names, dtype=object)
+    for start in range(0, len(order), chunk_size):
+        idx = order[start:start + chunk_size]
+        positions = np.arange(start + 1, start + len(idx) + 1)
+        yield names[idx], score[idx], positions, D[:, idx]
+
+
+def _write_csv(file_name: str, columns: List[str], chunks: Iterator) -> None:
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+    except ImportError:  # bez pyarrow zapis fragmentami przez pandas (wolniejszy)
+        pa = None
+    if pa is None:
+        with open(file_name, 'w', encoding='utf-8', newline='') as f:
+            header = True
+            for names, score, positions, values in chunks:
+                frame = pd.DataFrame(dict(zip(columns, [names, score, positions] + list(values))), copy=False)
+                frame.to_csv(f, header=header, index=False)
+                header = False
+        return
+    writer = None
+    for names, score, positions, values in chunks:
+        table = pa.Table.from_arrays([pa.array(names, type=pa.string()), pa.array(score), pa.array(positions)] +
+                                     [pa.array(column) for column in values], names=columns)
+        if writer is None:
+            writer = pa_csv.CSVWriter(file_name, table.schema)
+        writer.write_table(table)
+    if writer is not None:
+        writer.close()
+
+
+def _write_xlsx(file_name: str, columns: List[str], chunks: Iterator, m: int) -> None:
+    if m + 1 > XLSX_MAX_ROWS:
+        raise ValueError("Arkusz .xlsx mieści najwyżej {} wierszy".format(XLSX_MAX_ROWS - 1))
+    try:
+        import xlsxwriter
+    except ImportError:
+        raise ImportError("Eksport do .xlsx wymaga pakietu xlsxwriter")
+    workbook = xlsxwriter.Workbook(file_name, {'constant_memory': True, 'nan_inf_to_errors': True})
+    worksheet = workbook.add_worksheet('Ranking')
+    worksheet.write_row(0, 0, columns)
+    row = 1
+    for names, score, positions, values in chunks:  # wiersze zapisywane po kolei, bez trzymania arkusza w pamięci
+        for record in zip(names, score.tolist(), positions.tolist(), *values.tolist()):
+            worksheet.write_row(row, 0, record)
+            row += 1
+    workbook.close()
+
+
+def _write_parquet(file_name: str, columns: List[str], chunks: Iterator) -> None:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Eksport do .parquet wymaga pakietu pyarrow")
+    writer = None
+    for names, score, positions, values in chunks:  # każdy fragment to osobna grupa wierszy
+        arrays = [pa.array(names, type=pa.string()), pa.array(score), pa.array(positions)] + \
+                 [pa.array(column) for column in values]
+        table = pa.Table.from_arrays(arrays, names=columns)
+        if writer is None:
+            writer = pq.ParquetWriter(file_name, table.schema)
+        writer.write_table(table)
+    if writer is not None:
+        writer.close()
+
+
+def export_ranking(file_name: str, items_names: List[str], score: List[float], D: List[List[Number]],
+                   c_names: List[str], method: str, chunk_size: int = CHUNK_SIZE) -> None:
+    """
+    Zapis rankingu do pliku .csv, .xlsx lub .parquet fragmentami o stałej wielkości
+    :param file_name: (str) : nazwa pliku, rozszerzenie wybiera format
+    :param items_names: (List[str]) : lista nazw elementów
+    :param score: (List[float]) : wektor współczynników skoringowych
+    :param D: (List[List[Number]]) : macierz decyzyjna D[n x m]
+    :param c_names: (List[str]) : lista nazw kryteriów
+    :param method: (str) : nazwa metody (wyznacza kierunek rankingu)
+    :param chunk_size: (int) : liczba wierszy zapisywanych naraz
+    :return: None
+    """
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError("Nieobsługiwany format pliku: {}".format(extension))
+    score = np.asarray(score, dtype=float)
+    D = np.asarray(D, dtype=float).reshape(len(c_names), len(score))
+    order, _ = rank_order(score, HIGHER_IS_BETTER.get(method, True))
+    columns = ['Nazwa', 'Wynik', 'Pozycja'] + list(c_names)
+    chunks = _chunks(items_names, score, D, order, chunk_size)
+
+    if extension == '.csv':
+        _write_csv(file_name, columns, chunks)
+    elif extension == '.xlsx':
+        _write_xlsx(file_name, columns, chunks, len(score))
+    else:
+        _write_parquet(file_name, columns, chunks)
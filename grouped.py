@@ -0,0 +1,207 @@
+from typing import List, Tuple, Optional, Union, NamedTuple
+import numpy as np
+from topsis import _distance_parts, _distance, point_distances
+from reference_points import ReferencePoints, median_ranks, points_from_bounds, _maximized
+from export import HIGHER_IS_BETTER
+from data_source import DataSource, Filter, open_source
+from constraints import Constraints, load_screened
+
+Number = Union[float, int]
+
+
+class Segments(NamedTuple):
+    """
+    Podział elementów na grupy. Po permutacji order elementy każdej grupy leżą obok siebie, więc statystyki
+    wszystkich grup liczy jedno wywołanie ufunc.reduceat
+    """
+    gid: np.ndarray  # numer grupy każdego elementu
+    order: np.ndarray  # permutacja porządkująca elementy grupami (w grupie - kolejność źródła)
+    starts: np.ndarray  # początki grup w permutacji
+    sizes: np.ndarray  # liczebności grup
+    labels: List[str]  # nazwy grup
+
+
+def segments(keys: np.ndarray, bins: Optional[List[Number]] = None) -> Segments:
+    """
+    Grupy elementów o równych wartościach kolumny grupującej albo o wartościach z tych samych przedziałów
+    :param keys: (np.ndarray) : wartości kolumny grupującej
+    :param bins: (List[Number]) : progi przedziałów [próg_i, próg_i+1) (domyślnie grupa dla każdej wartości)
+    :return: (Segments) : podział na grupy
+    """
+    keys = np.asarray(keys, dtype=float)
+    if len(keys) == 0:
+        raise ValueError("Brak elementów do pogrupowania")
+    if bins is None:
+        codes, gid = np.unique(keys, return_inverse=True)
+        labels = ['{:g}'.format(value) for value in codes]
+    else:
+        edges = np.concatenate(([-np.inf], np.sort(np.asarray(bins, dtype=float)), [np.inf]))
+        codes, gid = np.unique(np.searchsorted(edges, keys, side='right') - 1, return_inverse=True)
+        labels = ['[{:g}, {:g})'.format(edges[c], edges[c + 1]) for c in codes]
+    gid = gid.reshape(-1)
+    sizes = np.bincount(gid, minlength=len(codes))
+    return Segments(gid, np.argsort(gid, kind='stable'), np.concatenate(([0], np.cumsum(sizes)[:-1])), sizes,
+                    labels)
+
+
+def segment_reduce(ufunc: np.ufunc, X: np.ndarray, seg: Segments) -> np.ndarray:
+    """
+    Redukcja wierszy macierzy osobno w każdej grupie
+    :param ufunc: (np.ufunc) : funkcja redukcji (np. np.add, np.maximum)
+    :param X: (np.ndarray) : macierz [k x m]
+    :param seg: (Segments) : podział na grupy
+    :return: (np.ndarray) : wyniki redukcji [k x liczba grup]
+    """
+    return ufunc.reduceat(X[:, seg.order], seg.starts, axis=1)
+
+
+def grouped_topsis(D: List[List[Number]], W: List[Number], W_max: Optional[List[bool]], metric: str,
+                   seg: Segments) -> np.ndarray:
+    """
+    Metoda topsis liczona osobno w każdej grupie: normy oraz punkty idealne i antyidealne grup powstają
+    redukcjami segmentowymi, a odległości wszystkich elementów jednym przebiegiem
+    :param D: (List[List[Number]]) : macierz decyzyjna D[n x m]
+    :param W: (List[Number]) : wektor wag
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów (domyślnie każde)
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param seg: (Segments) : podział na grupy
+    :return: (np.ndarray) : wektor współczynników skoringowych (porównywalnych w obrębie grupy)
+    """
+    D = np.asarray(D, dtype=float)
+    maximize = _maximized(W_max, D.shape[0])[:, None]
+    norms = np.sqrt(segment_reduce(np.add, np.square(D), seg))
+    col_max, col_min = segment_reduce(np.maximum, D, seg), segment_reduce(np.minimum, D, seg)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        U = D / norms[:, seg.gid]
+        u_ideal = np.where(maximize, col_max, col_min) / norms  # punkty idealne grup [n x liczba grup]
+        u_anti_ideal = np.where(maximize, col_min, col_max) / norms
+    W = np.asarray(W, dtype=float)[:D.shape[0]]
+    d_star = _distance(_distance_parts(U, u_ideal[:, seg.gid], metric), W, metric)
+    d_minus = _distance(_distance_parts(U, u_anti_ideal[:, seg.gid], metric), W, metric)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return d_minus / (d_minus + d_star)
+
+
+def group_reference_points(D: np.ndarray, W_max: Optional[List[bool]], seg: Segments) -> ReferencePoints:
+    """
+    Punkty odniesienia metody RSM każdej grupy. Mediany grup są odczytywane po jednym sortowaniu elementów
+    (grupa, wartość) dla każdego kryterium
+    :param D: (np.ndarray) : macierz decyzyjna D[n x m]
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów (domyślnie każde)
+    :param seg: (Segments) : podział na grupy
+    :return: (ReferencePoints) : punkty odniesienia [n x liczba grup] (bez granicy SP-CS)
+    """
+    n = D.shape[0]
+    maximize = _maximized(W_max, n)[:, None]
+    col_max, col_min = segment_reduce(np.maximum, D, seg), segment_reduce(np.minimum, D, seg)
+    ranks = median_ranks(seg.sizes, maximize)  # element m // 2 grupy jak w funkcji rsm
+    median = np.empty(col_max.shape)
+    for j in range(n):
+        median[j] = D[j, np.lexsort((D[j], seg.gid))][seg.starts + ranks[j]]
+    return points_from_bounds(maximize, col_max, col_min, median, col_min, col_max)
+
+
+def grouped_rsm(D: List[List[Number]], W_max: Optional[List[bool]], metric: str, seg: Segments) -> np.ndarray:
+    """
+    Metoda RSM liczona osobno w każdej grupie: punkty odniesienia, elementy niezdominowane i normalizacja odległości
+    dotyczą tylko elementów grupy
+    :param D: (List[List[Number]]) : macierz decyzyjna D[n x m]
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów (domyślnie każde)
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param seg: (Segments) : podział na grupy
+    :return: (np.ndarray) : wektor współczynników skoringowych (inf dla elementów zdominowanych)
+    """
+    D = np.asarray(D, dtype=float)
+    maximize = _maximized(W_max, D.shape[0])[:, None]
+    points = group_reference_points(D, W_max, seg)
+    threshold = points.threshold[:, seg.gid]
+    pareto = np.where(maximize, D >= threshold, D <= threshold).any(axis=0)
+    d = np.stack([point_distances(D, reference[:, seg.gid], metric)
+                  for reference in (points.aspiration, points.quo_median, points.quo_mean)])
+    d_max = segment_reduce(np.maximum, np.where(pareto, d, 0.0), seg)  # normalizacja po elementach niezdominowanych
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d = d / d_max[:, seg.gid]
+    return np.where(pareto, d[0] - np.minimum(d[1], d[2]), np.inf)
+
+
+def group_ranks(score: np.ndarray, seg: Segments, higher_is_better: bool = True) -> np.ndarray:
+    """
+    Pozycje elementów w rankingach ich grup
+    :param score: (np.ndarray) : wektor współczynników skoringowych
+    :param seg: (Segments) : podział na grupy
+    :param higher_is_better: (bool) : czy wyższy współczynnik oznacza lepszą pozycję
+    :return: (np.ndarray) : pozycje od 1
+    """
+    key = np.nan_to_num(-score if higher_is_better else score, nan=np.inf)
+    order = np.lexsort((key, seg.gid))
+    ranks = np.empty(len(key), dtype=np.int64)
+    ranks[order] = np.arange(len(key)) - np.repeat(seg.starts, seg.sizes) + 1
+    return ranks
+
+
+def load_grouped(file_name: Union[str, DataSource], criteria: List[int], group_by: str,
+                 filters: Optional[List[Filter]] = None, constraints: Optional[Constraints] = None) \
+        -> Tuple[np.ndarray, np.ndarray, List[str], List[str], List[float], List[bool]]:
+    """
+    Wczytanie macierzy decyzyjnej razem z kolumną grupującą
+    :param file_name: (Union[str, DataSource]) : nazwa pliku albo źródło danych
+    :param criteria: (List[int]) : lista wybranych kryteriów (numeracja od 1)
+    :param group_by: (str) : nazwa kolumny grupującej (kolumna liczbowa źródła, np. numer dzielnicy albo cena)
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia
+    :return: (Tuple[np.ndarray, np.ndarray, List[str], List[str], List[float], List[bool]]) : macierz decyzyjna
+    D[n x m], wartości kolumny grupującej, lista nazw kryteriów, lista nazw elementów, wektor wag i wektor
+    maksymalizacji wybranych kryteriów
+    """
+    source = open_source(file_name)
+    all_names = source.criteria_names()
+    if group_by not in all_names:
+        raise ValueError("Nieznana kolumna grupująca: {}".format(group_by))
+    group_number = all_names.index(group_by) + 1
+    loaded = sorted(set(criteria) | {group_number})
+    D, c_names, items_names, W, W_max = load_screened(source, loaded, filters, constraints)
+    keys = D[loaded.index(group_number)]
+    keep = [idx for idx, k in enumerate(loaded) if k in criteria]  # kolumna grupująca nie wchodzi do rankingu
+    return D[keep], keys, [c_names[idx] for idx in keep], items_names, [W[idx] for idx in keep if idx < len(W)], \
+        [W_max[idx] for idx in keep if idx < len(W_max)]
+
+
+def compute_grouped(file_name: Union[str, DataSource], criteria: List[int], group_by: str, method: str, metric: str,
+                    weights: Optional[List[float]] = None, bins: Optional[List[Number]] = None,
+                    filters: Optional[List[Filter]] = None, constraints: Optional[Constraints] = None) \
+        -> Tuple[str, List[str], List[str], np.ndarray, List[float], List[str], List[int]]:
+    """
+    Funkcja wyliczająca z pliku rankingi metodą topsis albo rsm osobno w każdej grupie
+    :param file_name: (Union[str, DataSource]) : nazwa pliku (.xlsx lub baza SQLite) albo źródło danych
+    :param criteria: (List[int]) : lista wybranych kryteriów
+    :param group_by: (str) : nazwa kolumny grupującej
+    :param method: (str) : nazwa metody (TOPSIS, RSM)
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param weights: (List[float]) : lista wag (domyślnie z pliku, tylko TOPSIS)
+    :param bins: (List[Number]) : progi przedziałów kolumny grupującej (domyślnie grupa dla każdej wartości)
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia odrzucające elementy przed wyliczeniem rankingu
+    :return: (Tuple[str, List[str], List[str], np.ndarray, List[float], List[str], List[int]]) : rankingi grup
+    jako str, lista nazw kryteriów, lista nazw elementów, macierz decyzyjna, wektor współczynników skoringowych,
+    nazwa grupy i pozycja w grupie każdego elementu
+    """
+    if method not in ("TOPSIS", "RSM"):
+        raise ValueError("Nieznana metoda: {}".format(method))
+    D, keys, c_names, items_names, W_file, W_max = load_grouped(file_name, criteria, group_by, filters, constraints)
+    seg = segments(keys, bins)
+    if method == "TOPSIS":
+        W = weights if weights else (W_file if len(W_file) == len(c_names) else [1.0] * len(c_names))
+        score = grouped_topsis(D, W, W_max, metric, seg)
+    else:
+        score = grouped_rsm(D, W_max, metric, seg)
+    ranks = group_ranks(score, seg, HIGHER_IS_BETTER[method])
+
+    rank_str = ''
+    order = np.lexsort((ranks, seg.gid))  # grupy po kolei, w grupie od najlepszego
+    for position, i in enumerate(order):
+        g = seg.gid[i]
+        if position == seg.starts[g]:
+            rank_str += '{} = {} ({}):\n'.format(group_by, seg.labels[g], seg.sizes[g])
+        rank_str += items_names[i] + ' : ' + '{0:1.3f}'.format(score[i]) + '\n'  # zapis rankingu jako str
+
+    return rank_str, c_names, items_names, D, score.tolist(), [seg.labels[g] for g in seg.gid], ranks.tolist()
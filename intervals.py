@@ -0,0 +1,146 @@
+from typing import List, Tuple, Optional, Union, NamedTuple
+import numpy as np
+from topsis import topsis_cache, topsis_scores
+from data_source import DataSource, Filter, open_source
+from constraints import Constraints, load_screened
+
+Number = Union[float, int]
+
+LOWER_SUFFIX = " od"  # kolumna dolnej granicy przedziału, np. "Cena od"
+UPPER_SUFFIX = " do"  # kolumna górnej granicy przedziału, np. "Cena do"
+
+
+class IntervalScores(NamedTuple):
+    """
+    Przedziałowe współczynniki skoringowe i możliwe pozycje elementów w rankingu
+    """
+    lower: np.ndarray  # dolne granice współczynników
+    upper: np.ndarray  # górne granice współczynników
+    best: np.ndarray  # najlepsza możliwa pozycja (od 1): 1 + liczba elementów na pewno lepszych
+    worst: np.ndarray  # najgorsza możliwa pozycja: m - liczba elementów na pewno gorszych
+
+
+def interval_columns(all_names: List[str]) -> List[Tuple[str, int, int]]:
+    """
+    Podział kolumn kryteriów na przedziały: para kolumn "<nazwa> od" i "<nazwa> do" tworzy jedno kryterium
+    przedziałowe, a każda inna kolumna to przedział zdegenerowany
+    :param all_names: (List[str]) : nazwy wszystkich kryteriów ze źródła
+    :return: (List[Tuple[str, int, int]]) : nazwa kryterium, numer kolumny dolnej i górnej granicy (numeracja od 1)
+    """
+    position = {name: k + 1 for k, name in enumerate(all_names)}
+    columns = []
+    for k, name in enumerate(all_names):
+        if name.endswith(LOWER_SUFFIX) and name[:-len(LOWER_SUFFIX)] + UPPER_SUFFIX in position:
+            base = name[:-len(LOWER_SUFFIX)]
+            columns.append((base, k + 1, position[base + UPPER_SUFFIX]))
+        elif not (name.endswith(UPPER_SUFFIX) and name[:-len(UPPER_SUFFIX)] + LOWER_SUFFIX in position):
+            columns.append((name, k + 1, k + 1))
+    return columns
+
+
+def load_intervals(file_name: Union[str, DataSource], criteria: List[int], weights: Optional[List[float]] = None,
+                   filters: Optional[List[Filter]] = None, constraints: Optional[Constraints] = None) \
+        -> Tuple[np.ndarray, np.ndarray, List[str], List[str], List[float], List[bool]]:
+    """
+    Wczytanie przedziałowej macierzy decyzyjnej; wybranie jednej kolumny pary wybiera cały przedział
+    :param file_name: (Union[str, DataSource]) : nazwa pliku (.xlsx lub baza SQLite) albo źródło danych
+    :param criteria: (List[int]) : lista wybranych kryteriów (numeracja od 1)
+    :param weights: (List[float]) : lista wag wybranych kryteriów (domyślnie z pliku, waga przedziału z kolumny
+    dolnej granicy)
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia odrzucające elementy przed wyliczeniem rankingu
+    :return: (Tuple[np.ndarray, np.ndarray, List[str], List[str], List[float], List[bool]]) : dolne granice L[n x m],
+    górne granice H[n x m], lista nazw kryteriów, lista nazw elementów, wektor wag, wektor maksymalizacji
+    """
+    source = open_source(file_name)
+    chosen = [column for column in interval_columns(source.criteria_names())
+              if column[1] in criteria or column[2] in criteria]
+    numbers = sorted(set(k for _, lower, upper in chosen for k in (lower, upper)))
+    D, names, items_names, W_file, W_max_file = load_screened(source, numbers, filters, constraints)
+    row = {k: j for j, k in enumerate(numbers)}  # wiersz macierzy dla numeru kolumny
+    L = D[[row[lower] for _, lower, _ in chosen]]
+    H = D[[row[upper] for _, _, upper in chosen]]
+    if (L > H).any():
+        wrong = [chosen[j][0] for j in np.flatnonzero((L > H).any(axis=1))]
+        raise ValueError("Dolna granica większa od górnej: {}".format(', '.join(wrong)))
+
+    selected = dict(zip(sorted(criteria), weights)) if weights else {}
+    W, W_max = [], []
+    for _, lower, upper in chosen:
+        j = row[lower]
+        W.append(selected.get(lower, selected.get(upper, W_file[j] if j < len(W_file) else 1.0)))
+        W_max.append(W_max_file[j] if j < len(W_max_file) else True)
+    return L, H, [name for name, _, _ in chosen], items_names, W, W_max
+
+
+def position_bounds(lower: np.ndarray, upper: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Możliwe pozycje elementów: element jest na pewno lepszy od innego, gdy jego dolna granica przekracza górną
+    granicę tamtego
+    :param lower: (np.ndarray) : dolne granice współczynników
+    :param upper: (np.ndarray) : górne granice współczynników
+    :return: (Tuple[np.ndarray, np.ndarray]) : najlepsze i najgorsze możliwe pozycje (od 1)
+    """
+    m = len(lower)
+    better = m - np.searchsorted(np.sort(lower), upper, side='right')  # dolna granica innego powyżej górnej
+    worse = np.searchsorted(np.sort(upper), lower, side='left')  # górna granica innego poniżej dolnej
+    return better + 1, m - worse
+
+
+def interval_topsis(L: List[List[Number]], H: List[List[Number]], W: List[Number], metric: str,
+                    W_max: Optional[List[bool]] = None) -> IntervalScores:
+    """
+    Przedziałowa metoda topsis w jednym przebiegu. Normy kryteriów liczone są z obu granic, punkt idealny to
+    najlepsza, a antyidealny najgorsza granica kryterium. Przy ustalonych normach i punktach odniesienia
+    współczynnik rośnie, gdy wartość zbliża się do punktu idealnego, więc granice współczynników dają układy
+    najgorszych i najlepszych granic wszystkich kryteriów, liczone razem jako stos dwóch macierzy
+    :param L: (List[List[Number]]) : dolne granice L[n x m]
+    :param H: (List[List[Number]]) : górne granice H[n x m]
+    :param W: (List[Number]) : wektor wag
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów (domyślnie każde)
+    :return: (IntervalScores) : granice współczynników i możliwe pozycje
+    """
+    L = np.asarray(L, dtype=float)
+    H = np.asarray(H, dtype=float)
+    n = L.shape[0]
+    maximize = np.asarray([bool(W_max[j]) if W_max is not None and j < len(W_max) else True
+                           for j in range(n)])[:, None]
+    norms = np.sqrt(np.einsum('ij,ij->i', L, L) + np.einsum('ij,ij->i', H, H))
+    stack = np.stack([np.where(maximize, L, H), np.where(maximize, H, L)])  # najgorsze i najlepsze granice
+    cache = topsis_cache(stack, maximize.ravel(), metric, norms=norms, extremes=(H.max(axis=1), L.min(axis=1)))
+    c = topsis_scores(cache, W)[0]
+    best, worst = position_bounds(c[0], c[1])
+    return IntervalScores(c[0], c[1], best, worst)
+
+
+def compute_interval_topsis(file_name: Union[str, DataSource], criteria: List[int], metric: str,
+                            weights: Optional[List[float]] = None, filters: Optional[List[Filter]] = None,
+                            constraints: Optional[Constraints] = None) \
+        -> Tuple[str, List[str], List[str], np.ndarray, np.ndarray, IntervalScores, List[bool]]:
+    """
+    Funkcja wyliczająca z pliku ranking przedziałową metodą topsis
+    :param file_name: (Union[str, DataSource]) : nazwa pliku (.xlsx lub baza SQLite) albo źródło danych
+    :param criteria: (List[int]) : lista wybranych kryteriów
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param weights: (List[float]) : lista wag wybranych kryteriów (domyślnie z pliku)
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia odrzucające elementy przed wyliczeniem rankingu
+    :return: (Tuple[str, List[str], List[str], np.ndarray, np.ndarray, IntervalScores, List[bool]]) : ranking jako
+    str, lista nazw kryteriów, lista nazw elementów, dolne i górne granice macierzy decyzyjnej, przedziałowe
+    współczynniki, wektor maksymalizacji kryteriów
+    """
+    L, H, c_names, items_names, W, W_max = load_intervals(file_name, criteria, weights, filters, constraints)
+    scores = interval_topsis(L, H, W, metric, W_max)
+
+    rank_str = ''
+    order = np.lexsort((-scores.lower, -(scores.lower + scores.upper)))  # według środka przedziału
+    for i in order:  # posortowanie rankingu
+        if scores.best[i] == scores.worst[i]:
+            place = 'pozycja {} pewna'.format(scores.best[i])
+        else:
+            place = 'pozycje {}-{}'.format(scores.best[i], scores.worst[i])
+        rank_str += items_names[i] + ' : ' + '[{0:1.3f}, {1:1.3f}]'.format(scores.lower[i], scores.upper[i]) + \
+            ' (' + place + ')\n'
+
+    return rank_str, c_names, items_names, L, H, scores, W_max
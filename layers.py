@@ -0,0 +1,170 @@
+from typing import List, Tuple, Optional, Union
+from bisect import bisect_right
+import numpy as np
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
+
+Number = Union[float, int]
+
+QUO_SHARE = 0.25  # udział elementów w klasie status quo i głębszych warstwach (odpowiednik progu 25% rozstępu)
+BLOCK_CELLS = 1 << 22  # liczba odległości [elementy x członkowie klasy] liczonych w jednym bloku
+LAYER_BLOCK = 512  # liczba elementów, dla których warstwy wyszukiwane są naraz
+MEMBER_BLOCK = 1024  # liczba członków warstwy porównywanych naraz (dalsze bloki tylko dla niezdominowanych)
+MINKOWSKI = {"Default": 2, "City Block": 1, "Chebyshev": np.inf}  # metryki obsługiwane przez drzewo k-d
+CDIST = {"Bray-Curtis": "braycurtis", "Canberra": "canberra"}
+
+
+def _dominated(members: np.ndarray, X: np.ndarray) -> np.ndarray:
+    """
+    Czy element jest zdominowany przez któregoś z członków warstwy (wiersze są różne, więc >= oznacza dominację)
+    :param members: (np.ndarray) : członkowie warstwy [k x n]
+    :param X: (np.ndarray) : elementy [b x n]
+    :return: (np.ndarray) : wektor logiczny
+    """
+    result = np.zeros(len(X), dtype=bool)
+    open_items = np.arange(len(X))  # elementy, dla których nie znaleziono jeszcze dominującego
+    for start in range(0, len(members), MEMBER_BLOCK):
+        part = members[start:start + MEMBER_BLOCK]
+        rest = X[open_items]
+        covered = part[:, 0, None] >= rest[:, 0]
+        for j in range(1, X.shape[1]):  # kryterium po kryterium, bez tensora [k x b x n]
+            covered &= part[:, j, None] >= rest[:, j]
+        found = covered.any(axis=0)
+        result[open_items[found]] = True
+        open_items = open_items[~found]
+        if len(open_items) == 0:
+            break
+    return result
+
+
+def _sweep_layers(rows: np.ndarray) -> np.ndarray:
+    """
+    Warstwy dla dwóch kryteriów w czasie O(m log m): przy przeglądaniu od najlepszego leksykograficznie warstwa
+    dominuje element wtedy, gdy ostatnio dodany do niej element ma nie mniejszą wartość drugiego kryterium
+    :param rows: (np.ndarray) : różne elementy od najlepszego leksykograficznie [m x 2]
+    :return: (np.ndarray) : numer warstwy każdego elementu
+    """
+    tails = []  # minus wartość drugiego kryterium ostatniego elementu każdej warstwy (ciąg niemalejący)
+    layer = np.empty(len(rows), dtype=np.intp)
+    for i, y in enumerate(rows[:, 1].tolist()):
+        k = bisect_right(tails, -y)
+        if k == len(tails):
+            tails.append(-y)
+        else:
+            tails[k] = -y
+        layer[i] = k
+    return layer
+
+
+def non_dominated_layers(D: List[List[Number]], W_max: Optional[List[bool]]) -> np.ndarray:
+    """
+    Niezdominowane sortowanie elementów (ENS-BS): elementy są przeglądane od najlepszego leksykograficznie, więc
+    element może być zdominowany tylko przez element już przydzielony, a warstwę wyszukuje się binarnie (element
+    zdominowany przez kogoś z warstwy k jest zdominowany przez kogoś z każdej wcześniejszej warstwy). Wyszukiwanie
+    idzie naraz dla bloku elementów, a dominację wewnątrz bloku rozstrzyga macierz dominacji bloku. Dla dwóch
+    kryteriów wystarcza przegląd z bisekcją
+    :param D: (List[List[Number]]) : macierz decyzyjna D[n x m]
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów (domyślnie każde)
+    :return: (np.ndarray) : numer warstwy każdego elementu (0 - elementy niezdominowane)
+    """
+    D = np.asarray(D, dtype=float)
+    n, m = D.shape
+    if m == 0:
+        return np.empty(0, dtype=np.intp)
+    maximize = np.asarray([bool(W_max[j]) if W_max is not None and j < len(W_max) else True for j in range(n)])
+    X = D.T * np.where(maximize, 1.0, -1.0)  # każde kryterium maksymalizowane [m x n]
+    # pozycje wartości w kryteriach zachowują porównania, a liczby całkowite porównuje się szybciej
+    X = np.column_stack([np.unique(X[:, j], return_inverse=True)[1].ravel() for j in range(n)]).astype(np.int32)
+    rows, inverse = np.unique(X, axis=0, return_inverse=True)  # identyczne elementy są w tej samej warstwie
+    rows = rows[::-1]  # od najlepszego leksykograficznie
+    if n == 2:
+        return _sweep_layers(rows)[::-1][inverse.ravel()]
+    fronts = []  # warstwa: [bufor wierszy, liczba wierszy]
+    layer = np.empty(len(rows), dtype=np.intp)
+    for start in range(0, len(rows), LAYER_BLOCK):
+        block = rows[start:start + LAYER_BLOCK]
+        low = np.zeros(len(block), dtype=np.intp)  # pierwsza warstwa, która może przyjąć element
+        high = np.full(len(block), len(fronts), dtype=np.intp)
+        while (low < high).any():
+            active = low < high
+            mid = (low + high) // 2
+            for k in np.unique(mid[active]):
+                chosen = np.flatnonzero(active & (mid == k))
+                members, size = fronts[k]
+                dominated = _dominated(members[:size], block[chosen])
+                low[chosen] = np.where(dominated, k + 1, low[chosen])
+                high[chosen] = np.where(dominated, high[chosen], k)
+        inner = np.triu(np.ones((len(block), len(block)), dtype=bool), 1)  # dominacja elementu i nad j > i w bloku
+        for j in range(n):
+            inner &= block[:, None, j] >= block[None, :, j]
+        result = low
+        while True:  # warstwa o 1 głębsza niż najgłębsza warstwa dominującego elementu bloku
+            deeper = np.maximum(low, np.where(inner, result[:, None] + 1, 0).max(axis=0))
+            if np.array_equal(deeper, result):
+                break
+            result = deeper
+        layer[start:start + len(block)] = result
+        for k in np.unique(result):
+            new = block[result == k]
+            if k == len(fronts):
+                fronts.append([np.empty((max(16, len(new)), n), dtype=X.dtype), 0])
+            members, size = fronts[k]
+            if size + len(new) > len(members):
+                members = np.vstack([members, np.empty((max(len(members), len(new)), n), dtype=X.dtype)])
+                fronts[k][0] = members
+            members[size:size + len(new)] = new
+            fronts[k][1] = size + len(new)
+    return layer[::-1][inverse.ravel()]
+
+
+def reference_classes(layer: np.ndarray, share: float = QUO_SHARE) -> Tuple[int, int]:
+    """
+    Warstwy tworzące klasy odniesienia: klasą aspiracji jest pierwsza warstwa, a klasą status quo najgłębsza
+    warstwa, od której w dół leży co najmniej zadany udział elementów
+    :param layer: (np.ndarray) : numery warstw elementów
+    :param share: (float) : udział elementów w klasie status quo i głębszych warstwach
+    :return: (Tuple[int, int]) : warstwa klasy aspiracji, warstwa klasy status quo
+    """
+    tail = np.cumsum(np.bincount(layer)[::-1])[::-1]  # liczba elementów w warstwie k i głębszych
+    return 0, int(np.flatnonzero(tail >= share * len(layer)).max())
+
+
+def nearest_distances(X: np.ndarray, members: np.ndarray, metric: str) -> np.ndarray:
+    """
+    Odległość każdego elementu od najbliższego członka klasy
+    :param X: (np.ndarray) : elementy [m x n]
+    :param members: (np.ndarray) : członkowie klasy [k x n]
+    :param metric: (str) : nazwa metryki
+    :return: (np.ndarray) : wektor odległości
+    """
+    if metric in MINKOWSKI:
+        return cKDTree(members).query(X, p=MINKOWSKI[metric])[0]
+    if metric not in CDIST:
+        raise ValueError("Nieznana metryka: {}".format(metric))
+    block = max(1, BLOCK_CELLS // len(members))
+    return np.concatenate([cdist(X[start:start + block], members, CDIST[metric]).min(axis=1)
+                           for start in range(0, len(X), block)])
+
+
+def layered_rsm(D: List[List[Number]], W_max: Optional[List[bool]], metric: str,
+                share: float = QUO_SHARE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Współczynniki metody RSM z klasami odniesienia z warstw niezdominowanych: znormalizowana odległość od
+    najbliższego członka klasy aspiracji minus znormalizowana odległość od najbliższego członka klasy status quo.
+    Elementy z warstw głębszych niż klasa status quo dostają inf
+    :param D: (List[List[Number]]) : macierz decyzyjna D[n x m]
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów (domyślnie każde)
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param share: (float) : udział elementów w klasie status quo i głębszych warstwach
+    :return: (Tuple[np.ndarray, np.ndarray]) : wektor współczynników skoringowych (mniejszy - lepszy), numery warstw
+    """
+    D = np.asarray(D, dtype=float)
+    layer = non_dominated_layers(D, W_max)
+    aspiration, quo = reference_classes(layer, share)
+    X = D.T
+    scored = layer <= quo
+    d_aspiration = nearest_distances(X[scored], X[layer == aspiration], metric)
+    d_quo = nearest_distances(X[scored], X[layer == quo], metric)
+    score = np.full(D.shape[1], np.inf)
+    score[scored] = d_aspiration / (d_aspiration.max() or 1.0) - d_quo / (d_quo.max() or 1.0)
+    return score, layer
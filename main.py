@@ -1,14 +1,28 @@
 import sys
-from typing import List
+from zipfile import BadZipFile
+from typing import List, Optional, NamedTuple
 from PyQt6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QMessageBox, \
     QFileDialog, QComboBox, QTableWidget, QTableWidgetItem, QTabWidget, QLabel, QPushButton, QDialog, QDialogButtonBox,\
-    QCheckBox, QDoubleSpinBox
-from PyQt6.QtGui import QFont
-from PyQt6.QtCore import Qt, pyqtSlot, QEventLoop, pyqtSignal
-import pandas as pd
-from topsis import compute_topsis
+    QCheckBox, QSlider, QLineEdit, QSpinBox
+from PyQt6.QtGui import QFont, QPixmap
+from PyQt6.QtCore import Qt, pyqtSlot, QEventLoop, pyqtSignal, QTimer, QFileSystemWatcher, QThread
+import numpy as np
+from topsis import load_topsis_cache, topsis_scores, TopsisCache
 from sp_cs import compute_sp_cs
-from rsm import compute_rsm
+from rsm import compute_rsm, CLASSES
+from promethee import compute_promethee, PREFERENCES
+from data_source import DataSource, open_source
+from constraints import Constraints, load_screened
+from export import export_ranking, rank_order, HIGHER_IS_BETTER
+from watch import RankingWatcher, rank_diff_report
+from progressive import progressive_topsis, Stage
+from chart_cache import ChartRenderer, fingerprint
+from agreement import variant_keys, rank_agreement
+from dedup import CollapsedSource
+from reduction import prune, pca, compare_reduction, reduction_report
+from grouped import compute_grouped
+from sparse_matrix import compute_sparse, to_dense, POLICIES
+from intervals import compute_interval_topsis
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
 import matplotlib.pyplot as plt
@@ -17,6 +31,18 @@ import matplotlib
 matplotlib.use('TkAgg')
 
 
+class RankingInputs(NamedTuple):
+    """
+    Ustawienia, z którymi wyliczono wyświetlany ranking (obserwacja pliku przelicza ranking z tymi samymi)
+    """
+    criteria: List[int]  # wybrane kryteria
+    metric: str  # metryka
+    constraints: Constraints  # twarde ograniczenia
+    weights: Optional[List[float]]  # wagi (PROMETHEE II; TOPSIS bierze wagi z panelu wag)
+    preference: str  # funkcja preferencji metody PROMETHEE II
+    classes: str  # klasy odniesienia metody RSM
+
+
 ### Okno Główne ###
 
 class MainWindow(QMainWindow):
@@ -30,6 +56,7 @@ class MainWindow(QMainWindow):
         ### Właściwości bazy danych ###
 
         self.file_name = None
+        self.source = None  # źródło danych (.xlsx lub SQLite)
         self.data_0 = []
         self.data_1 = []
         self.dap1 = []
@@ -43,14 +70,20 @@ class MainWindow(QMainWindow):
         self.N = []
         self.p_ideal = []
         self.p_anti_ideal = []
+        self.W_max = []  # wektor maksymalizacji kryteriów ostatniego rankingu (wiersze macierzy D)
         self.criteria = []
         self.items_names = []
+        self.D = []  # macierz decyzyjna ostatniego rankingu
+        self.scores = []  # współczynniki skoringowe ostatniego rankingu
+        self.ranking_method = None  # metoda, którą wyliczono ostatni ranking
         self.crit_numbers = [] #lista zaznaczonych kryteriów (checkboxów)
         self.crits_in_orig_file = 0
+        self.items_total = 0  # liczba wszystkich elementów w źródle
         self.checkboxes = []
 
         self.chosen_criteria = []
         self.chosen_metric = "Default"
+        self.chosen_preference = "usual"  # funkcja preferencji metody PROMETHEE II
 
         self.weights = []   # lista z wagami
         self.data_from_dialog = []
@@ -66,16 +99,30 @@ class MainWindow(QMainWindow):
 
         tabs.addTab(Config(self), 'Konfiguracja')  # dodanie zakładki Konfiguracja
         tabs.addTab(Sheet(self), 'Arkusz kalkulacyjny')  # dodanie zakładki Arkusz
-        tabs.addTab(Chart(self), 'Wykres')  # dodanie zakładek Wykres
+        self.chart = Chart(self)
+        tabs.addTab(self.chart, 'Wykres')  # dodanie zakładek Wykres
 
         self.setCentralWidget(tabs)  # umieszczenie zakładek w oknie
 
+    def closeEvent(self, event) -> None:
+        """
+        Zamknięcie procesów rysujących wykresy razem z oknem
+        :param event: zdarzenie zamknięcia
+        :return: None
+        """
+        self.chart.renderer.shutdown()
+        super(MainWindow, self).closeEvent(event)
+
 
 ### Zakładki ###
 
 
 class Config(QWidget):
 
+    WATCH_DELAY_MS = 500  # opóźnienie wczytania zmienionego pliku
+    NO_GROUP = "(brak)"  # pozycja listy grupowania oznaczająca jeden ranking dla wszystkich elementów
+    DENSE = "(brak obsługi)"  # pozycja listy braków wartości oznaczająca zwykłą macierz gęstą
+
     def __init__(self, parent: MainWindow):
         """
         Zakładka z konfiguracją danych do obliczeń
@@ -97,7 +144,7 @@ class Config(QWidget):
 
         ### Układ konfiguracji ###
 
-        label_choose_file = QLabel("Wybierz plik .xlsx z bazą przedmiotów")  # etykieta z poleceniem
+        label_choose_file = QLabel("Wybierz plik .xlsx lub bazę SQLite z przedmiotami")  # etykieta z poleceniem
         font_choose_file = label_choose_file.font()
         font_choose_file.setPointSize(12)
         label_choose_file.setFont(font_choose_file)  # ustawienie wielkości czcionki
@@ -136,7 +183,7 @@ class Config(QWidget):
         layout_choose_method.addWidget(label_method_name)  # dodanie widżetu do układu
 
         combo_method = QComboBox()  # lista wyboru metod
-        combo_method.addItems(["TOPSIS", "RSM", "SP-CS"])  # dostępne metody
+        combo_method.addItems(["TOPSIS", "RSM", "SP-CS", "PROMETHEE II"])  # dostępne metody
         font_combo_method = combo_method.font()
         font_combo_method.setPointSize(12)
         combo_method.setFont(font_combo_method)
@@ -158,6 +205,13 @@ class Config(QWidget):
         combo_metric.currentTextChanged.connect(self.choose_metric)
         layout_metric.addWidget(combo_metric)
 
+        label_preference = QLabel("Funkcja preferencji (PROMETHEE II): ")
+        layout_metric.addWidget(label_preference)
+        combo_preference = QComboBox()
+        combo_preference.addItems(PREFERENCES)
+        combo_preference.currentTextChanged.connect(self.choose_preference)
+        layout_metric.addWidget(combo_preference)
+
         #combo_method.currentTextChanged.connect(lambda state, combobox=combo_method, frame=frame_metric:
         #                                        self.set_frame_visibility(combobox, frame))     # po zmianie na topsis ramka nie znika
 
@@ -167,6 +221,61 @@ class Config(QWidget):
 
         layout_config.addLayout(layout_metric)
 
+        layout_constraints = QVBoxLayout()  # twarde ograniczenia odrzucające elementy przed rankingiem
+        label_constraints = QLabel("Ograniczenia (oddzielone ;):")
+        layout_constraints.addWidget(label_constraints)
+        self.edit_constraints = QLineEdit()
+        self.edit_constraints.setPlaceholderText("np. `Cena za metr kwadratowy` <= 90; k4 <= 5")
+        layout_constraints.addWidget(self.edit_constraints)
+        self.label_survivors = QLabel("")  # etykieta z liczbą elementów spełniających ograniczenia
+        layout_constraints.addWidget(self.label_survivors)
+        layout_config.addLayout(layout_constraints)
+
+        layout_dedup = QHBoxLayout()  # scalanie elementów o identycznych wartościach kryteriów
+        self.checkbox_dedup = QCheckBox("Scal duplikaty")
+        self.checkbox_dedup.setToolTip("TOPSIS: normy ważone liczebnością grup, ranking jak bez scalania.\n"
+                                       "Pozostałe metody i tryby: każda grupa liczona jak jeden element")
+        layout_dedup.addWidget(self.checkbox_dedup)
+        layout_dedup.addWidget(QLabel("zaokrąglenie do miejsc po przecinku:"))
+        self.spin_decimals = QSpinBox()
+        self.spin_decimals.setRange(-1, 10)
+        self.spin_decimals.setSpecialValueText("bez zaokrąglenia")  # wartość -1 - porównanie dokładne
+        self.spin_decimals.setValue(-1)
+        layout_dedup.addWidget(self.spin_decimals)
+        layout_config.addLayout(layout_dedup)
+        self.collapsed = None  # źródło ze scalonymi duplikatami (zachowane między obliczeniami)
+        self.ranking_source = None  # źródło, z którego wyliczono ostatni ranking
+        self.unwatchable = None  # tryb ostatniego rankingu, którego obserwacja pliku nie odtwarza (None - zwykły)
+        self.ranking_inputs = None  # ustawienia ostatniego rankingu (RankingInputs)
+
+        layout_group = QHBoxLayout()  # rankingi liczone osobno w każdej grupie (TOPSIS, RSM)
+        layout_group.addWidget(QLabel("Grupuj według:"))
+        self.combo_group = QComboBox()
+        self.combo_group.addItem(self.NO_GROUP)
+        layout_group.addWidget(self.combo_group)
+        self.edit_bins = QLineEdit()
+        self.edit_bins.setPlaceholderText("progi przedziałów, np. 100; 300; 600")
+        layout_group.addWidget(self.edit_bins)
+        layout_config.addLayout(layout_group)
+
+        layout_missing = QHBoxLayout()  # dane z brakami wartości liczone na macierzy rzadkiej (TOPSIS, RSM)
+        layout_missing.addWidget(QLabel("Braki wartości:"))
+        self.combo_missing = QComboBox()
+        self.combo_missing.addItems([self.DENSE] + list(POLICIES))
+        layout_missing.addWidget(self.combo_missing)
+        layout_config.addLayout(layout_missing)
+
+        layout_classes = QHBoxLayout()  # klasy odniesienia metody RSM
+        layout_classes.addWidget(QLabel("Klasy odniesienia RSM:"))
+        self.combo_classes = QComboBox()
+        self.combo_classes.addItems(list(CLASSES))
+        layout_classes.addWidget(self.combo_classes)
+        layout_config.addLayout(layout_classes)
+
+        button_reduce = QPushButton("Redukcja kryteriów")  # grupy skorelowanych kryteriów i propozycja pominięcia
+        button_reduce.clicked.connect(self.suggest_reduction)
+        layout_config.addWidget(button_reduce)
+
         button_compute = QPushButton(self)  # przycisk wyliczający ranking
         button_compute.setText("Wylicz ranking")  # nazwa przycisku
         font_compute = button_compute.font()
@@ -175,6 +284,32 @@ class Config(QWidget):
         button_compute.clicked.connect(self.compute)  # przypisanie akcji
         layout_config.addWidget(button_compute)
 
+        button_export = QPushButton(self)  # przycisk zapisujący ranking do pliku
+        button_export.setText("Eksportuj ranking")
+        button_export.setFont(font_compute)
+        button_export.clicked.connect(self.export)  # przypisanie akcji
+        layout_config.addWidget(button_export)
+
+        self.checkbox_progressive = QCheckBox("Wynik przybliżony w trakcie obliczeń (TOPSIS)")
+        layout_config.addWidget(self.checkbox_progressive)
+        self.progressive = None  # wątek rankingu przybliżonego
+
+        self.checkbox_intervals = QCheckBox("Kryteria przedziałowe - kolumny \"od\" i \"do\" (TOPSIS)")
+        layout_config.addWidget(self.checkbox_intervals)
+
+        self.checkbox_watch = QCheckBox("Obserwuj plik")  # przeliczanie rankingu po zmianie pliku
+        self.checkbox_watch.toggled.connect(self.toggle_watch)
+        layout_config.addWidget(self.checkbox_watch)
+        self.label_changes = QLabel("")  # zmiany rankingu po ostatniej zmianie pliku
+        layout_config.addWidget(self.label_changes)
+        self.watcher = None  # obserwowany ranking
+        self.file_watcher = QFileSystemWatcher(self)
+        self.file_watcher.fileChanged.connect(self.on_file_changed)
+        self.watch_timer = QTimer(self)  # opóźnienie, aby nie czytać pliku w trakcie zapisu
+        self.watch_timer.setSingleShot(True)
+        self.watch_timer.setInterval(self.WATCH_DELAY_MS)
+        self.watch_timer.timeout.connect(self.refresh_watched)
+
         label_results = QLabel("Wyniki metody:")  # etykieta z poleceniem
         font_results = label_results.font()
         font_results.setPointSize(12)
@@ -192,6 +327,9 @@ class Config(QWidget):
         self.results.setAlignment(Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignHCenter)  # rozmieszczenie
         layout_config.addWidget(self.results)  # dodanie widżetu do układu
 
+        self.weights_panel = WeightsPanel(self.parent)  # panel wag metody topsis
+        self.weights_panel.ranking_changed.connect(self.results.setText)
+
         self.setLayout(layout)  # ustanowienie układu
 
     ### Akcje ###
@@ -201,10 +339,20 @@ class Config(QWidget):
         Wybranie pliku z danymi
         :return: None
         """
+        file_name = QFileDialog.getOpenFileName(self, filter="Bazy przedmiotów (*.xlsx *.db *.sqlite *.sqlite3)")[0]
+        if not file_name:  # anulowano wybór pliku
+            return
+        self.checkbox_watch.setChecked(False)  # obserwacja dotyczy poprzedniego pliku
         self.clear_layout()
-        self.parent.file_name = QFileDialog.getOpenFileName(self, filter="*.xlsx")[0]  # nazwa pliku
+        self.parent.crit_numbers = []
+        self.parent.file_name = file_name  # nazwa pliku
+        self.parent.source = open_source(file_name)  # źródło danych dobrane do rozszerzenia
         self.label_file_name.setText("Wybrany plik: " + self.parent.file_name)  # aktualizacja etykiety
         self.parent.crits_in_orig_file = self.create_temporary_df()
+        self.parent.items_total = self.parent.source.count()
+        self.label_survivors.setText("")
+        self.combo_group.clear()
+        self.combo_group.addItems([self.NO_GROUP] + self.parent.source.criteria_names())
         self.parent.checkboxes = [QCheckBox(f'Kryterium {i + 1}') for i in range(self.parent.crits_in_orig_file)]
         for checkbox in self.parent.checkboxes:
             self.layout_choose_categories.addWidget(checkbox)
@@ -214,17 +362,7 @@ class Config(QWidget):
             checkbox.clicked.connect(self.on_checkbox_clicked)
 
     def create_temporary_df(self) -> int:
-        df = pd.read_excel(self.parent.file_name)  # wczytanie excel z bazą słuchawek
-        D = []  # macierz decyzyjna
-        c_names = []  # wektor nazw kryteriów
-        for j in df.columns:
-            if j == 'Lp.' or j == 'Nazwa':
-                continue
-            if j == 'Wagi':
-                break
-            D.append(df[j].tolist())
-            c_names.append(j)
-        return len(c_names)
+        return len(self.parent.source.criteria_names())  # tylko nagłówek, bez wczytywania danych
 
     def clear_layout(self) -> None:
         while self.layout_choose_categories.count() != 1:
@@ -264,60 +402,388 @@ class Config(QWidget):
         """
         if self.parent.file_name is not None:
 
-            if len(self.parent.crit_numbers) < 2:
-                QMessageBox.warning(self, "Nieprawidłowe dane", "Wybierz co najmniej 2 kryteria",
-                                buttons=QMessageBox.StandardButton.Ok)
-
-            elif self.parent.method == "TOPSIS":    # jeśli wybrano metodę topsis
-
-                test_window = SetWeightsWindow(self.parent)
-                test_window.exec()  # wyświetl okno pytające o wagi
-
-                if test_window.isHidden():  # jeślin okno zostanie schowane (automatycznie po zatwierdzeniu wag)
+            rank = self.results.text()
+            source = self.data_source()
+            constraints = Constraints.parse(self.edit_constraints.text())
+            try:
+                constraints.split(self.parent.source.criteria_names())  # sprawdzenie ograniczeń przed obliczeniami
+            except ValueError as error:
+                QMessageBox.warning(self, "Nieprawidłowe ograniczenia", str(error),
+                                    buttons=QMessageBox.StandardButton.Ok)
+                return
+
+            unwatchable = "scalanie duplikatów" if isinstance(source, CollapsedSource) else None
+            W_max = None  # wektor maksymalizacji wierszy macierzy D, jeśli nie wynika wprost z wybranych kryteriów
+            try:  # np. żaden element nie spełnia ograniczeń albo nieprawidłowe dane w pliku
+                if len(self.parent.crit_numbers) < 2:
+                    QMessageBox.warning(self, "Nieprawidłowe dane", "Wybierz co najmniej 2 kryteria",
+                                    buttons=QMessageBox.StandardButton.Ok)
+                    return
+
+                elif self.combo_group.currentIndex() > 0 and self.parent.method in ("TOPSIS", "RSM"):
+
+                    try:
+                        bins = [float(v) for v in self.edit_bins.text().replace(',', '.').split(';') if v.strip()]
+                    except ValueError:
+                        QMessageBox.warning(self, "Nieprawidłowe dane", "Progi przedziałów muszą być liczbami",
+                                            buttons=QMessageBox.StandardButton.Ok)
+                        return
+                    weights = self.parent.weights if len(self.parent.weights) == len(self.parent.crit_numbers) else None
+                    rank, self.parent.criteria, self.parent.items_names, self.parent.D, self.parent.scores, _, _ = \
+                        compute_grouped(source, self.parent.crit_numbers, self.combo_group.currentText(),
+                                        self.parent.method, self.parent.chosen_metric, weights, bins or None,
+                                        constraints=constraints)
+                    self.parent.n = len(self.parent.criteria)
+                    self.clear_chart_data()  # osobne normy i punkty odniesienia w każdej grupie
+                    unwatchable = "ranking w grupach"
+
+                elif self.combo_missing.currentIndex() > 0 and self.parent.method in ("TOPSIS", "RSM"):
+
+                    weights = self.parent.weights if len(self.parent.weights) == len(self.parent.crit_numbers) else None
+                    rank, self.parent.criteria, self.parent.items_names, S, self.parent.scores = \
+                        compute_sparse(source, self.parent.crit_numbers, self.parent.method, self.parent.chosen_metric,
+                                       self.combo_missing.currentText(), weights, constraints=constraints)
+                    self.parent.D = to_dense(S)  # braki jako NaN w eksporcie
+                    self.parent.n = len(self.parent.criteria)
+                    self.clear_chart_data()  # brak jednej macierzy znormalizowanej bez braków
+                    unwatchable = "braki wartości"
+
+                elif self.parent.method == "TOPSIS" and self.checkbox_intervals.isChecked():
+
+                    weights = self.parent.weights if len(self.parent.weights) == len(self.parent.crit_numbers) else None
+                    rank, self.parent.criteria, self.parent.items_names, L, H, scores, W_max = \
+                        compute_interval_topsis(source, self.parent.crit_numbers, self.parent.chosen_metric, weights,
+                                                constraints=constraints)
+                    self.parent.D = (L + H) / 2  # środki przedziałów w eksporcie
+                    self.parent.scores = ((scores.lower + scores.upper) / 2).tolist()
+                    self.parent.n = len(self.parent.criteria)
+                    self.clear_chart_data()  # elementy są przedziałami, a nie punktami
+                    unwatchable = "ranking przedziałowy"
+
+                elif self.parent.method == "TOPSIS" and self.checkbox_progressive.isChecked():
+
+                    self.ranking_source = source
+                    self.unwatchable = unwatchable
+                    self.ranking_inputs = self.current_inputs(constraints)
+                    # wyniki przybliżone pojawiają się w trakcie obliczeń
+                    self.start_progressive(source, constraints)
+                    return
+
+                elif self.parent.method == "TOPSIS":    # jeśli wybrano metodę topsis
+
+                    # dane niezależne od wag są liczone raz, a panel wag przelicza z nich ranking na bieżąco
+                    self.show_topsis(*load_topsis_cache(source, self.parent.crit_numbers,
+                                                        self.parent.chosen_metric, constraints=constraints))
+                    rank = self.results.text()
+
+                elif self.parent.method == "RSM":
 
-                    self.parent.weights = test_window.weights   # przekaż te wagi rodzicowi
-                    # wykonaj metodę
                     rank, self.parent.n, self.parent.N, self.parent.p_ideal, self.parent.p_anti_ideal, \
-                    self.parent.criteria, self.parent.items_names = \
-                        compute_topsis(self.parent.file_name, self.parent.crit_numbers, self.parent.chosen_metric,
-                                       self.parent.weights)
-
-            elif self.parent.method == "RSM":
-
-                rank, self.parent.n, self.parent.N, self.parent.p_ideal, self.parent.p_anti_ideal, \
-                    self.parent.quo_point_median, self.parent.quo_point_mean, \
-                    self.parent.criteria, self.parent.items_names = \
-                    compute_rsm(self.parent.file_name, self.parent.crit_numbers, self.parent.chosen_metric)
-
-            elif self.parent.method == "SP-CS":
-
-                if len(self.parent.crit_numbers) == 2:
-                    rank, self.parent.n, self.parent.data_0, self.parent.data_1, self.parent.quo_point_mean, \
-                        self.parent.quo_point_median, self.parent.quo_point_random, self.parent.dap1, self.parent.dap2, \
-                        self.parent.dap3, self.parent.criteria, self.parent.items_names = \
-                        compute_sp_cs(self.parent.file_name, self.parent.crit_numbers, self.parent.chosen_metric)
-                else:
-                    QMessageBox.warning(self, "Nieprawidłowe dane", "Metoda SP-CS działa tylko dla 2 kryteriów",
-                                buttons=QMessageBox.StandardButton.Ok)
-
-            else:
-                rank, self.parent.n, self.parent.N, self.parent.p_ideal, self.parent.p_anti_ideal, \
-                    self.parent.criteria, self.parent.items_names = compute_topsis(self.parent.file_name)
+                        self.parent.quo_point_median, self.parent.quo_point_mean, \
+                        self.parent.criteria, self.parent.items_names, self.parent.D, self.parent.scores = \
+                        compute_rsm(source, self.parent.crit_numbers, self.parent.chosen_metric,
+                                    constraints=constraints, classes=self.combo_classes.currentText())
+
+                elif self.parent.method == "SP-CS":
+
+                    if len(self.parent.crit_numbers) == 2:
+                        rank, self.parent.n, self.parent.data_0, self.parent.data_1, self.parent.quo_point_mean, \
+                            self.parent.quo_point_median, self.parent.quo_point_random, self.parent.dap1, \
+                            self.parent.dap2, self.parent.dap3, self.parent.criteria, self.parent.items_names, \
+                            self.parent.D, self.parent.scores = \
+                            compute_sp_cs(source, self.parent.crit_numbers, self.parent.chosen_metric,
+                                          constraints=constraints)
+                    else:
+                        QMessageBox.warning(self, "Nieprawidłowe dane", "Metoda SP-CS działa tylko dla 2 kryteriów",
+                                    buttons=QMessageBox.StandardButton.Ok)
+                        return
+
+                elif self.parent.method == "PROMETHEE II":
+
+                    weights = self.parent.weights if len(self.parent.weights) == len(self.parent.crit_numbers) else None
+                    rank, self.parent.n, self.parent.criteria, self.parent.items_names, self.parent.D, \
+                        self.parent.scores = compute_promethee(source, self.parent.crit_numbers,
+                                                               self.parent.chosen_preference, weights,
+                                                               constraints=constraints)
+            except ValueError as error:
+                QMessageBox.warning(self, "Nie można wyliczyć rankingu", str(error),
+                                    buttons=QMessageBox.StandardButton.Ok)
+                return
+            self.parent.ranking_method = self.parent.method
+            self.ranking_source = source
+            self.unwatchable = unwatchable
+            self.ranking_inputs = self.current_inputs(constraints)
+            self.parent.W_max = W_max if W_max is not None else self.criteria_directions(self.ranking_inputs.criteria)
+            self.refresh_watch()
             self.results.setText(rank)
+            survivors = "Pozostało alternatyw: {} z {}".format(len(self.parent.items_names), self.parent.items_total)
+            if isinstance(source, CollapsedSource):
+                survivors += " (po scaleniu duplikatów)"
+            self.label_survivors.setText(survivors)
         else:
             QMessageBox.warning(self, "Brak danych", "Najpierw załaduj dane w oknie Konfiguracja",
                                 buttons=QMessageBox.StandardButton.Ok)
 
-    def continue_after_weights_set(self, test_window):
+    @pyqtSlot()
+    def suggest_reduction(self) -> None:
+        """
+        Raport grup skorelowanych kryteriów z porównaniem rankingu po pominięciu kryteriów i po rzutowaniu na
+        składowe główne, a po akceptacji odznaczenie pominiętych kryteriów
+        :return: None
+        """
+        if self.parent.file_name is None:
+            QMessageBox.warning(self, "Brak danych", "Najpierw załaduj dane w oknie Konfiguracja",
+                                buttons=QMessageBox.StandardButton.Ok)
+            return
+        if len(self.parent.crit_numbers) < 2:
+            QMessageBox.warning(self, "Nieprawidłowe dane", "Wybierz co najmniej 2 kryteria",
+                                buttons=QMessageBox.StandardButton.Ok)
+            return
+        try:
+            D, c_names, _, W_file, W_max = load_screened(self.data_source(), self.parent.crit_numbers,
+                                                         constraints=Constraints.parse(self.edit_constraints.text()))
+        except ValueError as error:
+            QMessageBox.warning(self, "Nieprawidłowe ograniczenia", str(error), buttons=QMessageBox.StandardButton.Ok)
+            return
+        W = self.parent.weights if len(self.parent.weights) == len(c_names) else W_file
+        method = self.parent.method if self.parent.method in ("TOPSIS", "RSM") else "TOPSIS"
+        pruned, projected = prune(D, c_names, W, W_max), pca(D, W, W_max)
+        report = '{}:\n'.format(method)
+        for title, reduction in (("Pominięcie kryteriów", pruned), ("Składowe główne", projected)):
+            quality = compare_reduction(D, W, W_max, reduction, method, self.parent.chosen_metric)
+            report += '\n{}:\n{}'.format(title, reduction_report(reduction, c_names, quality))
+        if not pruned.dropped:
+            QMessageBox.information(self, "Redukcja kryteriów", report, buttons=QMessageBox.StandardButton.Ok)
+            return
+        answer = QMessageBox.question(self, "Redukcja kryteriów", report + '\nOdznaczyć pominięte kryteria?')
+        if answer == QMessageBox.StandardButton.Yes:
+            selected = sorted(self.parent.crit_numbers)
+            for j in pruned.dropped:
+                self.parent.checkboxes[selected[j] - 1].setChecked(False)
+                self.parent.crit_numbers.remove(selected[j])
+
+    def data_source(self) -> DataSource:
+        """
+        Źródło danych do rankingu: po scaleniu duplikatów, jeśli zaznaczono tę opcję
+        :return: (DataSource) : źródło danych
+        """
+        if not self.checkbox_dedup.isChecked():
+            return self.parent.source
+        decimals = self.spin_decimals.value() if self.spin_decimals.value() >= 0 else None
+        if self.collapsed is None or self.collapsed.source is not self.parent.source or \
+                self.collapsed.decimals != decimals:
+            self.collapsed = CollapsedSource(self.parent.source, decimals)  # grupy liczone raz dla pliku
+        return self.collapsed
+
+    def clear_chart_data(self) -> None:
+        """
+        Usunięcie danych wykresów poprzedniego rankingu, gdy bieżący ranking nie ma jednej macierzy znormalizowanej
+        i jednego zestawu punktów odniesienia (ranking w grupach, z brakami wartości, przedziałowy)
+        :return: None
+        """
+        self.parent.N = []
+        self.parent.p_ideal = []
+        self.parent.p_anti_ideal = []
+        self.parent.quo_point_mean = []
+        self.parent.quo_point_median = []
+
+    def show_topsis(self, cache: TopsisCache, D: np.ndarray, c_names: List[str], items_names: List[str],
+                    W_file: List[float]) -> None:
+        """
+        Przekazanie danych metody topsis do panelu wag i wyświetlenie rankingu
+        :param cache: (TopsisCache) : dane metody topsis niezależne od wag
+        :param D: (np.ndarray) : macierz decyzyjna
+        :param c_names: (List[str]) : lista nazw kryteriów
+        :param items_names: (List[str]) : lista nazw elementów
+        :param W_file: (List[float]) : wektor wag z pliku
+        :return: None
+        """
+        self.parent.D, self.parent.criteria, self.parent.items_names = D, c_names, items_names
+        self.parent.W_max = cache.W_max.tolist()
+        self.parent.n = len(self.parent.criteria)
+        if len(self.parent.weights) != self.parent.n:  # wagi z pliku dla nowego zestawu kryteriów
+            self.parent.weights = W_file if len(W_file) == self.parent.n else [1.0] * self.parent.n
+        self.weights_panel.set_data(cache, self.parent.criteria, self.parent.weights)
+        self.weights_panel.show()  # okno niemodalne
+        self.weights_panel.rescore()
+
+    def start_progressive(self, source: DataSource, constraints: Constraints) -> None:
+        """
+        Uruchomienie rankingu przybliżonego w osobnym wątku
+        :param source: (DataSource) : źródło danych
+        :param constraints: (Constraints) : twarde ograniczenia
+        :return: None
+        """
+        if self.progressive is not None and self.progressive.isRunning():
+            self.progressive.requestInterruption()  # poprzednie obliczenia nie są już potrzebne
+            self.progressive.wait()
+        weights = self.parent.weights if len(self.parent.weights) == len(self.parent.crit_numbers) else None
+        self.progressive = ProgressiveWorker(source, self.parent.crit_numbers,
+                                             self.parent.chosen_metric, weights, constraints)
+        self.progressive.stage_ready.connect(self.on_stage)
+        self.progressive.failed.connect(lambda message: QMessageBox.warning(
+            self, "Nieprawidłowe dane", message, buttons=QMessageBox.StandardButton.Ok))
+        self.progressive.start()
+
+    @pyqtSlot(object)
+    def on_stage(self, stage: Stage) -> None:
+        """
+        Wyświetlenie kolejnego wyniku rankingu przybliżonego, a po wyniku dokładnym przejście do panelu wag
+        :param stage: (Stage) : wynik etapu
+        :return: None
+        """
+        if stage.result is None:
+            rank_str = 'Wynik przybliżony ({} z {} elementów, błąd do {:.2g}):\n'.format(stage.seen, stage.total,
+                                                                                       stage.bound)
+            for name, value in stage.top:
+                rank_str += name + ' : ' + '{0:1.3f}'.format(value) + '\n'
+            self.results.setText(rank_str)
+            return
+        self.show_topsis(*stage.result)
+        self.parent.ranking_method = "TOPSIS"
+        self.refresh_watch()
+        self.label_survivors.setText("Pozostało alternatyw: {} z {}".format(len(self.parent.items_names),
+                                                                         self.parent.items_total))
+
+    @pyqtSlot()
+    def export(self) -> None:
+        """
+        Zapis ostatniego rankingu do pliku .csv, .xlsx lub .parquet
+        :return: None
+        """
+        if self.parent.ranking_method is None or len(self.parent.scores) == 0:
+            QMessageBox.warning(self, "Brak danych", "Najpierw wylicz ranking",
+                                buttons=QMessageBox.StandardButton.Ok)
+            return
+        file_name = QFileDialog.getSaveFileName(self, filter="CSV (*.csv);;Excel (*.xlsx);;Parquet (*.parquet)")[0]
+        if not file_name:  # anulowano wybór pliku
+            return
+        items_names, scores, D = self.parent.items_names, self.parent.scores, self.parent.D
+        if isinstance(self.ranking_source, CollapsedSource):  # każdy element grupy z wynikiem grupy
+            items_names, idx = self.ranking_source.expand(items_names)
+            scores, D = np.asarray(scores)[idx], np.asarray(D)[:, idx]
+        try:
+            export_ranking(file_name, items_names, scores, D, self.parent.criteria, self.parent.ranking_method)
+        except (ValueError, ImportError) as error:
+            QMessageBox.warning(self, "Błąd eksportu", str(error), buttons=QMessageBox.StandardButton.Ok)
+
+    @pyqtSlot(bool)
+    def toggle_watch(self, checked: bool) -> None:
+        """
+        Włączenie lub wyłączenie obserwacji pliku dla ostatnio wyliczonego rankingu
+        :param checked: (bool) : stan pola wyboru
+        :return: None
+        """
+        if self.file_watcher.files():
+            self.file_watcher.removePaths(self.file_watcher.files())
+        self.watcher = None
+        self.label_changes.setText("")
+        if not checked:
+            return
+        if self.parent.ranking_method is None or self.parent.file_name is None:
+            QMessageBox.warning(self, "Brak danych", "Najpierw wylicz ranking",
+                                buttons=QMessageBox.StandardButton.Ok)
+            self.checkbox_watch.setChecked(False)
+            return
+        if self.unwatchable is not None:  # przeliczenie po zmianie pliku dałoby inny ranking niż wyświetlony
+            QMessageBox.warning(self, "Obserwacja pliku", "Obserwacja pliku nie obsługuje trybu: {}".format(
+                self.unwatchable), buttons=QMessageBox.StandardButton.Ok)
+            self.checkbox_watch.setChecked(False)
+            return
+        inputs = self.ranking_inputs
+        weights = self.parent.weights if self.parent.ranking_method == "TOPSIS" else inputs.weights
+        self.watcher = RankingWatcher(self.parent.file_name, inputs.criteria, inputs.metric,
+                                      self.parent.ranking_method, weights, inputs.constraints,
+                                      preference=inputs.preference, classes=inputs.classes)
+        self.watcher.load()
+        self.file_watcher.addPath(self.parent.file_name)
+
+    def current_inputs(self, constraints: Constraints) -> RankingInputs:
+        """
+        Zapamiętanie ustawień wyliczanego rankingu
+        :param constraints: (Constraints) : twarde ograniczenia użyte w obliczeniach
+        :return: (RankingInputs) : ustawienia rankingu
+        """
+        weights = self.parent.weights if len(self.parent.weights) == len(self.parent.crit_numbers) else None
+        return RankingInputs(sorted(self.parent.crit_numbers), self.parent.chosen_metric, constraints,
+                             None if weights is None else list(weights), self.parent.chosen_preference,
+                             self.combo_classes.currentText())
+
+    def criteria_directions(self, criteria: List[int]) -> List[bool]:
+        """
+        Wektor maksymalizacji wybranych kryteriów w kolejności wierszy macierzy decyzyjnej (jak w load_screened)
+        :param criteria: (List[int]) : lista wybranych kryteriów
+        :return: (List[bool]) : wektor maksymalizacji
+        """
+        W_max_all = self.parent.source.criteria_meta()[1]
+        return [bool(W_max_all[k - 1]) for k in sorted(criteria) if k - 1 < len(W_max_all)]
+
+    def refresh_watch(self) -> None:
+        """
+        Obserwacja pliku dla nowo wyliczonego rankingu, jeśli jest włączona
+        :return: None
+        """
+        if self.checkbox_watch.isChecked():
+            self.toggle_watch(True)
+
+    @pyqtSlot(str)
+    def on_file_changed(self, path: str) -> None:
+        self.watch_timer.start()  # seria zmian pliku wczytywana raz
 
-        rank, self.parent.n, self.parent.N, self.parent.p_ideal, self.parent.p_anti_ideal, \
-        self.parent.criteria, self.parent.items_names = \
-            compute_topsis(self.parent.file_name, self.parent.crit_numbers, self.parent.chosen_metric)
+    @pyqtSlot()
+    def refresh_watched(self) -> None:
+        """
+        Przeliczenie obserwowanego rankingu po zmianie pliku i wyświetlenie zmian pozycji
+        :return: None
+        """
+        if self.watcher is None:
+            return
+        if self.watcher.file_name not in self.file_watcher.files():  # plik nadpisany przez zastąpienie
+            self.file_watcher.addPath(self.watcher.file_name)
+        try:
+            changes = self.watcher.refresh()
+        except (OSError, ValueError, KeyError, BadZipFile) as error:  # np. plik w trakcie zapisu
+            self.label_changes.setText("Nie udało się wczytać pliku: {}".format(error))
+            return
+        if changes is None:
+            return
+        self.parent.items_names = self.watcher.items_names
+        self.parent.D = self.watcher.D
+        self.parent.scores = self.watcher.scores
+        if self.watcher.method == "TOPSIS":
+            self.weights_panel.cache = self.watcher.cache  # suwaki wag działają na nowych danych
+            self.weights_panel.rescore()
+        else:
+            if self.watcher.method == "RSM":  # punkty odniesienia z nowych danych, jak po wyliczeniu rankingu
+                self.parent.N = self.watcher.D
+                self.parent.p_ideal, self.parent.p_anti_ideal, self.parent.quo_point_median, \
+                    self.parent.quo_point_mean = self.watcher.points
+            elif self.watcher.method == "SP-CS":
+                self.parent.data_0, self.parent.data_1, self.parent.quo_point_mean, self.parent.quo_point_median, \
+                    self.parent.quo_point_random, self.parent.dap1, self.parent.dap2, self.parent.dap3 = \
+                    self.watcher.points
+            order, _ = rank_order(self.watcher.scores, HIGHER_IS_BETTER[self.watcher.method])
+            rank_str = ''
+            for i in order[:WeightsPanel.RANK_LIMIT]:
+                rank_str += self.parent.items_names[i] + ' : ' + '{0:1.3f}'.format(self.watcher.scores[i]) + '\n'
+            self.results.setText(rank_str)
+        self.label_changes.setText(rank_diff_report(changes))
+        self.label_survivors.setText("Pozostało alternatyw: {} z {}".format(len(self.parent.items_names),
+                                                                         open_source(self.watcher.file_name).count()))
 
     def choose_metric(self, value_from_combobox):
 
         self.parent.chosen_metric = value_from_combobox
 
+    @pyqtSlot(str)
+    def choose_preference(self, preference: str) -> None:
+        """
+        Wybranie funkcji preferencji metody PROMETHEE II
+        :param preference: (str) : funkcja preferencji z ComboBox
+        :return: None
+        """
+        self.parent.chosen_preference = preference
+
 
 class Sheet(QWidget):
 
@@ -347,7 +813,7 @@ class Sheet(QWidget):
         :return: None
         """
         if self.parent.file_name is not None:  # gdy jest ścieżka
-            df = pd.read_excel(self.parent.file_name)  # załadowanie danych
+            df = self.parent.source.frame()  # załadowanie danych
 
             df.fillna(" ", inplace=True)  # zastąpienie NaN pustym str
             self.table.setRowCount(df.shape[0])
@@ -367,6 +833,8 @@ class Sheet(QWidget):
 
 
 class Chart(QWidget):
+    panel_ready = pyqtSignal(str)  # klucz wykresu narysowanego w tle
+    NO_CHART = "Ranking w grupach, z brakami wartości lub przedziałowy nie ma jednego zestawu punktów odniesienia"
 
     def __init__(self, parent: MainWindow):
         """
@@ -381,23 +849,149 @@ class Chart(QWidget):
         self.canvas = FigureCanvasQTAgg(self.figure)
         self.toolbar = NavigationToolbar2QT(self.canvas, self)
 
+        self.renderer = ChartRenderer()  # wykresy wszystkich par rysowane w procesach roboczych
+        self.panel_keys = []  # klucze wykresów w kolejności listy par
+        self.panel_ready.connect(self.on_panel_ready)
+
+        self.image = QLabel()  # gotowy obraz wybranej pary
+        self.image.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.image.hide()
+        self.combo_pairs = QComboBox()  # wybór pary kryteriów
+        self.combo_pairs.currentIndexChanged.connect(self.show_panel)
+        self.combo_pairs.hide()
+
         self.button = QPushButton("Narysuj wykres")  # przycisk na rysowanie wykresu
         self.button.clicked.connect(self.plot_graph)
+        self.button_pairs = QPushButton("Wszystkie pary kryteriów")  # przycisk na rysowanie wszystkich par w tle
+        self.button_pairs.clicked.connect(self.plot_all_pairs)
+        self.button_agreement = QPushButton("Zgodność rankingów")  # mapa zgodności wszystkich metod i metryk
+        self.button_agreement.clicked.connect(self.plot_agreement)
 
         layout = QVBoxLayout()  # układ
         layout.addWidget(self.toolbar)
         layout.addWidget(self.canvas)
+        layout.addWidget(self.combo_pairs)
+        layout.addWidget(self.image)
         layout.addWidget(self.button)
+        layout.addWidget(self.button_pairs)
+        layout.addWidget(self.button_agreement)
         self.setLayout(layout)
 
+    def show_canvas(self, visible: bool) -> None:
+        """
+        Przełączenie między wykresem interaktywnym a obrazami wszystkich par
+        :param visible: (bool) : czy pokazać wykres interaktywny
+        :return: None
+        """
+        self.toolbar.setVisible(visible)
+        self.canvas.setVisible(visible)
+        self.combo_pairs.setVisible(not visible)
+        self.image.setVisible(not visible)
+
+    @pyqtSlot()
+    def plot_all_pairs(self) -> None:
+        """
+        Zlecenie narysowania wszystkich par kryteriów (i widoku 3D metody RSM) w tle
+        :return: None
+        """
+        method = self.parent.ranking_method  # metoda, którą naprawdę wyliczono ranking (nie wybór na liście)
+        if self.parent.file_name is None or self.parent.n == 0 or method not in ("TOPSIS", "RSM"):
+            QMessageBox.warning(self, "Brak danych",
+                                "Najpierw wylicz ranking metodą TOPSIS lub RSM w oknie Konfiguracja", buttons=QMessageBox.StandardButton.Ok)  # ostrzeżenie
+            return
+        if len(self.parent.N) == 0:
+            QMessageBox.warning(self, "Brak wykresu", self.NO_CHART, buttons=QMessageBox.StandardButton.Ok)
+            return
+        references = [("Punkt idealny", self.parent.p_ideal), ("Punkt antyidealny", self.parent.p_anti_ideal)]
+        if method == "RSM":
+            references += [("punkt quo średnia", self.parent.quo_point_mean),
+                           ("punkt quo mediana", self.parent.quo_point_median)]
+        # skrót danych i wyniku: ten sam ranking korzysta z obrazów narysowanych wcześniej
+        key_prefix = fingerprint(self.parent.D, self.parent.criteria, self.parent.items_names) + ':' + \
+            fingerprint(method, self.parent.N, *[point for _, point in references])
+        keys = self.renderer.render_all(method, self.parent.N, references, self.parent.items_names,
+                                        self.parent.criteria, key_prefix, self.panel_ready.emit)
+        self.panel_keys = list(keys)
+        self.combo_pairs.blockSignals(True)
+        self.combo_pairs.clear()
+        for panel in keys.values():
+            self.combo_pairs.addItem(' / '.join(self.parent.criteria[j] for j in panel))
+        self.combo_pairs.blockSignals(False)
+        self.show_canvas(False)
+        self.show_panel(0)
+
+    @pyqtSlot(int)
+    def show_panel(self, idx: int) -> None:
+        """
+        Wyświetlenie gotowego obrazu wybranej pary
+        :param idx: (int) : indeks pary na liście
+        :return: None
+        """
+        if not 0 <= idx < len(self.panel_keys):
+            return
+        image = self.renderer.get(self.panel_keys[idx])
+        if image is None:
+            self.image.setText("Trwa rysowanie wykresu...")
+            return
+        pixmap = QPixmap()
+        pixmap.loadFromData(image, "PNG")
+        self.image.setPixmap(pixmap)
+
+    @pyqtSlot(str)
+    def on_panel_ready(self, key: str) -> None:
+        """
+        Wyświetlenie obrazu, jeśli skończono rysować aktualnie wybraną parę
+        :param key: (str) : klucz narysowanego wykresu
+        :return: None
+        """
+        idx = self.combo_pairs.currentIndex()
+        if 0 <= idx < len(self.panel_keys) and self.panel_keys[idx] == key:
+            self.show_panel(idx)
+
+    @pyqtSlot()
+    def plot_agreement(self) -> None:
+        """
+        Mapa zgodności rankingów wszystkich metod i metryk dla ostatnio wczytanych danych
+        :return: None
+        """
+        if self.parent.file_name is None or len(self.parent.items_names) < 2:
+            QMessageBox.warning(self, "Brak danych", "Najpierw załaduj i wylicz dane w oknie Konfiguracja",
+                                buttons=QMessageBox.StandardButton.Ok)  # ostrzeżenie
+            return
+        W_max = self.parent.W_max  # kryteria wyliczonego rankingu, a nie bieżący wybór pól
+        weights = self.parent.weights if len(self.parent.weights) == len(self.parent.criteria) else None
+        methods = ("TOPSIS", "RSM", "SP-CS") if len(self.parent.criteria) == 2 else ("TOPSIS", "RSM")  # SP-CS dla 2
+        names, tau, rho, _ = rank_agreement(*variant_keys(self.parent.D, W_max, weights, methods))
+        values = np.where(np.tri(len(names), dtype=bool), tau, rho)  # tau-b pod przekątną, rho nad przekątną
+
+        self.show_canvas(True)
+        self.figure.clear()
+        ax = self.figure.add_subplot()
+        image = ax.imshow(values, vmin=-1, vmax=1, cmap='RdBu')
+        ax.set_xticks(range(len(names)), names, rotation=90, fontsize=6)
+        ax.set_yticks(range(len(names)), names, fontsize=6)
+        for i in range(len(names)):
+            for j in range(len(names)):
+                ax.text(j, i, '{:.2f}'.format(values[i, j]), ha='center', va='center', fontsize=5)
+        ax.set(title="Zgodność rankingów: tau-b Kendalla (dół) i rho Spearmana (góra)")
+        self.figure.colorbar(image, ax=ax)
+        self.figure.tight_layout()
+        self.canvas.draw()
+
     @pyqtSlot()
     def plot_graph(self) -> None:
         """
         Rysowanie wykresu
         :return: None
         """
+        method = self.parent.ranking_method  # metoda, którą naprawdę wyliczono ranking (nie wybór na liście)
         if self.parent.file_name is not None and self.parent.n != 0:
-            if self.parent.method == "TOPSIS" and self.parent.n == 2:  # rysowanie wykresu 2 zmiennych
+            if method in ("TOPSIS", "RSM") and len(self.parent.N) == 0 or \
+                    method == "SP-CS" and len(self.parent.data_0) == 0:
+                QMessageBox.warning(self, "Brak wykresu", self.NO_CHART, buttons=QMessageBox.StandardButton.Ok)
+                return
+            self.show_canvas(True)
+            if method == "TOPSIS" and self.parent.n == 2:  # rysowanie wykresu 2 zmiennych
                 self.figure.clear()
                 ax = self.figure.add_subplot()
                 ax.clear()
@@ -410,7 +1004,7 @@ class Chart(QWidget):
                        title="Parametry mieszkań na tle punktów idealnych metody TOPSIS")
                 ax.legend()
                 self.canvas.draw()
-            elif self.parent.method == "TOPSIS" and self.parent.n != 2:
+            elif method == "TOPSIS" and self.parent.n != 2:
                 criterion_choice = CriterionChoiceDialog(self, self.parent.criteria)  # wybór kryteriów do wyrysowania
                 criterion_choice.exec()
                 for idx, name in enumerate(self.parent.criteria):
@@ -430,7 +1024,7 @@ class Chart(QWidget):
                        title="Parametry mieszkań na tle punktów idealnych metody TOPSIS")
                 ax.legend()
                 self.canvas.draw()
-            elif self.parent.method == "SP-CS":
+            elif method == "SP-CS":
                 self.figure.clear()
                 ax = self.figure.add_subplot()
                 ax.clear()
@@ -454,7 +1048,7 @@ class Chart(QWidget):
                        title="Krzywa szkieletowa dla metody SP-CS")
                 ax.legend()
                 self.canvas.draw()
-            elif self.parent.method == "RSM" and self.parent.n == 2:
+            elif method == "RSM" and self.parent.n == 2:
                 self.figure.clear()
                 ax = self.figure.add_subplot()
                 ax.clear()
@@ -475,7 +1069,7 @@ class Chart(QWidget):
                        title="Wykres elementów dla metody RSM")
                 ax.legend()
                 self.canvas.draw()
-            elif self.parent.method == "RSM" and self.parent.n == 3:
+            elif method == "RSM" and self.parent.n == 3:
                 self.figure.clear()
                 ax = self.figure.add_subplot(111, projection='3d')
                 ax.clear()
@@ -501,6 +1095,29 @@ class Chart(QWidget):
                                 buttons=QMessageBox.StandardButton.Ok)  # ostrzeżenie
 
 
+class ProgressiveWorker(QThread):
+    """
+    Wątek liczący ranking przybliżony, aby okno nie było zablokowane przy dużych plikach
+    """
+
+    stage_ready = pyqtSignal(object)  # kolejny wynik (Stage)
+    failed = pyqtSignal(str)  # opis błędu
+
+    def __init__(self, source, criteria: List[int], metric: str, weights: List[float], constraints: Constraints):
+        super(ProgressiveWorker, self).__init__()
+        self.args = (source, list(criteria), metric, weights)
+        self.constraints = constraints
+
+    def run(self) -> None:
+        try:
+            for stage in progressive_topsis(*self.args, constraints=self.constraints):
+                if self.isInterruptionRequested():
+                    return
+                self.stage_ready.emit(stage)
+        except ValueError as error:
+            self.failed.emit(str(error))
+
+
 class CriterionChoiceDialog(QDialog):
 
     def __init__(self, parent: MainWindow, criteria: List[str]):
@@ -577,57 +1194,132 @@ class CriterionChoiceDialog(QDialog):
         self.criterion2 = criterion
 
 
-class SetWeightsWindow(QDialog):
+class WeightsPanel(QWidget):
     """
-    Okno do wyboru wartości wag dla metody Topsis
+    Niemodalny panel wag dla metody Topsis. Suwaki są powiązane tak, aby wagi sumowały się do 1, a ranking jest
+    przeliczany z zapamiętanej macierzy znormalizowanej po krótkiej przerwie w przesuwaniu suwaka
     """
 
+    ranking_changed = pyqtSignal(str)  # nowy ranking jako str
+
+    SLIDER_SCALE = 1000  # suma pozycji wszystkich suwaków
+    DEBOUNCE_MS = 30  # opóźnienie przeliczenia rankingu po zmianie wagi
+    RANK_LIMIT = 50  # liczba wyświetlanych pozycji rankingu
+
     def __init__(self, parent: MainWindow):
+        """
+        :param parent: (MainWindow) : okno rodzic
+        """
+        super(WeightsPanel, self).__init__(parent, Qt.WindowType.Window)  # osobne okno zamykane z oknem głównym
 
-        super(SetWeightsWindow, self).__init__()
+        self.parent = parent  # wskaźnik na rodzica
+        self.cache = None  # dane metody topsis niezależne od wag
+        self.sliders = []  # lista suwaków (zależy od liczby wybranych kryteriów)
+        self.labels = []  # etykiety z wartościami wag
 
         self.setWindowTitle("Wybór wartości wag")
-
         self.layout = QVBoxLayout()
-        self.spinboxes = []     # lista spinboxów (zależy od liczby wybranych checkboxów)
-        self.weights = []       # lista wag przypisanych do wybranych kryteriów
-
-        for _ in range(len(parent.crit_numbers)):    # stworzenie spinboxów
-
-            new_label = QLabel("Waga dla kryterium {}".format(parent.crit_numbers[_]))  # nie mogę przekazać nazw kryteriów, bo one są chyba dostępne po wyliczeniu rankingu
-            new_spinbox = QDoubleSpinBox()
-            new_spinbox.setRange(0, 1)
-            new_spinbox.setFixedSize(70, 20)
-            self.spinboxes.append(new_spinbox)
-
-            self.layout.addWidget(new_label)
-            self.layout.addWidget(new_spinbox)
-
-        button = QPushButton("OK!")     # przycisk zatwierdzający
-        button.clicked.connect(self.set_weights)
-
-        self.setFixedSize(300, 75 * len(self.spinboxes))
-        self.layout.addWidget(button)
         self.setLayout(self.layout)
 
-    def set_weights(self):
+        self.timer = QTimer(self)  # opóźnione przeliczenie rankingu
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DEBOUNCE_MS)
+        self.timer.timeout.connect(self.rescore)
+
+    def set_data(self, cache: TopsisCache, c_names: List[str], weights: List[float]) -> None:
         """
-        Wyznaczenie wag dla metody Topsis
-        :return:
+        Ustawienie danych metody topsis i utworzenie suwaków
+        :param cache: (TopsisCache) : dane metody topsis niezależne od wag
+        :param c_names: (List[str]) : lista nazw kryteriów
+        :param weights: (List[float]) : początkowe wagi
+        :return: None
         """
-        values = [spinbox.value() for spinbox in self.spinboxes]
-        summed_values = sum(values)
-        if summed_values > 0.99:
-            summed_values = 1
-        if summed_values != 1:    # jeśli wagi nie sumują się do 1, to należy je wpisać ponownie
+        self.cache = cache
+        while self.layout.count():  # usunięcie poprzednich suwaków
+            widget = self.layout.takeAt(0).widget()
+            if widget is not None:
+                widget.deleteLater()
+        self.sliders = []
+        self.labels = []
+
+        total = sum(weights)
+        positions = [round(w / total * self.SLIDER_SCALE) if total > 0 else 0 for w in weights]
+        if total <= 0:
+            positions = [self.SLIDER_SCALE // len(weights) for _ in weights]
+        positions[-1] += self.SLIDER_SCALE - sum(positions)  # wyrównanie zaokrągleń
+
+        for idx, name in enumerate(c_names):  # stworzenie suwaków
+            label = QLabel()
+            slider = QSlider(Qt.Orientation.Horizontal)
+            slider.setRange(0, self.SLIDER_SCALE)
+            slider.setValue(positions[idx])
+            slider.valueChanged.connect(lambda value, i=idx: self.on_slider_moved(i, value))
+            self.sliders.append(slider)
+            self.labels.append((label, name))
+            self.layout.addWidget(label)
+            self.layout.addWidget(slider)
+        self.update_labels()
+
+    def weights(self) -> List[float]:
+        """
+        Aktualne wagi z suwaków
+        :return: (List[float]) : wektor wag sumujący się do 1
+        """
+        return [slider.value() / self.SLIDER_SCALE for slider in self.sliders]
 
-            QMessageBox.warning(self, "Błąd", "Suma wag musi wynosić 1!",
-                                buttons=QMessageBox.StandardButton.Ok)
+    def update_labels(self) -> None:
+        for (label, name), w in zip(self.labels, self.weights()):
+            label.setText("Waga dla kryterium {}: {:.3f}".format(name, w))
 
+    def on_slider_moved(self, idx: int, value: int) -> None:
+        """
+        Przeskalowanie pozostałych suwaków tak, aby suma wag była równa 1
+        :param idx: (int) : indeks przesuniętego suwaka
+        :param value: (int) : nowa pozycja suwaka
+        :return: None
+        """
+        others = [i for i in range(len(self.sliders)) if i != idx]
+        if not others:
+            return
+        rest = self.SLIDER_SCALE - value  # do rozdzielenia między pozostałe suwaki
+        others_sum = sum(self.sliders[i].value() for i in others)
+        if others_sum > 0:
+            positions = [self.sliders[i].value() * rest // others_sum for i in others]
         else:
-            # w przeciwnym wypadku wybrane wartości są zapisywane a okno jest chowane
-            self.weights = values
-            self.hide()
+            positions = [rest // len(others) for _ in others]
+        positions[-1] += rest - sum(positions)
+        for i, position in zip(others, positions):
+            self.sliders[i].blockSignals(True)  # bez rekurencyjnego wywołania tej metody
+            self.sliders[i].setValue(position)
+            self.sliders[i].blockSignals(False)
+        self.update_labels()
+        self.timer.start()  # przeliczenie po zakończeniu serii zmian
+
+    @pyqtSlot()
+    def rescore(self) -> None:
+        """
+        Przeliczenie rankingu dla aktualnych wag bez ponownego wczytywania i normalizacji danych
+        :return: None
+        """
+        if self.cache is None:
+            return
+        W = self.weights()
+        c, p_ideal, p_anti_ideal = topsis_scores(self.cache, W)
+        self.parent.weights = W  # przekaż te wagi rodzicowi
+        self.parent.p_ideal = p_ideal.tolist()
+        self.parent.p_anti_ideal = p_anti_ideal.tolist()
+        self.parent.N = np.asarray(W)[:, None] * self.cache.U
+        self.parent.scores = c
+
+        k = min(self.RANK_LIMIT, len(c))  # tylko najlepsze pozycje, bez sortowania całego rankingu
+        top = np.argpartition(-c, k - 1)[:k] if k < len(c) else np.arange(len(c))
+        top = top[np.argsort(-c[top], kind='stable')]
+        rank_str = ''
+        for i in top:
+            rank_str += self.parent.items_names[i] + ' : ' + '{0:1.3f}'.format(c[i]) + '\n'  # zapis rankingu jako str
+        if k < len(c):
+            rank_str += '... ({} pozostałych)\n'.format(len(c) - k)
+        self.ranking_changed.emit(rank_str)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,171 @@
+from typing import List, Tuple, Optional, Union, NamedTuple
+import time
+import numpy as np
+import pandas as pd
+from topsis import TopsisCache, load_topsis_cache, _distance
+from agreement import TOP_K
+from data_source import DataSource, Filter
+from constraints import Constraints
+
+Number = Union[float, int]
+
+BLOCK_CELLS = 1 << 22  # liczba współczynników [profile x elementy] liczonych w jednym bloku
+PROFILE_BLOCK = 512  # maksymalna liczba profili w jednym bloku
+
+
+class BatchResult(NamedTuple):
+    """
+    Najlepsze elementy każdego profilu wag
+    """
+    top: np.ndarray  # indeksy k najlepszych elementów każdego profilu, od najlepszego [u x k]
+    scores: np.ndarray  # współczynniki skoringowe tych elementów [u x k]
+    seconds: float  # czas wyliczenia wszystkich profili
+    profiles_per_second: float  # przepustowość
+
+
+def profile_weights(profiles: List[List[Number]], n: int, selected: Optional[List[List[bool]]] = None) -> np.ndarray:
+    """
+    Macierz wag profili; kryterium niewybrane przez użytkownika ma wagę 0, co w metodzie topsis jest równoważne
+    pominięciu kryterium (normalizacja i punkty odniesienia są liczone osobno dla każdego kryterium)
+    :param profiles: (List[List[Number]]) : wagi profili [u x n]
+    :param n: (int) : liczba kryteriów
+    :param selected: (List[List[bool]]) : wybrane kryteria każdego profilu [u x n] (domyślnie wszystkie)
+    :return: (np.ndarray) : macierz wag [u x n]
+    """
+    W = np.atleast_2d(np.asarray(profiles, dtype=float))
+    if W.shape[1] != n:
+        raise ValueError("Profile mają {} wag, a kryteriów jest {}".format(W.shape[1], n))
+    if selected is not None:
+        W = np.where(np.asarray(selected, dtype=bool), W, 0.0)
+    if np.isnan(W).any() or (W < 0).any():
+        raise ValueError("Wagi profili muszą być nieujemne")
+    return W
+
+
+def _block_scores(cache: TopsisCache, W: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """
+    Współczynniki skoringowe bloku profili dla bloku elementów
+    :param cache: (TopsisCache) : dane z topsis_cache
+    :param W: (np.ndarray) : wagi bloku profili [u x n]
+    :param start: (int) : pierwszy element bloku
+    :param stop: (int) : element za ostatnim elementem bloku
+    :return: (np.ndarray) : współczynniki [u x b]; NaN zastąpione -inf
+    """
+    parts_star = tuple(part[:, start:stop] for part in cache.parts_star)
+    parts_minus = tuple(part[:, start:stop] for part in cache.parts_minus)
+    if cache.metric == "Chebyshev":  # maksimum zamiast sumy: kryterium po kryterium, bez tensora [u x n x b]
+        d_star = np.zeros((W.shape[0], stop - start))
+        d_minus = np.zeros((W.shape[0], stop - start))
+        for j in range(W.shape[1]):
+            np.maximum(d_star, W[:, j, None] * parts_star[0][j], out=d_star)
+            np.maximum(d_minus, W[:, j, None] * parts_minus[0][j], out=d_minus)
+    else:  # pozostałe metryki to mnożenie macierzy wag [u x n] przez składniki odległości [n x b]
+        d_star = _distance(parts_star, W, cache.metric)
+        d_minus = _distance(parts_minus, W, cache.metric)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.add(d_star, d_minus, out=d_star)
+        np.divide(d_minus, d_star, out=d_minus)
+    d_minus[np.isnan(d_minus)] = -np.inf
+    return d_minus
+
+
+def _top_k(top: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if scores.shape[1] <= k:
+        return top, scores
+    keep = np.argpartition(scores, scores.shape[1] - k, axis=1)[:, -k:]
+    return np.take_along_axis(top, keep, axis=1), np.take_along_axis(scores, keep, axis=1)
+
+
+def batch_topsis(cache: TopsisCache, profiles: List[List[Number]], top_k: int = TOP_K,
+                 selected: Optional[List[List[bool]]] = None) -> BatchResult:
+    """
+    Najlepsze elementy metody topsis dla wielu profili wag naraz. Macierz znormalizowana i składniki odległości są
+    wspólne, a odległości bloku profili od bloku elementów liczy jedno mnożenie macierzy
+    :param cache: (TopsisCache) : dane z topsis_cache
+    :param profiles: (List[List[Number]]) : wagi profili [u x n]
+    :param top_k: (int) : liczba najlepszych elementów każdego profilu
+    :param selected: (List[List[bool]]) : wybrane kryteria każdego profilu [u x n] (domyślnie wszystkie)
+    :return: (BatchResult) : najlepsze elementy, ich współczynniki i przepustowość
+    """
+    start_time = time.perf_counter()
+    n, m = cache.U.shape
+    if m == 0 or top_k < 1:
+        raise ValueError("Brak elementów do wyboru najlepszych")
+    W = profile_weights(profiles, n, selected)
+    u = W.shape[0]
+    k = min(top_k, m)
+    profile_block = max(1, min(PROFILE_BLOCK, u))
+    item_block = max(k, BLOCK_CELLS // profile_block)
+    top = np.empty((u, k), dtype=np.intp)
+    scores = np.empty((u, k))
+    for p in range(0, u, profile_block):
+        W_block = W[p:p + profile_block]
+        block_top = np.empty((W_block.shape[0], 0), dtype=np.intp)
+        block_scores = np.empty((W_block.shape[0], 0))
+        for start in range(0, m, item_block):
+            stop = min(start + item_block, m)
+            c = _block_scores(cache, W_block, start, stop)
+            keep = np.argpartition(c, c.shape[1] - k, axis=1)[:, -k:] if c.shape[1] > k \
+                else np.broadcast_to(np.arange(c.shape[1]), c.shape)
+            # k najlepszych z bloku, potem z k najlepszych dotychczas
+            block_top, block_scores = _top_k(np.hstack([block_top, keep + start]),
+                                             np.hstack([block_scores, np.take_along_axis(c, keep, axis=1)]), k)
+        order = np.lexsort((block_top, -block_scores))  # od najlepszego, remisy według kolejności elementów
+        top[p:p + profile_block] = np.take_along_axis(block_top, order, axis=1)
+        scores[p:p + profile_block] = np.take_along_axis(block_scores, order, axis=1)
+    seconds = time.perf_counter() - start_time
+    scores[np.isinf(scores)] = np.nan
+    return BatchResult(top, scores, seconds, u / seconds if seconds > 0 else float('inf'))
+
+
+def load_profiles(file_name: str, c_names: List[str]) -> Tuple[List[str], np.ndarray]:
+    """
+    Wczytanie profili wag z pliku .csv albo .xlsx: pierwsza kolumna to nazwa użytkownika, pozostałe to wagi kryteriów
+    (nagłówek - nazwa kryterium). Brak kolumny albo pusta komórka oznacza niewybrane kryterium
+    :param file_name: (str) : nazwa pliku
+    :param c_names: (List[str]) : nazwy kryteriów w kolejności macierzy decyzyjnej
+    :return: (Tuple[List[str], np.ndarray]) : nazwy użytkowników, macierz wag [u x n]
+    """
+    if file_name.lower().endswith('.csv'):
+        df = pd.read_csv(file_name)
+    else:
+        df = pd.read_excel(file_name)
+    unknown = [str(name) for name in df.columns[1:] if name not in c_names]
+    if unknown:
+        raise ValueError("Nieznane kryteria w profilach: {}".format(', '.join(unknown)))
+    W = df.reindex(columns=c_names).fillna(0.0).to_numpy(dtype=float)
+    return df.iloc[:, 0].astype(str).tolist(), W
+
+
+def compute_profiles(file_name: Union[str, DataSource], criteria: List[int], metric: str,
+                     profiles: Union[str, List[List[Number]]], users: Optional[List[str]] = None,
+                     top_k: int = TOP_K, filters: Optional[List[Filter]] = None,
+                     constraints: Optional[Constraints] = None) -> Tuple[str, List[str], List[List[str]], BatchResult]:
+    """
+    Funkcja wyliczająca z pliku najlepsze elementy metody topsis dla wielu profili wag
+    :param file_name: (Union[str, DataSource]) : nazwa pliku (.xlsx lub baza SQLite) albo źródło danych
+    :param criteria: (List[int]) : lista wybranych kryteriów
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param profiles: (Union[str, List[List[Number]]]) : plik profili (load_profiles) albo macierz wag [u x n]
+    w kolejności wybranych kryteriów
+    :param users: (List[str]) : nazwy użytkowników dla macierzy wag (domyślnie numery profili)
+    :param top_k: (int) : liczba najlepszych elementów każdego profilu
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia odrzucające elementy przed wyliczeniem rankingu
+    :return: (Tuple[str, List[str], List[List[str]], BatchResult]) : raport jako str, nazwy użytkowników, nazwy
+    najlepszych elementów każdego profilu, wynik wsadowy
+    """
+    cache, _, c_names, items_names, _ = load_topsis_cache(file_name, criteria, metric, filters, constraints)
+    if isinstance(profiles, str):
+        users, profiles = load_profiles(profiles, c_names)
+    result = batch_topsis(cache, profiles, top_k)
+    if users is None:
+        users = [str(i + 1) for i in range(result.top.shape[0])]
+
+    names = [[items_names[i] for i in row] for row in result.top]
+    report = ''
+    for user, row, scores in zip(users, names, result.scores):
+        report += user + ' : ' + ', '.join('{} ({:1.3f})'.format(name, s) for name, s in zip(row, scores)) + '\n'
+    report += 'Profile: {}, czas: {:.3f} s, {:.0f} profili/s\n'.format(len(users), result.seconds,
+                                                                         result.profiles_per_second)
+    return report, users, names, result
@@ -0,0 +1,165 @@
+from typing import List, Tuple, Optional, Union, Iterator, NamedTuple
+import time
+import numpy as np
+from topsis import TopsisCache, topsis_cache, topsis_scores, weighted_norms
+from data_source import DataSource, Filter, open_source
+from constraints import Constraints, screen
+
+Number = Union[float, int]
+
+SAMPLE_SIZE = 20000  # liczba losowych wierszy podglądu
+REFRESH_SECONDS = 0.5  # odstęp między kolejnymi przybliżonymi wynikami
+Z = 3.0  # szerokość przedziału ufności oszacowania norm (w odchyleniach standardowych)
+
+
+class Stage(NamedTuple):
+    """
+    Kolejny wynik rankingu przybliżonego. Ostatni etap jest dokładny i zawiera dane metody topsis
+    """
+    seen: int  # liczba elementów, na podstawie których wyliczono wynik
+    total: int  # liczba elementów spełniających ograniczenia (w wynikach przybliżonych oszacowana)
+    top: List[Tuple[str, float]]  # najlepsze elementy (nazwa, współczynnik)
+    # szacowany błąd współczynników czołówki z niepewności norm (0 - wynik dokładny), bez zmian skrajnych
+    # wartości w jeszcze nieprzeczytanych wierszach
+    bound: float
+    result: Optional[Tuple[TopsisCache, np.ndarray, List[str], List[str], List[float]]]  # jak load_topsis_cache
+
+
+def _top(c: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Indeksy najlepszych elementów od najlepszego
+    """
+    key = np.nan_to_num(c, nan=-np.inf)
+    k = min(top_k, len(key))
+    idx = np.argpartition(-key, k - 1)[:k] if k < len(key) else np.arange(len(key))
+    return idx[np.lexsort((idx, -key[idx]))]
+
+
+def _estimate(items_names: List[str], D: np.ndarray, W_max: List[bool], metric: str, W: List[Number],
+              norms: np.ndarray, extremes: Tuple[np.ndarray, np.ndarray], rel: np.ndarray, top_k: int) \
+        -> Tuple[List[Tuple[str, float]], float]:
+    """
+    Ranking dla oszacowanych norm i szacowany błąd współczynników najlepszych elementów
+    :param rel: (np.ndarray) : względna niepewność norm kolumn
+    :return: (Tuple[List[Tuple[str, float]], float]) : najlepsze elementy, szacowany błąd
+    """
+    c = topsis_scores(topsis_cache(D, W_max, metric, norms=norms, extremes=extremes), W)[0]
+    idx = _top(c, top_k)
+    bound = 0.0
+    for scale in (1.0 - rel, 1.0 + rel):  # przeliczenie czołówki na krańcach przedziału ufności norm
+        shifted_cache = topsis_cache(D[:, idx], W_max, metric, norms=norms * scale, extremes=extremes)
+        shifted = topsis_scores(shifted_cache, W)[0]
+        bound = max(bound, float(np.nanmax(np.abs(shifted - c[idx]), initial=0.0)))
+    return [(items_names[i], float(c[i])) for i in idx], bound
+
+
+def _relative_error(squares: np.ndarray, fourth: np.ndarray, count: int, total: int) -> np.ndarray:
+    """
+    Względna niepewność norm oszacowanych z części elementów (średnia kwadratów z poprawką na skończoną
+    populację)
+    :param squares: (np.ndarray) : sumy kwadratów kolumn
+    :param fourth: (np.ndarray) : sumy czwartych potęg kolumn
+    :param count: (int) : liczba elementów w części
+    :param total: (int) : liczba wszystkich elementów
+    :return: (np.ndarray) : względna niepewność norm
+    """
+    mean = squares / count
+    variance = np.maximum(fourth / count - np.square(mean), 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rel = 0.5 * Z * np.sqrt(variance / count) / mean * np.sqrt(max(0.0, 1.0 - count / max(total, 1)))
+    return np.nan_to_num(rel, nan=0.0, posinf=0.0)
+
+
+def progressive_topsis(file_name: Union[str, DataSource], criteria: List[int], metric: str,
+                       W: Optional[List[Number]] = None, filters: Optional[List[Filter]] = None,
+                       constraints: Optional[Constraints] = None, top_k: int = 20, sample_size: int = SAMPLE_SIZE,
+                       refresh: float = REFRESH_SECONDS, seed: int = 0) -> Iterator[Stage]:
+    """
+    Ranking metodą topsis wyliczany etapami: najpierw z losowej próbki, potem z kolejnych paczek danych
+    z oszacowanymi normami, a na końcu dokładnie, tak samo jak w funkcji topsis
+    :param file_name: (Union[str, DataSource]) : nazwa pliku (.xlsx lub baza SQLite) albo źródło danych
+    :param criteria: (List[int]) : lista wybranych kryteriów
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param W: (List[Number]) : wektor wag (domyślnie z pliku)
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia
+    :param top_k: (int) : liczba najlepszych elementów w wynikach pośrednich
+    :param sample_size: (int) : liczba wierszy losowej próbki
+    :param refresh: (float) : najkrótszy odstęp między wynikami pośrednimi w sekundach
+    :param seed: (int) : ziarno losowania próbki
+    :return: (Iterator[Stage]) : kolejne wyniki, ostatni dokładny
+    """
+    source = open_source(file_name)
+    all_names = source.criteria_names()
+    criteria = sorted(criteria)
+    c_names = [all_names[k - 1] for k in criteria]
+    W_all, W_max_all = source.criteria_meta()
+    W_file = [W_all[k - 1] for k in criteria if k - 1 < len(W_all)]
+    W_max = [W_max_all[k - 1] for k in criteria if k - 1 < len(W_max_all)]
+    if not W:
+        W = W_file if len(W_file) == len(c_names) else [1.0] * len(c_names)
+
+    pushed, trees, names = constraints.split(all_names) if constraints else ([], [], {})
+    extra = [name for name in all_names if name in names.values() and name not in c_names]
+    columns = c_names + extra  # kolumny potrzebne tylko do ograniczeń są odrzucane po sprawdzeniu
+    filters = list(filters or []) + pushed
+    total = source.count(filters)  # liczba wierszy przed sprawdzeniem ograniczeń niedających się przekazać źródłu
+    n = len(c_names)
+
+    def screened(batch_names: List[str], values: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        if trees:
+            mask = screen(values, columns, trees, names)
+            values = values[:, mask]
+            batch_names = [name for name, keep in zip(batch_names, mask) if keep]
+        return batch_names, values[:n]
+
+    # podgląd z losowej próbki, normy oszacowane ze średniej kwadratów
+    drawn_names, drawn = source.sample(columns, sample_size, filters, seed)
+    sample_names, sample = screened(drawn_names, drawn)
+    if sample_names:
+        survivors = round(len(sample_names) / len(drawn_names) * total)  # udział próbki spełniającej ograniczenia
+        squared = np.square(sample) * source.multiplicity(sample_names)  # scalone elementy ważone liczebnością
+        squares = squared.sum(axis=1)
+        rel = _relative_error(squares, np.square(squared).sum(axis=1), len(sample_names), survivors)
+        norms = np.sqrt(squares / len(sample_names) * survivors)
+        top, bound = _estimate(sample_names, sample, W_max, metric, W, norms,
+                               (sample.max(axis=1), sample.min(axis=1)), rel, top_k)
+        yield Stage(len(sample_names), survivors, top, bound, None)
+
+    # przebieg strumieniowy: dokładne skrajne wartości i sumy kwadratów przeczytanych wierszy
+    items_names, blocks = [], []
+    read = 0  # liczba przeczytanych wierszy przed sprawdzeniem ograniczeń
+    squares, fourth = np.zeros(n), np.zeros(n)
+    col_max, col_min = np.full(n, -np.inf), np.full(n, np.inf)
+    last = time.monotonic()
+    for batch_names, values in source.iter_batches(columns, filters):
+        read += len(batch_names)
+        batch_names, values = screened(batch_names, values)
+        if not batch_names:
+            continue
+        items_names += batch_names
+        blocks.append(values)
+        squared = np.square(values) * source.multiplicity(batch_names)
+        squares += squared.sum(axis=1)
+        fourth += np.square(squared).sum(axis=1)
+        col_max = np.maximum(col_max, values.max(axis=1))
+        col_min = np.minimum(col_min, values.min(axis=1))
+        if time.monotonic() - last >= refresh and read < total:
+            seen = len(items_names)
+            survivors = max(seen, round(seen / read * total))  # udział przeczytanych wierszy spełniających ograniczenia
+            D = np.hstack(blocks)
+            blocks = [D]
+            rel = _relative_error(squares, fourth, seen, survivors)
+            top, bound = _estimate(items_names, D, W_max, metric, W, np.sqrt(squares / seen * survivors),
+                                   (col_max, col_min), rel, top_k)
+            yield Stage(seen, survivors, top, bound, None)
+            last = time.monotonic()
+
+    if not items_names:
+        raise ValueError("Żaden element nie spełnia ograniczeń")
+    D = np.hstack(blocks)
+    # wynik dokładny, identyczny z load_topsis_cache (także po scaleniu duplikatów)
+    cache = topsis_cache(D, W_max, metric, norms=weighted_norms(D, source.multiplicity(items_names)))
+    c = topsis_scores(cache, W)[0]
+    top = [(items_names[i], float(c[i])) for i in _top(c, top_k)]
+    yield Stage(len(items_names), len(items_names), top, 0.0, (cache, D, c_names, items_names, W_file))
@@ -0,0 +1,165 @@
+from typing import List, Tuple, Optional, Union
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from data_source import DataSource, Filter
+from constraints import Constraints, load_screened
+
+Number = Union[float, int]
+
+PREFERENCES = ("usual", "linear", "gaussian")  # funkcje preferencji
+BLOCK = 256  # liczba elementów w bloku: macierz różnic bloku [BLOCK x BLOCK] mieści się w pamięci podręcznej
+PARALLEL_LIMIT = 4096  # poniżej tej liczby elementów przepływy są liczone w jednym procesie
+
+_worker = {}  # stan procesu roboczego (macierz decyzyjna i parametry funkcji preferencji)
+
+
+def preference_params(D: np.ndarray, preference: str, q: Optional[List[Number]] = None,
+                      p: Optional[List[Number]] = None, s: Optional[List[Number]] = None) \
+        -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Progi funkcji preferencji dla każdego kryterium. Domyślnie próg obojętności to 0, a próg preferencji i parametr
+    funkcji gaussowskiej to odchylenie standardowe kryterium
+    :param D: (np.ndarray) : macierz decyzyjna D[n x m]
+    :param preference: (str) : nazwa funkcji preferencji
+    :param q: (List[Number]) : progi obojętności (funkcja linear)
+    :param p: (List[Number]) : progi ścisłej preferencji (funkcja linear)
+    :param s: (List[Number]) : parametry funkcji gaussowskiej
+    :return: (Tuple[np.ndarray, np.ndarray, np.ndarray]) : wektory q, p, s
+    """
+    if preference not in PREFERENCES:
+        raise ValueError("Nieznana funkcja preferencji: {}".format(preference))
+    n = D.shape[0]
+    spread = D.std(axis=1) if D.shape[1] else np.zeros(n)
+    q = np.zeros(n) if q is None else np.asarray(q, dtype=float)[:n]
+    p = spread if p is None else np.asarray(p, dtype=float)[:n]
+    s = spread if s is None else np.asarray(s, dtype=float)[:n]
+    return q, np.maximum(p, q), s
+
+
+def _net_preference(d: np.ndarray, out: np.ndarray, preference: str, q: float, p: float, s: float) -> np.ndarray:
+    """
+    Różnica preferencji P(a, b) - P(b, a) dla macierzy różnic d = a - b jednego kryterium, liczona w miejscu bez
+    tymczasowych macierzy
+    :param d: (np.ndarray) : różnice wartości kryterium (dodatnia - a lepsze)
+    :param out: (np.ndarray) : bufor wyniku o kształcie d
+    :return: (np.ndarray) : różnice preferencji z przedziału [-1, 1] (bufor out)
+    """
+    if preference == "usual":
+        return np.sign(d, out=out)
+    np.abs(d, out=out)
+    if preference == "linear" and p > q:
+        out -= q
+        out *= 1.0 / (p - q)
+        np.clip(out, 0.0, 1.0, out=out)
+    elif preference == "gaussian" and s > 0:
+        np.square(out, out=out)
+        out *= -0.5 / (s * s)
+        np.expm1(out, out=out)
+        np.negative(out, out=out)
+    else:  # próg preferencji równy progowi obojętności: funkcja schodkowa
+        np.greater(out, q if preference == "linear" else 0.0, out=out)
+    return np.copysign(out, d, out=out)
+
+
+def _init_worker(D: np.ndarray, W: np.ndarray, preference: str, params: Tuple[np.ndarray, np.ndarray, np.ndarray]) \
+        -> None:
+    _worker.update(D=D, W=W, preference=preference, params=params)
+
+
+def _row_block(start: int) -> np.ndarray:
+    """
+    Udział bloku wierszy w przepływach netto: blok jest porównywany z samym sobą i z kolejnymi blokami, a wynik
+    każdej pary bloków trafia do obu bloków (preferencja jest antysymetryczna), więc każda para elementów jest
+    liczona raz
+    :param start: (int) : indeks pierwszego elementu bloku
+    :return: (np.ndarray) : sumy różnic preferencji dla wszystkich elementów (bez dzielenia przez m - 1)
+    """
+    D, W, preference = _worker['D'], _worker['W'], _worker['preference']
+    q, p, s = _worker['params']
+    n, m = D.shape
+    flows = np.zeros(m)
+    rows = slice(start, min(start + BLOCK, m))
+    for other in range(start, m, BLOCK):
+        cols = slice(other, min(other + BLOCK, m))
+        shape = (rows.stop - rows.start, cols.stop - cols.start)
+        block, d, out = np.zeros(shape), np.empty(shape), np.empty(shape)
+        for j in range(n):
+            if W[j] == 0:
+                continue
+            np.subtract(D[j, rows, None], D[j, None, cols], out=d)
+            out = _net_preference(d, out, preference, q[j], p[j], s[j])
+            out *= W[j]
+            block += out
+        flows[rows] += block.sum(axis=1)
+        if other != start:
+            flows[cols] -= block.sum(axis=0)
+    return flows
+
+
+def promethee(D: List[List[Number]], W_max: Optional[List[bool]], W: Optional[List[Number]] = None,
+              preference: str = "usual", q: Optional[List[Number]] = None, p: Optional[List[Number]] = None,
+              s: Optional[List[Number]] = None, workers: Optional[int] = None) -> np.ndarray:
+    """
+    Przepływy netto metody PROMETHEE II. Macierz preferencji m x m nie powstaje w całości: pary elementów są
+    przetwarzane blokami w procesach roboczych, więc pamięć zależy tylko od wielkości bloku
+    :param D: (List[List[Number]]) : macierz decyzyjna D[n x m]
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów (domyślnie każde)
+    :param W: (List[Number]) : wektor wag (domyślnie równe, normalizowany do sumy 1)
+    :param preference: (str) : funkcja preferencji (usual, linear, gaussian)
+    :param q: (List[Number]) : progi obojętności (funkcja linear)
+    :param p: (List[Number]) : progi ścisłej preferencji (funkcja linear)
+    :param s: (List[Number]) : parametry funkcji gaussowskiej
+    :param workers: (int) : liczba procesów (domyślnie liczba rdzeni)
+    :return: (np.ndarray) : wektor przepływów netto z przedziału [-1, 1] (wyższy lepszy)
+    """
+    D = np.asarray(D, dtype=np.float64)
+    n, m = D.shape
+    if W_max is None:
+        W_max = [True for _ in range(n)]  # uzupełnienie parametru domyślnego
+    sign = np.asarray([1.0 if j >= len(W_max) or W_max[j] else -1.0 for j in range(n)])
+    D = np.ascontiguousarray(D * sign[:, None])  # kryteria minimalizowane odwrócone
+    W = np.ones(n) if W is None else np.abs(np.asarray(W, dtype=float)[:n])
+    if W.sum() == 0:
+        raise ValueError("Suma wag musi być dodatnia")
+    W = W / W.sum()
+    params = preference_params(D, preference, q, p, s)
+    if m < 2:
+        return np.zeros(m)
+
+    starts = range(0, m, BLOCK)
+    if m < PARALLEL_LIMIT or workers == 1:
+        _init_worker(D, W, preference, params)
+        flows = sum(_row_block(start) for start in starts)
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(D, W, preference, params)) as executor:
+            flows = sum(executor.map(_row_block, starts))
+    return flows / (m - 1)
+
+
+def compute_promethee(file_name: Union[str, DataSource], criteria: List[int], preference: str = "usual",
+                      weights: Optional[List[float]] = None, filters: Optional[List[Filter]] = None,
+                      constraints: Optional[Constraints] = None) \
+        -> Tuple[str, int, List[str], List[str], np.ndarray, List[float]]:
+    """
+    Funkcja wyliczająca z pliku ranking metodą PROMETHEE II
+    :param file_name: (Union[str, DataSource]) : nazwa pliku (.xlsx lub baza SQLite) albo źródło danych
+    :param criteria: (List[int]) : lista wybranych kryteriów
+    :param preference: (str) : funkcja preferencji (usual, linear, gaussian)
+    :param weights: (List[float]) : lista wag (domyślnie z pliku)
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia odrzucające elementy przed wyliczeniem rankingu
+    :return: (Tuple[str, int, List[str], List[str], np.ndarray, List[float]]) : ranking jako str, liczba kryteriów,
+    lista nazw kryteriów, lista nazw elementów, macierz decyzyjna, wektor przepływów netto
+    """
+    # wczytanie tylko wybranych kryteriów i nazw, bez elementów odrzuconych przez ograniczenia
+    D, c_names, items_names, W_file, W_max = load_screened(file_name, criteria, filters, constraints)
+    W = weights if weights else (W_file if len(W_file) == len(c_names) else None)
+    flows = promethee(D, W_max, W, preference)
+
+    rank_str = ''
+    for i in np.argsort(-flows, kind='stable'):  # posortowanie rankingu
+        rank_str += items_names[i] + ' : ' + '{0:1.3f}'.format(flows[i]) + '\n'  # zapis rankingu jako str
+
+    return rank_str, len(c_names), c_names, items_names, D, flows.tolist()
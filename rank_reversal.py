@@ -0,0 +1,165 @@
+from typing import List, Tuple, Optional, Union
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from topsis import topsis_cache, topsis_scores
+from rsm import rsm
+from sp_cs import sp_cs
+from promethee import promethee
+from export import HIGHER_IS_BETTER
+
+Number = Union[float, int]
+Reversal = Tuple[int, int, Tuple[int, int]]  # (usunięty element, liczba zamienionych par, pierwsza zamieniona para)
+
+TOLERANCE = 1e-9  # różnice współczynników mniejsze od tolerancji nie są zamianą kolejności
+CHUNK = 64  # liczba usuwanych elementów w jednym zadaniu procesu
+
+_worker = {}  # stan procesu roboczego (macierz ze współdzielonej pamięci i parametry metody)
+
+
+def _top_two(D: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Dwie największe i dwie najmniejsze wartości każdego kryterium, potrzebne do wyznaczenia skrajnych wartości
+    po usunięciu jednego elementu
+    :param D: (np.ndarray) : macierz decyzyjna D[n x m]
+    :return: indeks maksimum, maksimum, drugie maksimum, indeks minimum, minimum, drugie minimum
+    """
+    cols = np.arange(D.shape[0])
+    if D.shape[1] < 2:
+        arg = np.zeros(D.shape[0], dtype=int)
+        return arg, D[:, 0], D[:, 0], arg, D[:, 0], D[:, 0]
+    top = np.argpartition(-D, 1, axis=1)[:, :2]  # dwa największe bez sortowania całych kolumn
+    top_values = D[cols[:, None], top]
+    first = np.argmax(top_values, axis=1)
+    arg_max = top[cols, first]
+    bottom = np.argpartition(D, 1, axis=1)[:, :2]
+    bottom_values = D[cols[:, None], bottom]
+    first_min = np.argmin(bottom_values, axis=1)
+    arg_min = bottom[cols, first_min]
+    return arg_max, top_values.max(axis=1), top_values.min(axis=1), \
+        arg_min, bottom_values.min(axis=1), bottom_values.max(axis=1)
+
+
+def _scores(method: str, D: np.ndarray, i: int) -> np.ndarray:
+    """
+    Współczynniki skoringowe wszystkich elementów poza usuniętym
+    :param method: (str) : nazwa metody
+    :param D: (np.ndarray) : pełna macierz decyzyjna D[n x m]
+    :param i: (int) : indeks usuniętego elementu (-1 - bez usuwania)
+    :return: (np.ndarray) : wektor współczynników długości m - 1 (lub m)
+    """
+    state = _worker
+    if method == "TOPSIS":
+        if i < 0:
+            cache = topsis_cache(D, state['W_max'], state['metric'])
+            return topsis_scores(cache, state['W'])[0]
+        # aktualizacja norm i skrajnych wartości w postaci zamkniętej zamiast liczenia od nowa
+        arg_max, v_max, v_max2, arg_min, v_min, v_min2 = state['top_two']
+        norms = np.sqrt(np.maximum(state['squares'] - np.square(D[:, i]), 0.0))
+        col_max = np.where(arg_max == i, v_max2, v_max)
+        col_min = np.where(arg_min == i, v_min2, v_min)
+        cache = topsis_cache(D, state['W_max'], state['metric'], norms=norms, extremes=(col_max, col_min))
+        return np.delete(topsis_scores(cache, state['W'])[0], i)
+
+    D_reduced = D if i < 0 else np.delete(D, i, axis=1)
+    if method == "RSM":
+        return np.asarray(rsm(D_reduced, state['W_max'], state['metric'])[0], dtype=float)
+    if method == "PROMETHEE II":  # procesy robocze już działają równolegle
+        return promethee(D_reduced, state['W_max'], state['W'], state['preference'], workers=1)
+    random.seed(state['seed'])  # te same losowe punkty odniesienia przy każdym przeliczeniu
+    return np.asarray(sp_cs(D_reduced, state['W_max'], state['metric'])[0], dtype=float)
+
+
+def _init_worker(shm_name: str, shape: Tuple[int, int], method: str, W_max: List[bool], W: Optional[List[Number]],
+                 metric: str, seed: int, preference: str = "usual") -> None:
+    """
+    Podłączenie procesu roboczego do współdzielonej kopii macierzy
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)  # segment zwalnia proces główny
+    D = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    _worker.update(shm=shm, D=D, method=method, W_max=W_max, W=W, metric=metric, seed=seed, preference=preference)
+    if method == "TOPSIS":
+        _worker['squares'] = np.einsum('ij,ij->i', D, D)  # sumy kwadratów kolumn
+        _worker['top_two'] = _top_two(D)
+    _worker['base'] = _scores(method, D, -1)
+
+
+def _check(indices: List[int]) -> List[Reversal]:
+    """
+    Sprawdzenie, czy usunięcie elementów zmienia kolejność pozostałych
+    :param indices: (List[int]) : indeksy usuwanych elementów
+    :return: (List[Reversal]) : elementy, których usunięcie zmienia kolejność pozostałych
+    """
+    D = _worker['D']
+    method = _worker['method']
+    base = _worker['base']
+    sign = 1.0 if HIGHER_IS_BETTER[method] else -1.0
+    order = np.argsort(-sign * base, kind='stable')  # pierwotna kolejność
+    found = []
+    for i in indices:
+        new = sign * _scores(method, D, i)
+        kept = order[order != i]
+        kept = kept - (kept > i)  # indeksy po usunięciu elementu i
+        s = new[kept]  # nowe współczynniki w pierwotnej kolejności powinny być nierosnące
+        with np.errstate(invalid='ignore'):
+            swapped = np.flatnonzero(s[1:] > s[:-1] + TOLERANCE)
+        if len(swapped):
+            a, b = kept[swapped[0]], kept[swapped[0] + 1]
+            found.append((i, len(swapped), (int(a + (a >= i)), int(b + (b >= i)))))  # indeksy w pełnej macierzy
+    return found
+
+
+def rank_reversal(D: List[List[Number]], W_max: List[bool], metric: str, method: str = "TOPSIS",
+                  W: Optional[List[Number]] = None, workers: Optional[int] = None, seed: int = 0,
+                  preference: str = "usual") -> List[Reversal]:
+    """
+    Analiza odwrócenia rankingu: dla każdego elementu ranking jest liczony ponownie bez niego i porównywany
+    z pierwotną kolejnością pozostałych elementów. Procesy robocze czytają jedną kopię macierzy ze współdzielonej
+    pamięci
+    :param D: (List[List[Number]]) : macierz decyzyjna D[n x m]
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param method: (str) : nazwa metody (TOPSIS, RSM, SP-CS, PROMETHEE II)
+    :param W: (List[Number]) : wektor wag (TOPSIS i PROMETHEE II)
+    :param workers: (int) : liczba procesów (domyślnie liczba rdzeni)
+    :param seed: (int) : ziarno losowania punktów metody SP-CS
+    :param preference: (str) : funkcja preferencji metody PROMETHEE II
+    :return: (List[Reversal]) : lista (usunięty element, liczba zamienionych sąsiednich par, pierwsza para)
+    """
+    if method not in HIGHER_IS_BETTER:
+        raise ValueError("Nieznana metoda: {}".format(method))
+    D = np.asarray(D, dtype=np.float64)
+    n, m = D.shape
+    if method == "TOPSIS" and W is None:
+        W = [1.0 for _ in range(n)]
+
+    shm = shared_memory.SharedMemory(create=True, size=max(D.nbytes, 1))
+    try:
+        np.ndarray(D.shape, dtype=np.float64, buffer=shm.buf)[:] = D  # jedna kopia dla wszystkich procesów
+        chunks = [list(range(start, min(start + CHUNK, m))) for start in range(0, m, CHUNK)]
+        initargs = (shm.name, D.shape, method, list(W_max), W, metric, seed, preference)
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=initargs) as executor:
+            found = [item for part in executor.map(_check, chunks) for item in part]
+    finally:
+        shm.close()
+        shm.unlink()
+    return found
+
+
+def rank_reversal_report(found: List[Reversal], items_names: List[str]) -> str:
+    """
+    Opis wyników analizy odwrócenia rankingu
+    :param found: (List[Reversal]) : wynik funkcji rank_reversal
+    :param items_names: (List[str]) : lista nazw elementów
+    :return: (str) : raport tekstowy
+    """
+    if not found:
+        return 'Usunięcie żadnego elementu nie zmienia kolejności pozostałych\n'
+    report = ''
+    for i, count, (a, b) in found:
+        report += '{} : {} zamienionych par, np. {} / {}\n'.format(items_names[i], count, items_names[a],
+                                                                    items_names[b])
+    return report
@@ -0,0 +1,267 @@
+from typing import List, Tuple, Optional, Union, NamedTuple
+import time
+import numpy as np
+from scipy.sparse.csgraph import connected_components
+from topsis import topsis_cache, topsis_scores
+from rsm import rsm
+from agreement import TOP_K, dense_ranks, kendall_tau_b
+from export import HIGHER_IS_BETTER
+from data_source import DataSource, Filter
+from constraints import Constraints, load_screened
+
+Number = Union[float, int]
+
+MODES = ("prune", "pca")  # pominięcie skorelowanych kryteriów albo rzutowanie na składowe główne
+CORRELATION_THRESHOLD = 0.9  # |r|, od którego kryteria trafiają do jednej grupy
+VARIANCE_TARGET = 0.95  # udział wariancji wyjaśnianej przez zachowane składowe główne
+
+
+class Reduction(NamedTuple):
+    """
+    Kryteria po redukcji wymiaru
+    """
+    D: np.ndarray  # macierz decyzyjna w zredukowanej przestrzeni [k x m]
+    c_names: List[str]  # nazwy zachowanych kryteriów albo składowych
+    W: List[float]  # wagi zachowanych kryteriów albo składowych
+    W_max: List[bool]  # wektor maksymalizacji (składowe zawsze maksymalizowane)
+    clusters: List[List[int]]  # grupy silnie skorelowanych kryteriów (indeksy wierszy pełnej macierzy)
+    dropped: List[int]  # pominięte kryteria (tryb prune)
+    explained: float  # udział wyjaśnionej wariancji kryteriów standaryzowanych (tryb pca - ważonych)
+
+
+class ReductionQuality(NamedTuple):
+    """
+    Porównanie rankingu po redukcji z rankingiem na wszystkich kryteriach
+    """
+    full_time: float  # czas rankingu na wszystkich kryteriach [s]
+    reduced_time: float  # czas rankingu po redukcji [s]
+    tau: float  # tau-b Kendalla między rankingami
+    overlap: float  # pokrycie najlepszych elementów
+
+
+def correlation_clusters(D: np.ndarray, threshold: float = CORRELATION_THRESHOLD) -> Tuple[np.ndarray, List[List[int]]]:
+    """
+    Grupy kryteriów połączonych korelacją |r| >= threshold (składowe spójne grafu korelacji)
+    :param D: (np.ndarray) : macierz decyzyjna D[n x m]
+    :param threshold: (float) : próg bezwzględnej wartości współczynnika korelacji Pearsona
+    :return: (Tuple[np.ndarray, List[List[int]]]) : macierz korelacji [n x n] (kryteria stałe - 0), grupy co najmniej
+    dwóch kryteriów
+    """
+    D = np.asarray(D, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = np.nan_to_num(np.atleast_2d(np.corrcoef(D)), nan=0.0)
+    np.fill_diagonal(corr, 1.0)
+    labels = connected_components(np.abs(corr) >= threshold, directed=False)[1]
+    clusters = [np.flatnonzero(labels == label).tolist() for label in np.unique(labels)]
+    return corr, sorted([c for c in clusters if len(c) > 1], key=lambda c: c[0])
+
+
+def _weights(W: Optional[List[Number]], n: int) -> np.ndarray:
+    if W is None or len(W) < n:
+        return np.ones(n)
+    return np.abs(np.asarray(W, dtype=float)[:n])
+
+
+def _standardized(D: np.ndarray, W_max: List[bool]) -> np.ndarray:
+    """
+    Kryteria zorientowane tak, że większa wartość jest lepsza, o średniej 0 i odchyleniu 1 (kryteria stałe - 0)
+    """
+    sign = np.asarray([1.0 if j >= len(W_max) or W_max[j] else -1.0 for j in range(D.shape[0])])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        Z = (D - D.mean(axis=1, keepdims=True)) / D.std(axis=1, keepdims=True)
+    return np.nan_to_num(Z * sign[:, None], nan=0.0)
+
+
+def _explained(Z: np.ndarray, basis: np.ndarray) -> float:
+    """
+    Udział wariancji wszystkich kryteriów odtwarzalny liniowo z wierszy basis
+    """
+    total = float(np.einsum('ij,ij->', Z, Z))
+    if total == 0 or basis.shape[0] == 0:
+        return 1.0 if total == 0 else 0.0
+    residual = Z.T - basis.T @ np.linalg.lstsq(basis.T, Z.T, rcond=None)[0]
+    return 1.0 - float(np.einsum('ij,ij->', residual, residual)) / total
+
+
+def prune(D: np.ndarray, c_names: List[str], W: Optional[List[Number]], W_max: List[bool],
+          threshold: float = CORRELATION_THRESHOLD) -> Reduction:
+    """
+    Pominięcie kryteriów powielających informację: z każdej grupy skorelowanych kryteriów zostaje kryterium o
+    największej wadze (przy równych wagach - najsilniej skorelowane z resztą grupy)
+    :param D: (np.ndarray) : macierz decyzyjna D[n x m]
+    :param c_names: (List[str]) : lista nazw kryteriów
+    :param W: (List[Number]) : wektor wag (domyślnie równe)
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów
+    :param threshold: (float) : próg |r| łączenia kryteriów w grupy
+    :return: (Reduction) : kryteria po redukcji
+    """
+    D = np.asarray(D, dtype=float)
+    n = D.shape[0]
+    W = _weights(W, n)
+    corr, clusters = correlation_clusters(D, threshold)
+    dropped = []
+    for cluster in clusters:
+        centrality = np.abs(corr[np.ix_(cluster, cluster)]).sum(axis=1)
+        keep = cluster[max(range(len(cluster)), key=lambda i: (W[cluster[i]], centrality[i]))]
+        dropped.extend(j for j in cluster if j != keep)
+    kept = [j for j in range(n) if j not in dropped]
+    Z = _standardized(D, W_max)
+    return Reduction(D[kept], [c_names[j] for j in kept], W[kept].tolist(),
+                     [bool(W_max[j]) if j < len(W_max) else True for j in kept], clusters, sorted(dropped),
+                     _explained(Z, Z[kept]))
+
+
+def pca(D: np.ndarray, W: Optional[List[Number]], W_max: List[bool], variance: float = VARIANCE_TARGET,
+        threshold: float = CORRELATION_THRESHOLD) -> Reduction:
+    """
+    Rzutowanie kryteriów standaryzowanych i przeskalowanych pierwiastkami wag na najmniejszą liczbę składowych
+    głównych wyjaśniających zadany udział wariancji. Składowe są zorientowane tak, że większa wartość jest lepsza,
+    przesunięte do minimum 0, a wagą składowej jest jej udział w wariancji
+    :param D: (np.ndarray) : macierz decyzyjna D[n x m]
+    :param W: (List[Number]) : wektor wag (domyślnie równe)
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów
+    :param variance: (float) : docelowy udział wyjaśnionej wariancji z przedziału (0, 1]
+    :param threshold: (float) : próg |r| grup kryteriów podawanych w raporcie
+    :return: (Reduction) : składowe główne
+    """
+    D = np.asarray(D, dtype=float)
+    n = D.shape[0]
+    W = _weights(W, n)
+    if W.sum() == 0:
+        W = np.ones(n)
+    Z = _standardized(D, W_max) * np.sqrt(W / W.sum())[:, None]  # wagi decydują o kierunkach składowych
+    values, vectors = np.linalg.eigh(Z @ Z.T)
+    values, vectors = np.clip(values[::-1], 0, None), vectors[:, ::-1]  # od największej wariancji
+    total = values.sum()
+    if total == 0:  # wszystkie kryteria stałe
+        values, total = np.ones(n), float(n)
+    ratio = np.cumsum(values) / total
+    k = min(int(np.searchsorted(ratio, variance - 1e-12)) + 1, n)
+    V = vectors[:, :k] * np.where(W @ vectors[:, :k] < 0, -1.0, 1.0)  # wzrost składowej - poprawa kryteriów z wagami
+    P = V.T @ Z
+    P -= P.min(axis=1, keepdims=True) if P.shape[1] else 0.0
+    return Reduction(P, ['PC{}'.format(i + 1) for i in range(k)], (values[:k] / total).tolist(), [True] * k,
+                     correlation_clusters(D, threshold)[1], [], float(ratio[k - 1]))
+
+
+def reduce_criteria(D: np.ndarray, c_names: List[str], W: Optional[List[Number]], W_max: List[bool],
+                    mode: str = "prune", threshold: float = CORRELATION_THRESHOLD,
+                    variance: float = VARIANCE_TARGET) -> Reduction:
+    """
+    Redukcja wymiaru przed rankingiem
+    :param D: (np.ndarray) : macierz decyzyjna D[n x m]
+    :param c_names: (List[str]) : lista nazw kryteriów
+    :param W: (List[Number]) : wektor wag (domyślnie równe)
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów
+    :param mode: (str) : "prune" - pominięcie skorelowanych kryteriów, "pca" - składowe główne
+    :param threshold: (float) : próg |r| łączenia kryteriów w grupy
+    :param variance: (float) : docelowy udział wyjaśnionej wariancji (tryb pca)
+    :return: (Reduction) : kryteria po redukcji
+    """
+    if mode not in MODES:
+        raise ValueError("Nieznany sposób redukcji: {}".format(mode))
+    if mode == "prune":
+        return prune(D, c_names, W, W_max, threshold)
+    return pca(D, W, W_max, variance, threshold)
+
+
+def rank_scores(D: np.ndarray, W: Optional[List[Number]], W_max: List[bool], method: str, metric: str) -> np.ndarray:
+    """
+    Współczynniki skoringowe metody topsis albo rsm
+    :return: (np.ndarray) : wektor współczynników skoringowych
+    """
+    if method == "TOPSIS":
+        return topsis_scores(topsis_cache(D, W_max, metric), _weights(W, len(D)))[0]
+    if method == "RSM":
+        return np.asarray(rsm(D, W_max, metric)[0], dtype=float)
+    raise ValueError("Nieznana metoda: {}".format(method))
+
+
+def _top(key: np.ndarray, k: int) -> set:
+    return set(np.argpartition(-key, k - 1)[:k].tolist()) if 0 < k < len(key) else set(range(len(key)))
+
+
+def compare_reduction(D: np.ndarray, W: Optional[List[Number]], W_max: List[bool], reduction: Reduction,
+                      method: str, metric: str, top_k: int = TOP_K) -> ReductionQuality:
+    """
+    Jakość i czas rankingu po redukcji w porównaniu z rankingiem na wszystkich kryteriach
+    :param D: (np.ndarray) : pełna macierz decyzyjna D[n x m]
+    :param W: (List[Number]) : wektor wag
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów
+    :param reduction: (Reduction) : kryteria po redukcji
+    :param method: (str) : nazwa metody (TOPSIS, RSM)
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param top_k: (int) : liczba najlepszych elementów dla miary pokrycia
+    :return: (ReductionQuality) : czasy, tau-b i pokrycie najlepszych elementów
+    """
+    start = time.perf_counter()
+    full = rank_scores(D, W, W_max, method, metric)
+    full_time = time.perf_counter() - start
+    start = time.perf_counter()
+    reduced = rank_scores(reduction.D, reduction.W, reduction.W_max, method, metric)
+    reduced_time = time.perf_counter() - start
+
+    sign = 1.0 if HIGHER_IS_BETTER[method] else -1.0
+    keys = [np.nan_to_num(sign * score, nan=-np.inf) for score in (full, reduced)]
+    k = min(top_k, len(full))
+    overlap = len(_top(keys[0], k) & _top(keys[1], k)) / max(k, 1)
+    return ReductionQuality(full_time, reduced_time, kendall_tau_b(dense_ranks(keys[0]), dense_ranks(keys[1])),
+                            overlap)
+
+
+def reduction_report(reduction: Reduction, c_names: List[str], quality: Optional[ReductionQuality] = None) -> str:
+    """
+    Opis grup skorelowanych kryteriów, wyniku redukcji i porównania z rankingiem na wszystkich kryteriach
+    :param reduction: (Reduction) : kryteria po redukcji
+    :param c_names: (List[str]) : nazwy wszystkich kryteriów
+    :param quality: (ReductionQuality) : wynik funkcji compare_reduction
+    :return: (str) : raport tekstowy
+    """
+    report = ''
+    for cluster in reduction.clusters:
+        report += 'Skorelowane: {}\n'.format(', '.join(c_names[j] for j in cluster))
+    if not reduction.clusters:
+        report += 'Brak silnie skorelowanych kryteriów\n'
+    if reduction.dropped:
+        report += 'Do pominięcia: {}\n'.format(', '.join(c_names[j] for j in reduction.dropped))
+    report += 'Kryteria po redukcji: {} z {} ({}), wyjaśniona wariancja {:.0%}\n'.format(
+        len(reduction.c_names), len(c_names), ', '.join(reduction.c_names), reduction.explained)
+    if quality is not None:
+        speedup = quality.full_time / quality.reduced_time if quality.reduced_time > 0 else float('inf')
+        report += 'Czas: {:.3f} s zamiast {:.3f} s ({:.1f}x), tau-b {:.3f}, top-k {:.0%}\n'.format(
+            quality.reduced_time, quality.full_time, speedup, quality.tau, quality.overlap)
+    return report
+
+
+def compute_reduced(file_name: Union[str, DataSource], criteria: List[int], method: str, metric: str,
+                    mode: str = "prune", weights: Optional[List[float]] = None,
+                    threshold: float = CORRELATION_THRESHOLD, variance: float = VARIANCE_TARGET,
+                    filters: Optional[List[Filter]] = None, constraints: Optional[Constraints] = None) \
+        -> Tuple[str, str, List[str], List[float]]:
+    """
+    Funkcja wyliczająca z pliku ranking metodą topsis albo rsm po redukcji wymiaru
+    :param file_name: (Union[str, DataSource]) : nazwa pliku (.xlsx lub baza SQLite) albo źródło danych
+    :param criteria: (List[int]) : lista wybranych kryteriów
+    :param method: (str) : nazwa metody (TOPSIS, RSM)
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param mode: (str) : "prune" albo "pca"
+    :param weights: (List[float]) : lista wag (domyślnie z pliku)
+    :param threshold: (float) : próg |r| łączenia kryteriów w grupy
+    :param variance: (float) : docelowy udział wyjaśnionej wariancji (tryb pca)
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia odrzucające elementy przed wyliczeniem rankingu
+    :return: (Tuple[str, str, List[str], List[float]]) : ranking jako str, raport redukcji, lista nazw elementów,
+    wektor współczynników skoringowych
+    """
+    D, c_names, items_names, W_file, W_max = load_screened(file_name, criteria, filters, constraints)
+    W = weights if weights else (W_file if len(W_file) == len(c_names) else None)
+    reduction = reduce_criteria(D, c_names, W, W_max, mode, threshold, variance)
+    quality = compare_reduction(D, W, W_max, reduction, method, metric)
+    score = rank_scores(reduction.D, reduction.W, reduction.W_max, method, metric)
+
+    rank_str = ''
+    order = np.argsort(-score if HIGHER_IS_BETTER[method] else score, kind='stable')
+    for i in order:  # posortowanie rankingu
+        rank_str += items_names[i] + ' : ' + '{0:1.3f}'.format(score[i]) + '\n'  # zapis rankingu jako str
+
+    return rank_str, reduction_report(reduction, c_names, quality), items_names, score.tolist()
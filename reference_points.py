@@ -0,0 +1,244 @@
+from typing import List, Optional, Union, NamedTuple
+import numpy as np
+from data_source import DataSource, Filter, BATCH_SIZE, open_source
+
+SKETCH_SIZE = 2048  # pojemność poziomu szkicu: błąd pozycji kwantyla rzędu log(m / SKETCH_SIZE) / SKETCH_SIZE
+
+
+class ReferencePoints(NamedTuple):
+    """
+    Punkty odniesienia metod RSM i SP-CS (wektory o długości równej liczbie kryteriów)
+    """
+    aspiration: np.ndarray  # najlepsze wartości kryteriów
+    anti_ideal: np.ndarray  # najgorsze wartości kryteriów
+    quo_median: np.ndarray  # element m // 2 po posortowaniu od najlepszego
+    quo_mean: np.ndarray  # połowa rozstępu kryterium
+    threshold: np.ndarray  # punkt graniczny metody RSM
+    aspiration_threshold: np.ndarray  # granica punktów zdominowanych metody SP-CS (najgorsze wartości zbioru aspiracji)
+
+
+def _maximized(W_max: Optional[List[bool]], n: int) -> np.ndarray:
+    if W_max is None:
+        return np.ones(n, dtype=bool)
+    return np.asarray([bool(W_max[j]) if j < len(W_max) else True for j in range(n)], dtype=bool)
+
+
+def median_ranks(m: int, maximize: np.ndarray) -> np.ndarray:
+    """
+    Pozycje (od 0, w kolejności rosnącej) elementu m // 2 po posortowaniu kryterium od najlepszego
+    :param m: (int) : liczba elementów
+    :param maximize: (np.ndarray) : wektor maksymalizacji kryteriów
+    :return: (np.ndarray) : wektor pozycji
+    """
+    return np.where(maximize, m - 1 - m // 2, m // 2)
+
+
+def points_from_bounds(maximize: np.ndarray, col_max: np.ndarray, col_min: np.ndarray, median: np.ndarray,
+                       set_min: np.ndarray, set_max: np.ndarray) -> ReferencePoints:
+    """
+    Punkty odniesienia ze skrajnych wartości, mediany i skrajnych wartości zbioru aspiracji
+    """
+    best = np.where(maximize, col_max, col_min)
+    worst = np.where(maximize, col_min, col_max)
+    return ReferencePoints(aspiration=best, anti_ideal=worst, quo_median=median, quo_mean=np.abs(best - worst) / 2,
+                           threshold=np.abs(best - worst) * 0.25 + np.where(maximize, worst, best),
+                           aspiration_threshold=np.where(maximize, set_min, np.maximum(set_max, 0)))
+
+
+def reference_points(D: List[List[Union[float, int]]], W_max: Optional[List[bool]]) -> ReferencePoints:
+    """
+    Dokładne punkty odniesienia wyznaczone selekcją w czasie liniowym (bez sortowania kryteriów)
+    :param D: (List[List[Union[float, int]]]) : macierz decyzyjna D[n x m]
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów (domyślnie każde)
+    :return: (ReferencePoints) : punkty odniesienia
+    """
+    D = np.asarray(D, dtype=float)
+    n, m = D.shape
+    if m == 0:
+        raise ValueError("Brak elementów do wyznaczenia punktów odniesienia")
+    maximize = _maximized(W_max, n)
+    col_max, col_min = D.max(axis=1), D.min(axis=1)
+    ranks = median_ranks(m, maximize)
+    median = np.partition(D, np.unique(ranks), axis=1)[np.arange(n), ranks]
+    best = np.where(maximize, col_max, col_min)
+    aspiration_set = D[:, (D == best[:, None]).any(axis=0)]  # elementy z najlepszą wartością któregoś kryterium
+    return points_from_bounds(maximize, col_max, col_min, median, aspiration_set.min(axis=1),
+                              aspiration_set.max(axis=1))
+
+
+class QuantileSketch:
+    """
+    Łączony szkic kwantyli wszystkich kryteriów naraz. Poziom h przechowuje wartości o wadze 2^h; przepełniony poziom
+    jest sortowany, a co druga wartość (od losowego przesunięcia) przechodzi na poziom wyżej. Dopóki liczba wartości
+    nie przekroczy pojemności poziomu, szkic jest dokładny
+    """
+
+    def __init__(self, n: int, k: int = SKETCH_SIZE, seed: int = 0):
+        """
+        :param n: (int) : liczba kryteriów
+        :param k: (int) : pojemność poziomu
+        :param seed: (int) : ziarno losowania przesunięć
+        """
+        self.n = n
+        self.k = k
+        self.count = 0
+        self.levels = []  # poziom h: wartości o wadze 2^h [n x ...]
+        self.rng = np.random.default_rng(seed)
+
+    def _add(self, h: int, values: np.ndarray) -> None:
+        while len(self.levels) <= h:
+            self.levels.append(np.empty((self.n, 0)))
+        self.levels[h] = np.hstack([self.levels[h], values])
+
+    def _compress(self) -> None:
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if level.shape[1] > self.k:
+                size = level.shape[1] - level.shape[1] % 2  # przy nieparzystej liczbie wartość zostaje na poziomie
+                level = np.sort(level, axis=1)
+                offset = int(self.rng.integers(2))
+                self.levels[h] = level[:, size:]
+                self._add(h + 1, level[:, offset:size:2])
+            h += 1
+
+    def update(self, values: np.ndarray) -> None:
+        """
+        Dodanie paczki wartości
+        :param values: (np.ndarray) : macierz [n x b]
+        :return: None
+        """
+        values = np.asarray(values, dtype=float)
+        self.count += values.shape[1]
+        self._add(0, values)
+        self._compress()
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """
+        Dołączenie szkicu innego fragmentu danych
+        :param other: (QuantileSketch) : szkic o tej samej liczbie kryteriów i pojemności
+        :return: None
+        """
+        if (other.n, other.k) != (self.n, self.k):
+            raise ValueError("Szkice mają różne wymiary")
+        self.count += other.count
+        for h, level in enumerate(other.levels):
+            self._add(h, level)
+        self._compress()
+
+    def value_at(self, ranks: np.ndarray) -> np.ndarray:
+        """
+        Przybliżone wartości na zadanych pozycjach (od 0, w kolejności rosnącej) każdego kryterium
+        :param ranks: (np.ndarray) : wektor pozycji
+        :return: (np.ndarray) : wektor wartości
+        """
+        if self.count == 0:
+            raise ValueError("Pusty szkic")
+        values = np.hstack(self.levels)
+        weights = np.concatenate([np.full(level.shape[1], 2 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(values, axis=1, kind='stable')
+        cumulative = np.cumsum(weights[order], axis=1)
+        position = np.minimum((cumulative <= np.asarray(ranks)[:, None]).sum(axis=1), values.shape[1] - 1)
+        return np.take_along_axis(values, order, axis=1)[np.arange(self.n), position]
+
+    def quantile(self, q: float) -> np.ndarray:
+        """
+        Przybliżony kwantyl rzędu q każdego kryterium
+        :param q: (float) : rząd kwantyla z przedziału [0, 1]
+        :return: (np.ndarray) : wektor kwantyli
+        """
+        return self.value_at(np.full(self.n, int(q * (self.count - 1))))
+
+
+class ReferenceSketch:
+    """
+    Strumieniowe punkty odniesienia: skrajne wartości kryteriów i zbiór aspiracji są liczone dokładnie, a mediana
+    ze szkicu kwantyli. Szkice fragmentów danych (paczek, węzłów) można łączyć
+    """
+
+    def __init__(self, W_max: Optional[List[bool]], n: int, k: int = SKETCH_SIZE, seed: int = 0):
+        """
+        :param W_max: (List[bool]) : wektor maksymalizacji kryteriów (domyślnie każde)
+        :param n: (int) : liczba kryteriów
+        :param k: (int) : pojemność poziomu szkicu kwantyli
+        :param seed: (int) : ziarno losowania przesunięć
+        """
+        self.maximize = _maximized(W_max, n)
+        self.quantiles = QuantileSketch(n, k, seed)
+        self.col_max = np.full(n, -np.inf)
+        self.col_min = np.full(n, np.inf)
+        # skrajne wartości wszystkich kryteriów wśród elementów z najlepszą wartością kryterium j (wiersz j)
+        self.tie_min = np.full((n, n), np.inf)
+        self.tie_max = np.full((n, n), -np.inf)
+
+    def _best(self, col_max: np.ndarray, col_min: np.ndarray) -> np.ndarray:
+        return np.where(self.maximize, col_max, -col_min)  # większa wartość - lepsza
+
+    def _combine(self, col_max: np.ndarray, col_min: np.ndarray, tie_min: np.ndarray, tie_max: np.ndarray) -> None:
+        old, new = self._best(self.col_max, self.col_min), self._best(col_max, col_min)
+        better, equal = (new > old)[:, None], (new == old)[:, None]
+        self.tie_min = np.where(better, tie_min, np.where(equal, np.minimum(self.tie_min, tie_min), self.tie_min))
+        self.tie_max = np.where(better, tie_max, np.where(equal, np.maximum(self.tie_max, tie_max), self.tie_max))
+        self.col_max = np.maximum(self.col_max, col_max)
+        self.col_min = np.minimum(self.col_min, col_min)
+
+    def update(self, values: np.ndarray) -> None:
+        """
+        Dodanie paczki elementów
+        :param values: (np.ndarray) : macierz [n x b]
+        :return: None
+        """
+        values = np.asarray(values, dtype=float)
+        if values.shape[1] == 0:
+            return
+        self.quantiles.update(values)
+        col_max, col_min = values.max(axis=1), values.min(axis=1)
+        ties = values == np.where(self.maximize, col_max, col_min)[:, None]
+        tie_min = np.vstack([values[:, row].min(axis=1) for row in ties])
+        tie_max = np.vstack([values[:, row].max(axis=1) for row in ties])
+        self._combine(col_max, col_min, tie_min, tie_max)
+
+    def merge(self, other: 'ReferenceSketch') -> None:
+        """
+        Dołączenie szkicu innego fragmentu danych
+        :param other: (ReferenceSketch) : szkic o tych samych kryteriach
+        :return: None
+        """
+        if not np.array_equal(other.maximize, self.maximize):
+            raise ValueError("Szkice mają różne kryteria")
+        self.quantiles.merge(other.quantiles)
+        self._combine(other.col_max, other.col_min, other.tie_min, other.tie_max)
+
+    def points(self) -> ReferencePoints:
+        """
+        Punkty odniesienia dla wszystkich dodanych elementów
+        :return: (ReferencePoints) : punkty odniesienia (mediana przybliżona)
+        """
+        median = self.quantiles.value_at(median_ranks(self.quantiles.count, self.maximize))
+        return points_from_bounds(self.maximize, self.col_max, self.col_min, median, self.tie_min.min(axis=0),
+                       self.tie_max.max(axis=0))
+
+
+def stream_reference_points(file_name: Union[str, DataSource], criteria: List[int],
+                            filters: Optional[List[Filter]] = None, k: int = SKETCH_SIZE,
+                            batch_size: int = BATCH_SIZE) -> ReferencePoints:
+    """
+    Punkty odniesienia z jednego przebiegu po paczkach źródła danych, bez wczytywania całej macierzy decyzyjnej
+    :param file_name: (Union[str, DataSource]) : nazwa pliku (.xlsx lub baza SQLite) albo źródło danych
+    :param criteria: (List[int]) : lista wybranych kryteriów (numeracja od 1)
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param k: (int) : pojemność poziomu szkicu kwantyli
+    :param batch_size: (int) : liczba wierszy w paczce
+    :return: (ReferencePoints) : punkty odniesienia (mediana przybliżona)
+    """
+    source = open_source(file_name)
+    all_names = source.criteria_names()
+    criteria = sorted(criteria)
+    c_names = [all_names[j - 1] for j in criteria]
+    W_max_all = source.criteria_meta()[1]
+    sketch = ReferenceSketch([W_max_all[j - 1] for j in criteria if j - 1 < len(W_max_all)], len(c_names), k)
+    for _, values in source.iter_batches(c_names, filters, batch_size):
+        sketch.update(values)
+    if sketch.quantiles.count == 0:
+        raise ValueError("Brak elementów do wyznaczenia punktów odniesienia")
+    return sketch.points()
@@ -1,57 +1,45 @@
 from typing import List, Tuple, Optional, Union
 
 import numpy as np
-import pandas as pd
 from math import sqrt
 from scipy.spatial.distance import braycurtis, chebyshev, canberra, cityblock
+from data_source import DataSource, Filter
+from constraints import Constraints, load_screened
+from reference_points import reference_points
+from layers import layered_rsm
 
 Number = Union[float, int]
 
+CLASSES = ("points", "layers")  # klasy odniesienia: punkty z progu 25%, mediany i średniej albo warstwy niezdominowane
 
-def rsm(D: List[List[Number]], W_max: Optional[List[bool]], metric: str) -> Tuple[List[float], List[Number], List[Number],
-                                                                    List[Number], List[Number]]:
+
+def rsm(D: List[List[Number]], W_max: Optional[List[bool]], metric: str,
+        classes: str = "points") -> Tuple[List[float], List[Number], List[Number], List[Number], List[Number]]:
     """
     Funkcja wyliczająca ranking metodą SP-CS
     :param D: (List[List[Number) : macierz elementów
     :param W_max: (List[bool]) : wektor maksymalizacji kryteriów
     :param metric: (str) : nazwa wykorzystywanej metryki
+    :param classes: (str) : klasy odniesienia: "points" albo "layers" (warstwy niezdominowane, punkty odniesienia
+    zwracane tylko do wykresów)
     :return: (Tuple[str, int, List[Number], List[Number], List[Number], List[Number]) : wektor współczynników
     skoringowych, punkt aspiracji, punkt antyidealny, punkt quo mediana, punkt quo średnia
     """
     m = len(D[0])  # liczba elementów
     n = len(D)  # liczba kryteriow
 
-    aspiration_idx_set = set()  # zbiór indeksów punktu aspiracji
-    aspiration_value = []  # wartości punktu aspiracji
-    anti_ideal_point = []  # punkt antyidealny
-    opt_threshold = []  # punkt graniczny
-    quo_point_mean = []  # punkt quo średnia
-    quo_point_median = []  # punkt quo mediana
-    for j in range(n):  # dla każdego kryterium
-        best_idxs = []
-        if W_max[j]:  # posorotwanie od wartości
-            elements_sorted = [(idx, v) for idx, v in enumerate(D[j])]
-            elements_sorted.sort(key=lambda tup: tup[1], reverse=True)
-        else:
-            elements_sorted = [(idx, v) for idx, v in enumerate(D[j])]
-            elements_sorted.sort(key=lambda tup: tup[1])
-        best_value = elements_sorted[0][1]
-        worst_value = elements_sorted[-1][1]
-        if W_max[j]:
-            opt_threshold.append(abs(best_value - worst_value) * 0.25 + worst_value)
-        else:
-            opt_threshold.append(abs(best_value - worst_value) * 0.25 + best_value)
-        anti_ideal_point.append(worst_value)
-        aspiration_value.append(best_value)
-        quo_point_mean.append(abs(best_value - worst_value) / 2)
-        quo_point_median.append(elements_sorted[m // 2][1])
-        best_idxs.append(elements_sorted[0][0])
-        k = 1
-        while best_value == elements_sorted[k][1]:
-            best_idxs.append(elements_sorted[k][0])  # zebranie punktów o najlepszych wartościach
-            k += 1
-        for idx in best_idxs:
-            aspiration_idx_set.add(idx)
+    points = reference_points(D, W_max)  # punkty odniesienia wyznaczone selekcją, bez sortowania kryteriów
+    aspiration_value = points.aspiration.tolist()  # wartości punktu aspiracji
+    anti_ideal_point = points.anti_ideal.tolist()  # punkt antyidealny
+    opt_threshold = points.threshold.tolist()  # punkt graniczny
+    quo_point_mean = points.quo_mean.tolist()  # punkt quo średnia
+    quo_point_median = points.quo_median.tolist()  # punkt quo mediana
+
+    if classes == "layers":  # klasy aspiracji i status quo z niezdominowanego sortowania elementów
+        score = layered_rsm(D, W_max, metric)[0]
+        return score.tolist(), aspiration_value, anti_ideal_point, quo_point_median, quo_point_mean
+    if classes != "points":
+        raise ValueError("Nieznane klasy odniesienia: {}".format(classes))
 
     pareto = []  # wyznaczenie punktów niezdominowanych
     for i in range(m):
@@ -186,36 +174,29 @@ def rsm(D: List[List[Number]], W_max: Optional[List[bool]], metric: str) -> Tupl
 
 
 
-def compute_rsm(file_name: str, criteria: List[int], metric: str) -> Tuple[str, int, List[List[Number]], List[Number], List[Number], List[Number],
-                                         List[Number], List[str], List[str]]:
+def compute_rsm(file_name: Union[str, DataSource], criteria: List[int], metric: str,
+                filters: Optional[List[Filter]] = None, constraints: Optional[Constraints] = None,
+                classes: str = "points") \
+        -> Tuple[str, int, List[List[Number]], List[Number], List[Number], List[Number], List[Number], List[str],
+                 List[str], np.ndarray, List[float]]:
     """
     Funkcja wyliczająca z pliku ranking metodą sp-cs
-    :param file_name: (str) : nazwa pliku
+    :param file_name: (Union[str, DataSource]) : nazwa pliku (.xlsx lub baza SQLite) albo źródło danych
     :param criteria: (List[int]) : lista wybranych kryteriów
     :param metric: (str) : nazwa wykorzystywanej metryki (przekazywana z gui)
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia odrzucające elementy przed wyliczeniem rankingu
+    :param classes: (str) : klasy odniesienia: "points" albo "layers"
     :return: (Tuple[str, int, List[List[Number]], List[Number], List[Number], List[Number], List[Number], List[str],
-    List[str]]) : wektor współczynników skoringowych jako str, liczba kryetriów, punkty elementów, punkt aspiracji,
-     punkt quo mediana, punkt quo średnia, lista nazw kryteriów i lista nazw elementów
+    List[str], np.ndarray, List[float]]) : wektor współczynników skoringowych jako str, liczba kryetriów, punkty
+     elementów, punkt aspiracji, punkt quo mediana, punkt quo średnia, lista nazw kryteriów, lista nazw elementów,
+     macierz decyzyjna i wektor współczynników skoringowych
     """
-    df = pd.read_excel(file_name)  # wczytanie excel z bazą słuchawek
-    W_max = df['Maksymalizacja'].dropna().tolist()  # wektor logiczny określający, które maksymalizujemy kryterium
-    D = []  # macierz decyzyjna
-    c_names = []  # wektor nazw kryteriów
-    criteria = sorted(criteria)
-    for j in df.columns:
-        if j == 'Lp.' or j == 'Nazwa' or df.columns.get_loc(j) - 1 not in criteria:
-            continue
-        if j == 'Wagi':
-            break
-        D.append(df[j].tolist())
-        c_names.append(j)
+    # wczytanie tylko wybranych kryteriów i nazw, bez elementów odrzuconych przez ograniczenia
+    D, c_names, items_names, _, W_max = load_screened(file_name, criteria, filters, constraints)
     n = len(c_names)
 
-    items_names = []
-    for i in range(len(D[0])):
-        items_names.append(df['Nazwa'][i])
-
-    score, aspiration_value, anti_ideal_point, quo_point_median, quo_point_mean = rsm(D, W_max, metric)  # tworzenie rankingu
+    score, aspiration_value, anti_ideal_point, quo_point_median, quo_point_mean = rsm(D, W_max, metric, classes)  # tworzenie rankingu
 
     rank = []
     for i in range(len(D[0])):
@@ -224,7 +205,8 @@ def compute_rsm(file_name: str, criteria: List[int], metric: str) -> Tuple[str,
     rank.sort(key=lambda tup: tup[1])  # posortowanie rankingu
 
     rank_str = ''
-    for name, score in rank:
-        rank_str += name + ' : ' + '{0:1.3f}'.format(score) + '\n'  # zapis rankingu jako str
+    for name, value in rank:
+        rank_str += name + ' : ' + '{0:1.3f}'.format(value) + '\n'  # zapis rankingu jako str
 
-    return rank_str, n, D, aspiration_value, anti_ideal_point, quo_point_median, quo_point_mean, c_names, items_names
+    return rank_str, n, D, aspiration_value, anti_ideal_point, quo_point_median, quo_point_mean, c_names, items_names, \
+           D, score
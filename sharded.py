@@ -0,0 +1,312 @@
+from typing import List, Tuple, Optional, Union, Dict, Any
+import os
+import multiprocessing
+from multiprocessing.connection import Listener, Client, Connection
+import numpy as np
+from topsis import topsis_cache, topsis_scores, point_distances
+from constraints import Constraints, load_screened
+from export import HIGHER_IS_BETTER
+from reference_points import SKETCH_SIZE, ReferenceSketch, median_ranks, points_from_bounds
+
+Number = Union[float, int]
+Address = Tuple[str, int]
+Candidate = Tuple[str, float]  # (nazwa elementu, współczynnik skoringowy)
+
+BINS = 256  # liczba przedziałów histogramu w jednej rundzie wyznaczania mediany
+EXACT_LIMIT = 4096  # liczba wartości przesyłanych wprost, gdy przedział mediany jest już mały
+MAX_ROUNDS = 64
+MEDIANS = ("exact", "sketch")  # dokładna mediana w kilku rundach albo przybliżona ze szkiców w jednej rundzie
+
+
+class Shard:
+    """
+    Fragment danych przechowywany przez węzeł. Węzeł liczy statystyki częściowe i współczynniki swoich
+    elementów, a do koordynatora trafiają tylko statystyki i najlepsze elementy
+    """
+
+    def __init__(self, D: np.ndarray, items_names: List[str], c_names: List[str], W: List[float],
+                 W_max: List[bool]):
+        self.D = D
+        self.items_names = items_names
+        self.c_names = c_names
+        self.W = W
+        self.W_max = np.asarray([bool(W_max[j]) if j < len(W_max) else True for j in range(len(c_names))])
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Statystyki częściowe: liczba elementów, sumy kwadratów i skrajne wartości kolumn
+        """
+        empty = self.D.shape[1] == 0
+        return {'count': self.D.shape[1], 'c_names': self.c_names, 'W': self.W, 'W_max': self.W_max.tolist(),
+                'squares': np.einsum('ij,ij->i', self.D, self.D),
+                'max': np.full(len(self.c_names), -np.inf) if empty else self.D.max(axis=1),
+                'min': np.full(len(self.c_names), np.inf) if empty else self.D.min(axis=1)}
+
+    def histogram(self, edges: np.ndarray, closed: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Histogram wartości z przedziałów [edges[0], edges[-1]) (domkniętych, gdy closed) każdego kryterium
+        :return: liczności, minima i maksima przedziałów histogramu [n x BINS]
+        """
+        n, bins = edges.shape[0], edges.shape[1] - 1
+        counts = np.zeros((n, bins), dtype=np.int64)
+        low = np.full((n, bins), np.inf)
+        high = np.full((n, bins), -np.inf)
+        for j in range(n):
+            v = self._in_range(j, edges[j, 0], edges[j, -1], closed[j])
+            b = np.clip(np.searchsorted(edges[j], v, side='right') - 1, 0, bins - 1)
+            counts[j] = np.bincount(b, minlength=bins)
+            np.minimum.at(low[j], b, v)
+            np.maximum.at(high[j], b, v)
+        return counts, low, high
+
+    def _in_range(self, j: int, lo: float, hi: float, closed: bool) -> np.ndarray:
+        v = self.D[j]
+        return v[(v >= lo) & ((v <= hi) if closed else (v < hi))]
+
+    def values(self, j: int, lo: float, hi: float, closed: bool) -> np.ndarray:
+        return self._in_range(j, lo, hi, closed)
+
+    def sketch(self, k: int) -> ReferenceSketch:
+        """
+        Łączony szkic punktów odniesienia fragmentu (jedna runda zamiast wyszukiwania mediany)
+        """
+        sketch = ReferenceSketch(self.W_max.tolist(), len(self.c_names), k)
+        sketch.update(self.D)
+        return sketch
+
+    def rsm_points(self, points: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Elementy niezdominowane fragmentu i ich odległości od punktu aspiracji i punktów quo
+        :return: maska elementów niezdominowanych, odległości [3 x m]
+        """
+        threshold = points['threshold']
+        passed = np.where(self.W_max[:, None], self.D >= threshold[:, None], self.D <= threshold[:, None])
+        pareto = passed.any(axis=0)
+        d = np.stack([point_distances(self.D, points[key], points['metric'])
+                      for key in ('aspiration', 'quo_median', 'quo_mean')])
+        return pareto, d
+
+    def rsm_max(self, points: Dict[str, np.ndarray]) -> np.ndarray:
+        pareto, d = self.rsm_points(points)
+        return d[:, pareto].max(axis=1, initial=0.0)
+
+    def top(self, score: np.ndarray, reverse: bool, top_k: int) -> List[Candidate]:
+        """
+        Najlepsze elementy fragmentu
+        """
+        key = np.nan_to_num(-score if reverse else score, nan=np.inf)
+        k = min(top_k, len(key))
+        idx = np.argpartition(key, k - 1)[:k] if 0 < k < len(key) else np.arange(len(key))
+        return [(self.items_names[i], float(score[i])) for i in idx if np.isfinite(key[i])]
+
+    def score(self, params: Dict[str, Any]) -> List[Candidate]:
+        """
+        Lokalne współczynniki skoringowe dla globalnych statystyk i najlepsze elementy fragmentu
+        """
+        if params['method'] == "TOPSIS":
+            cache = topsis_cache(self.D, self.W_max, params['metric'], norms=params['norms'],
+                                 extremes=params['extremes'])
+            c = topsis_scores(cache, params['W'])[0]
+            return self.top(c, True, params['top_k'])
+        pareto, d = self.rsm_points(params)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            d = d / params['d_max'][:, None]
+        score = np.where(pareto, d[0] - np.minimum(d[1], d[2]), np.inf)
+        return self.top(score, False, params['top_k'])
+
+
+def serve_shard(address: Address, file_name: str, criteria: List[int], authkey: bytes,
+                shard: Optional[Tuple[int, int]] = None, constraints: Optional[Constraints] = None,
+                ready=None) -> None:
+    """
+    Węzeł przechowujący fragment danych i odpowiadający na zapytania koordynatora. Połączenia przesyłają obiekty
+    serializowane przez pickle, więc klucz musi być tajny i znany tylko koordynatorowi
+    :param address: (Address) : adres nasłuchiwania (port 0 - dowolny wolny port)
+    :param file_name: (str) : plik z fragmentem danych (.xlsx lub baza SQLite)
+    :param criteria: (List[int]) : lista wybranych kryteriów
+    :param authkey: (bytes) : tajny klucz uwierzytelniający (np. os.urandom(32))
+    :param shard: (Tuple[int, int]) : (numer, liczba) fragmentów, gdy wszystkie węzły czytają ten sam plik
+    :param constraints: (Constraints) : twarde ograniczenia
+    :param ready: (Connection) : połączenie, którym wysyłany jest adres nasłuchiwania
+    :return: None
+    """
+    if not authkey:
+        raise ValueError("Brak klucza uwierzytelniającego węzła")
+    D, c_names, items_names, W, W_max = load_screened(file_name, criteria, constraints=constraints)
+    if shard is not None:  # podział jednego pliku na ciągłe fragmenty (np. do testów na jednej maszynie)
+        idx = np.array_split(np.arange(D.shape[1]), shard[1])[shard[0]]
+        D = D[:, idx]
+        items_names = [items_names[i] for i in idx]
+    data = Shard(D, items_names, c_names, W, W_max)
+
+    with Listener(address, authkey=authkey) as listener:
+        if ready is not None:
+            ready.send(listener.address)
+            ready.close()
+        with listener.accept() as conn:
+            while True:
+                command, payload = conn.recv()
+                if command == 'stop':
+                    break
+                try:
+                    if command == 'stats':
+                        answer = data.stats()
+                    elif command == 'histogram':
+                        answer = data.histogram(*payload)
+                    elif command == 'values':
+                        answer = data.values(*payload)
+                    elif command == 'sketch':
+                        answer = data.sketch(payload)
+                    elif command == 'rsm_max':
+                        answer = data.rsm_max(payload)
+                    elif command == 'score':
+                        answer = data.score(payload)
+                    else:
+                        answer = ValueError("Nieznane polecenie: {}".format(command))
+                except Exception as error:  # błąd polecenia trafia do koordynatora, węzeł działa dalej
+                    answer = error
+                conn.send(answer)
+
+
+def start_local_shards(file_name: str, criteria: List[int], count: int, constraints: Optional[Constraints] = None) \
+        -> Tuple[List[multiprocessing.Process], List[Address], bytes]:
+    """
+    Uruchomienie węzłów na jednej maszynie, każdy z jednym fragmentem tego samego pliku
+    :param file_name: (str) : nazwa pliku
+    :param criteria: (List[int]) : lista wybranych kryteriów
+    :param count: (int) : liczba węzłów
+    :param constraints: (Constraints) : twarde ograniczenia
+    :return: (Tuple[List[multiprocessing.Process], List[Address], bytes]) : procesy węzłów, ich adresy i losowy
+    klucz uwierzytelniający dla sharded_ranking
+    """
+    authkey = os.urandom(32)
+    processes, addresses = [], []
+    for idx in range(count):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=serve_shard, daemon=True,
+                                          args=(('localhost', 0), file_name, criteria, authkey, (idx, count),
+                                                constraints, sender))
+        process.start()
+        sender.close()
+        processes.append(process)
+        addresses.append(receiver.recv())  # adres po wczytaniu danych przez węzeł
+    return processes, addresses, authkey
+
+
+def _ask(conns: List[Connection], command: str, payload: Any = None) -> List[Any]:
+    """
+    Wysłanie polecenia do wszystkich węzłów i zebranie odpowiedzi (węzły liczą równolegle)
+    """
+    for conn in conns:
+        conn.send((command, payload))
+    answers = [conn.recv() for conn in conns]
+    for answer in answers:
+        if isinstance(answer, Exception):
+            raise answer
+    return answers
+
+
+def global_kth(conns: List[Connection], ranks: np.ndarray, col_min: np.ndarray, col_max: np.ndarray) -> np.ndarray:
+    """
+    Dokładne k-te wartości (w kolejności rosnącej) każdego kryterium w rozproszonych danych. W każdej rundzie
+    węzły zwracają histogram przedziału zawierającego szukaną wartość, a gdy przedział jest mały,
+    same wartości
+    :param conns: (List[Connection]) : połączenia z węzłami
+    :param ranks: (np.ndarray) : szukane pozycje (od 0) dla kryteriów
+    :param col_min: (np.ndarray) : globalne minima kryteriów
+    :param col_max: (np.ndarray) : globalne maksima kryteriów
+    :return: (np.ndarray) : wektor k-tych wartości
+    """
+    n = len(ranks)
+    lo, hi = col_min.astype(float).copy(), col_max.astype(float).copy()
+    closed = np.ones(n, dtype=bool)
+    below = np.zeros(n, dtype=np.int64)  # liczba wartości mniejszych od dolnej granicy przedziału
+    result = np.full(n, np.nan)
+    active = lo < hi
+    result[~active] = lo[~active]
+
+    for _ in range(MAX_ROUNDS):
+        if not active.any():
+            break
+        edges = np.linspace(lo, hi, BINS + 1, axis=1)
+        answers = _ask(conns, 'histogram', (edges, closed))
+        counts = sum(a[0] for a in answers)
+        low = np.minimum.reduce([a[1] for a in answers])
+        high = np.maximum.reduce([a[2] for a in answers])
+        for j in np.flatnonzero(active):
+            cumulative = np.cumsum(counts[j])
+            b = int(np.searchsorted(cumulative, ranks[j] - below[j], side='right'))
+            below[j] += cumulative[b - 1] if b > 0 else 0
+            lo[j], hi[j], closed[j] = low[j, b], high[j, b], True  # zawężenie do wartości w przedziale
+            if lo[j] == hi[j]:
+                result[j] = lo[j]
+                active[j] = False
+            elif counts[j, b] <= EXACT_LIMIT:
+                values = np.sort(np.concatenate(_ask(conns, 'values', (j, lo[j], hi[j], True))))
+                result[j] = values[ranks[j] - below[j]]
+                active[j] = False
+    return result
+
+
+def sharded_ranking(addresses: List[Address], authkey: bytes, method: str, metric: str,
+                    W: Optional[List[Number]] = None, top_k: int = 10, stop: bool = True, median: str = "exact",
+                    k: int = SKETCH_SIZE) -> List[Candidate]:
+    """
+    Ranking metodą topsis lub rsm na danych podzielonych między węzły: węzły liczą statystyki częściowe,
+    koordynator je łączy, a następnie węzły liczą współczynniki lokalnie i zwracają najlepsze elementy
+    :param addresses: (List[Address]) : adresy węzłów
+    :param authkey: (bytes) : tajny klucz uwierzytelniający węzłów
+    :param method: (str) : nazwa metody (TOPSIS, RSM)
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param W: (List[Number]) : wektor wag (domyślnie z pliku, tylko TOPSIS)
+    :param top_k: (int) : liczba najlepszych elementów
+    :param stop: (bool) : czy zakończyć pracę węzłów po obliczeniach
+    :param median: (str) : "exact" - dokładna mediana w kilku rundach, "sketch" - przybliżona ze szkiców węzłów
+    w jednej rundzie (tylko RSM)
+    :param k: (int) : pojemność poziomu szkicu kwantyli
+    :return: (List[Candidate]) : najlepsze elementy od najlepszego
+    """
+    if method not in ("TOPSIS", "RSM"):
+        raise ValueError("Nieznana metoda: {}".format(method))
+    if median not in MEDIANS:
+        raise ValueError("Nieznany sposób wyznaczania mediany: {}".format(median))
+    if not authkey:
+        raise ValueError("Brak klucza uwierzytelniającego węzłów")
+    conns = [Client(address, authkey=authkey) for address in addresses]
+    try:
+        stats = _ask(conns, 'stats')
+        c_names = stats[0]['c_names']
+        if any(s['c_names'] != c_names for s in stats):
+            raise ValueError("Węzły mają różne kryteria")
+        m = sum(s['count'] for s in stats)
+        col_max = np.maximum.reduce([s['max'] for s in stats])
+        col_min = np.minimum.reduce([s['min'] for s in stats])
+        W_max = np.asarray(stats[0]['W_max'], dtype=bool)
+
+        if method == "TOPSIS":
+            params = {'method': method, 'metric': metric, 'top_k': top_k,
+                      'norms': np.sqrt(sum(s['squares'] for s in stats)), 'extremes': (col_max, col_min),
+                      'W': W if W is not None else stats[0]['W']}
+        else:
+            if median == "sketch":
+                sketches = _ask(conns, 'sketch', k)
+                for sketch in sketches[1:]:
+                    sketches[0].merge(sketch)
+                points = sketches[0].points()
+            else:
+                kth = global_kth(conns, median_ranks(m, W_max), col_min, col_max)  # element m // 2 jak w funkcji rsm
+                points = points_from_bounds(W_max, col_max, col_min, kth, col_min, col_max)  # bez granicy SP-CS
+            params = {'method': method, 'metric': metric, 'top_k': top_k, 'aspiration': points.aspiration,
+                      'threshold': points.threshold, 'quo_mean': points.quo_mean, 'quo_median': points.quo_median}
+            params['d_max'] = np.maximum.reduce(_ask(conns, 'rsm_max', params))  # normalizacja po wszystkich węzłach
+
+        candidates = [c for part in _ask(conns, 'score', params) for c in part]
+        reverse = HIGHER_IS_BETTER[method]
+        candidates.sort(key=lambda tup: -tup[1] if reverse else tup[1])
+        if stop:
+            for conn in conns:
+                conn.send(('stop', None))
+        return candidates[:top_k]
+    finally:
+        for conn in conns:
+            conn.close()
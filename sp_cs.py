@@ -1,9 +1,11 @@
 from typing import List, Tuple, Optional, Union
 import random
-import pandas as pd
 from math import sqrt
 import numpy as np
 from scipy.spatial.distance import braycurtis, chebyshev, canberra, cityblock
+from data_source import DataSource, Filter
+from constraints import Constraints, load_screened
+from reference_points import reference_points
 
 Number = Union[float, int]
 
@@ -23,48 +25,13 @@ def sp_cs(D: List[List[Number]], W_max: Optional[List[bool]], metric: str) -> Tu
     m = len(D[0])  # liczba elementów
     n = len(D)  # liczba kryteriow
 
-    aspiration_idx_set = set()  # zbiór indeksów punktu aspiracji
-    aspiration_value = []  # wartości punktu aspiracji
-    quo_point_mean = []  # punkt quo średnia
-    quo_point_median = []  # punkt quo mediana
-    quo_point_random = []  # punkt quo losowo
-    for j in range(n):  # dla każdego kryterium
-        best_idxs = []
-        if W_max[j]:  # posorotwanie od wartości
-            elements_sorted = [(idx, v) for idx, v in enumerate(D[j])]
-            elements_sorted.sort(key=lambda tup: tup[1], reverse=True)
-        else:
-            elements_sorted = [(idx, v) for idx, v in enumerate(D[j])]
-            elements_sorted.sort(key=lambda tup: tup[1])
-        best_value = elements_sorted[0][1]
-        worst_value = elements_sorted[-1][1]
-        aspiration_value.append(best_value)
-        quo_point_mean.append(abs(best_value - worst_value) / 2)
-        quo_point_median.append(elements_sorted[m // 2][1])
-        quo_point_random.append(abs(best_value - worst_value) * random.random() + worst_value)
-        best_idxs.append(elements_sorted[0][0])
-        k = 1
-        while best_value == elements_sorted[k][1]:
-            best_idxs.append(elements_sorted[k][0])  # zebranie punktów o najlepszych wartościach
-            k += 1
-        for idx in best_idxs:
-            aspiration_idx_set.add(idx)
-
-    aspiration_idx = list(aspiration_idx_set)
-
-    threshold_value = []  # wyznaczenie granicy do znalezienia punktów zdominowanych
-    for j in range(n):
-        if W_max[j]:
-            worst_value = float('inf')
-            for i in aspiration_idx:
-                if D[j][i] < worst_value:
-                    worst_value = D[j][i]
-        else:
-            worst_value = 0
-            for i in aspiration_idx:
-                if D[j][i] > worst_value:
-                    worst_value = D[j][i]
-        threshold_value.append(worst_value)
+    points = reference_points(D, W_max)  # punkty odniesienia wyznaczone selekcją, bez sortowania kryteriów
+    aspiration_value = points.aspiration.tolist()  # wartości punktu aspiracji
+    quo_point_mean = points.quo_mean.tolist()  # punkt quo średnia
+    quo_point_median = points.quo_median.tolist()  # punkt quo mediana
+    quo_point_random = [abs(best_value - worst_value) * random.random() + worst_value  # punkt quo losowo
+                        for best_value, worst_value in zip(aspiration_value, points.anti_ideal.tolist())]
+    threshold_value = points.aspiration_threshold.tolist()  # granica do znalezienia punktów zdominowanych
 
     not_dominated_idx = []  # wyznaczenie punktów niezdominowanych
     for i in range(m):
@@ -145,35 +112,26 @@ def sp_cs(D: List[List[Number]], W_max: Optional[List[bool]], metric: str) -> Tu
     return score, data_0, data_1, quo_point_mean, quo_point_median, quo_point_random, disrupted_aspiration_point1, \
            disrupted_aspiration_point2, disrupted_aspiration_point3
 
-def compute_sp_cs(file_name: str, criteria: List[int], metric: str) -> Tuple[str, int, List[Number], List[Number], List[float], List[Number], List[float],
-                                           List[float], List[float], List[float], List[str], List[str]]:
+def compute_sp_cs(file_name: Union[str, DataSource], criteria: List[int], metric: str,
+                  filters: Optional[List[Filter]] = None, constraints: Optional[Constraints] = None) \
+        -> Tuple[str, int, List[Number], List[Number], List[float], List[Number], List[float], List[float],
+                 List[float], List[float], List[str], List[str], np.ndarray, List[float]]:
     """
     Funkcja wyliczająca z pliku ranking metodą sp-cs
-    :param file_name: (str) : nazwa pliku
+    :param file_name: (Union[str, DataSource]) : nazwa pliku (.xlsx lub baza SQLite) albo źródło danych
     :param criteria: (List[int]) : lista wybranych kryteriów
     :param metric: (str) : nazwa wykorzystywanej metryki
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia odrzucające elementy przed wyliczeniem rankingu
     :return: (Tuple[str, int, List[Number], List[Number], List[float], List[Number], List[float], List[float],
-     List[float], List[float], List[str], List[str]]) : wektor współczynników skoringowych jako str, liczba kryetriów,
-     punkty elementów x, punkty elementów y, punkty quo, punkty aspiracji, lista nazw kryteriów i lista nazw elementów
+     List[float], List[float], List[str], List[str], np.ndarray, List[float]]) : wektor współczynników skoringowych
+     jako str, liczba kryetriów, punkty elementów x, punkty elementów y, punkty quo, punkty aspiracji, lista nazw
+     kryteriów, lista nazw elementów, macierz decyzyjna i wektor współczynników skoringowych
     """
-    df = pd.read_excel(file_name)  # wczytanie excel z bazą słuchawek
-    W_max = df['Maksymalizacja'].dropna().tolist()  # wektor logiczny określający, które maksymalizujemy kryterium
-    D = []  # macierz decyzyjna
-    c_names = []  # wektor nazw kryteriów
-    criteria = sorted(criteria)
-    for j in df.columns:
-        if j == 'Lp.' or j == 'Nazwa' or df.columns.get_loc(j) - 1 not in criteria:
-            continue
-        if j == 'Wagi':
-            break
-        D.append(df[j].tolist())
-        c_names.append(j)
+    # wczytanie tylko wybranych kryteriów i nazw, bez elementów odrzuconych przez ograniczenia
+    D, c_names, items_names, _, W_max = load_screened(file_name, criteria, filters, constraints)
     n = len(c_names)
 
-    items_names = []
-    for i in range(len(D[0])):
-        items_names.append(df['Nazwa'][i])
-
     score, data_0, data_1, quo_point_mean, quo_point_median, quo_point_random, disrupted_aspiration_point1, \
     disrupted_aspiration_point2, disrupted_aspiration_point3 = sp_cs(D, W_max, metric)  # tworzenie rankingu
 
@@ -184,8 +142,9 @@ def compute_sp_cs(file_name: str, criteria: List[int], metric: str) -> Tuple[str
     rank.sort(key=lambda tup: tup[1], reverse=True)  # posortowanie rankingu
 
     rank_str = ''
-    for name, score in rank:
-        rank_str += name + ' : ' + '{0:1.3f}'.format(score) + '\n'  # zapis rankingu jako str
+    for name, value in rank:
+        rank_str += name + ' : ' + '{0:1.3f}'.format(value) + '\n'  # zapis rankingu jako str
 
     return rank_str, n, data_0, data_1, quo_point_mean, quo_point_median, quo_point_random, \
-           disrupted_aspiration_point1, disrupted_aspiration_point2, disrupted_aspiration_point3, c_names, items_names
+           disrupted_aspiration_point1, disrupted_aspiration_point2, disrupted_aspiration_point3, c_names, items_names, D, \
+           score
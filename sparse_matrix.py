@@ -0,0 +1,299 @@
+from typing import List, Tuple, Optional, Union, NamedTuple
+import numpy as np
+from topsis import _distance_parts
+from reference_points import median_ranks, points_from_bounds, _maximized
+from export import HIGHER_IS_BETTER
+from data_source import DataSource, Filter, BATCH_SIZE, open_source
+from constraints import Constraints, screen
+
+Number = Union[float, int]
+
+POLICIES = ("skip", "impute", "penalize")  # pominięcie braku, średnia kryterium, najgorsza wartość kryterium
+
+
+class SparseMatrix(NamedTuple):
+    """
+    Macierz decyzyjna z brakami wartości: przechowywane są tylko obecne wartości, kryterium po kryterium (układ CSR)
+    """
+    values: np.ndarray  # obecne wartości
+    items: np.ndarray  # indeks elementu każdej wartości
+    indptr: np.ndarray  # wartości kryterium j to values[indptr[j]:indptr[j + 1]]
+    shape: Tuple[int, int]  # (liczba kryteriów, liczba elementów)
+
+    def criteria(self) -> np.ndarray:
+        """
+        Indeks kryterium każdej wartości
+        """
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    def counts(self) -> np.ndarray:
+        """
+        Liczba obecnych wartości każdego kryterium
+        """
+        return np.diff(self.indptr)
+
+
+def from_dense(D: List[List[Number]]) -> SparseMatrix:
+    """
+    Macierz rzadka z macierzy gęstej (NaN - brak wartości)
+    :param D: (List[List[Number]]) : macierz decyzyjna D[n x m]
+    :return: (SparseMatrix) : macierz rzadka
+    """
+    D = np.asarray(D, dtype=float)
+    rows, items = np.nonzero(~np.isnan(D))  # kolejność wierszami, więc wartości są pogrupowane kryteriami
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=D.shape[0]))))
+    return SparseMatrix(D[rows, items], items, indptr, D.shape)
+
+
+def to_dense(S: SparseMatrix) -> np.ndarray:
+    """
+    Macierz gęsta z brakami jako NaN (np. do eksportu i wykresów)
+    :param S: (SparseMatrix) : macierz rzadka
+    :return: (np.ndarray) : macierz decyzyjna D[n x m]
+    """
+    D = np.full(S.shape, np.nan)
+    D[S.criteria(), S.items] = S.values
+    return D
+
+
+def load_sparse(file_name: Union[str, DataSource], criteria: List[int], filters: Optional[List[Filter]] = None,
+                constraints: Optional[Constraints] = None, batch_size: int = BATCH_SIZE) \
+        -> Tuple[SparseMatrix, List[str], List[str], List[float], List[bool]]:
+    """
+    Wczytanie macierzy rzadkiej paczkami: gęsta jest tylko bieżąca paczka, a twarde ograniczenia są sprawdzane
+    przed odrzuceniem pustych komórek (brak wartości nie spełnia ograniczenia)
+    :param file_name: (Union[str, DataSource]) : nazwa pliku (.xlsx lub baza SQLite) albo źródło danych
+    :param criteria: (List[int]) : lista wybranych kryteriów (numeracja od 1)
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia
+    :param batch_size: (int) : liczba wierszy w paczce
+    :return: (Tuple[SparseMatrix, List[str], List[str], List[float], List[bool]]) : macierz rzadka, lista nazw
+    kryteriów, lista nazw elementów, wektor wag i wektor maksymalizacji wybranych kryteriów
+    """
+    source = open_source(file_name)
+    all_names = source.criteria_names()
+    criteria = sorted(criteria)
+    c_names = [all_names[k - 1] for k in criteria]
+    W_all, W_max_all = source.criteria_meta()
+    W = [W_all[k - 1] for k in criteria if k - 1 < len(W_all)]
+    W_max = [W_max_all[k - 1] for k in criteria if k - 1 < len(W_max_all)]
+    pushed, trees, names = constraints.split(all_names) if constraints else ([], [], {})
+    columns = c_names + sorted(set(names.values()) - set(c_names))  # kolumny potrzebne tylko do ograniczeń na końcu
+
+    items_names, values, items = [], [[] for _ in c_names], [[] for _ in c_names]
+    for batch_names, batch in source.iter_batches(columns, list(filters or []) + pushed, batch_size):
+        if trees:
+            mask = screen(batch, columns, trees, names)
+            batch = batch[:, mask]
+            batch_names = [name for name, keep in zip(batch_names, mask) if keep]
+        for j in range(len(c_names)):
+            present = np.flatnonzero(~np.isnan(batch[j]))
+            values[j].append(batch[j, present])
+            items[j].append(present + len(items_names))
+        items_names.extend(batch_names)
+    if not items_names:
+        raise ValueError("Żaden element nie spełnia ograniczeń")
+
+    counts = [sum(len(part) for part in parts) for parts in values]
+    S = SparseMatrix(np.concatenate([v for parts in values for v in parts] or [np.empty(0)]),
+                     np.concatenate([i for parts in items for i in parts] or [np.empty(0, dtype=np.int64)]),
+                     np.concatenate(([0], np.cumsum(counts))).astype(np.int64), (len(c_names), len(items_names)))
+    return S, c_names, items_names, W, W_max
+
+
+def sparse_extremes(S: SparseMatrix) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Maksima i minima obecnych wartości kryteriów (NaN dla kryteriów bez wartości)
+    :param S: (SparseMatrix) : macierz rzadka
+    :return: (Tuple[np.ndarray, np.ndarray]) : wektor maksimów, wektor minimów
+    """
+    col_max, col_min = np.full(S.shape[0], np.nan), np.full(S.shape[0], np.nan)
+    filled = np.flatnonzero(S.counts() > 0)
+    if len(filled):  # puste kryteria nie mają własnych odcinków, więc odcinek kończy się na kolejnym niepustym
+        col_max[filled] = np.maximum.reduceat(S.values, S.indptr[filled])
+        col_min[filled] = np.minimum.reduceat(S.values, S.indptr[filled])
+    return col_max, col_min
+
+
+def fill_values(S: SparseMatrix, policy: str, maximize: np.ndarray, col_max: np.ndarray,
+                col_min: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Wartość przyjmowana za brak w każdym kryterium
+    :param S: (SparseMatrix) : macierz rzadka
+    :param policy: (str) : "skip" - brak nie wchodzi do odległości, "impute" - średnia obecnych wartości,
+    "penalize" - najgorsza obecna wartość
+    :param maximize: (np.ndarray) : wektor maksymalizacji kryteriów
+    :param col_max: (np.ndarray) : maksima kryteriów
+    :param col_min: (np.ndarray) : minima kryteriów
+    :return: (np.ndarray) : wartości zastępcze (None dla "skip")
+    """
+    if policy not in POLICIES:
+        raise ValueError("Nieznana obsługa braków: {}".format(policy))
+    if policy == "skip":
+        return None
+    if policy == "impute":
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.bincount(S.criteria(), S.values, minlength=S.shape[0]) / S.counts()
+    return np.where(maximize, col_min, col_max)
+
+
+def _missing_max(S: SparseMatrix, rows: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    Największy ze składników c kryteriów, których brakuje elementowi. Kryteria są numerowane od największego
+    składnika, a szukany numer to najmniejszy numer nieobecny wśród wartości elementu
+    """
+    m, n = S.shape[1], S.shape[0]
+    order = np.argsort(-c, kind='stable')
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    r = rank[rows]
+    srt = np.lexsort((r, S.items))
+    items, r = S.items[srt], r[srt]
+    counts = np.bincount(S.items, minlength=m)
+    position = np.arange(len(r)) - (np.cumsum(counts) - counts)[items]
+    first_missing = counts.copy()
+    gap = r != position
+    np.minimum.at(first_missing, items[gap], position[gap])
+    return np.append(c[order], 0.0)[first_missing]
+
+
+def sparse_distances(S: SparseMatrix, p: np.ndarray, metric: str, coef: np.ndarray,
+                     fill: Optional[np.ndarray] = None, scale: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Odległości wszystkich elementów od punktu liczone tylko po obecnych wartościach. Braki wnoszą stały składnik
+    kryterium: suma składników wszystkich braków to suma po wszystkich kryteriach bez kryteriów obecnych u elementu
+    :param S: (SparseMatrix) : macierz rzadka
+    :param p: (np.ndarray) : punkt odniesienia (w skali wartości po podzieleniu przez scale)
+    :param metric: (str) : nazwa metryki
+    :param coef: (np.ndarray) : mnożniki składników kryteriów (np. wagi)
+    :param fill: (np.ndarray) : wartości zastępcze braków (None - braki pomijane)
+    :param scale: (np.ndarray) : dzielniki wartości kryteriów (np. normy, domyślnie 1)
+    :return: (np.ndarray) : wektor odległości
+    """
+    n, m = S.shape
+    rows = S.criteria()
+    scale = np.ones(n) if scale is None else scale
+    with np.errstate(divide='ignore', invalid='ignore'):
+        parts = _distance_parts(S.values / scale[rows], p[rows], metric)
+        fill_parts = None if fill is None else _distance_parts(fill / scale, p, metric)
+    totals = []
+    for k, part in enumerate(parts):
+        contribution = coef[rows] * part
+        c = None if fill_parts is None else np.nan_to_num(coef * fill_parts[k])  # kryteria bez wartości - 0
+        if metric == "Chebyshev":
+            total = np.zeros(m)
+            np.maximum.at(total, S.items, contribution)
+            if c is not None:
+                total = np.maximum(total, _missing_max(S, rows, c))
+        else:
+            total = np.bincount(S.items, contribution, minlength=m)
+            if c is not None:
+                total += np.maximum(c.sum() - np.bincount(S.items, c[rows], minlength=m), 0.0)
+        totals.append(total)
+    if metric == "Default":
+        return np.sqrt(totals[0])
+    if metric == "Bray-Curtis":
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return totals[0] / totals[1]
+    return totals[0]
+
+
+def sparse_topsis(S: SparseMatrix, W: List[Number], W_max: Optional[List[bool]], metric: str,
+                  policy: str = "skip") -> np.ndarray:
+    """
+    Metoda topsis na macierzy rzadkiej: normy, punkty idealne i odległości liczone po obecnych wartościach
+    :param S: (SparseMatrix) : macierz rzadka
+    :param W: (List[Number]) : wektor wag
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów (domyślnie każde)
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param policy: (str) : obsługa braków (skip, impute, penalize)
+    :return: (np.ndarray) : wektor współczynników skoringowych
+    """
+    n, m = S.shape
+    maximize = _maximized(W_max, n)
+    col_max, col_min = sparse_extremes(S)
+    fill = fill_values(S, policy, maximize, col_max, col_min)
+    squares = np.bincount(S.criteria(), np.square(S.values), minlength=n)
+    if fill is not None:  # wartości zastępcze wchodzą do normy jak obecne
+        squares += (m - S.counts()) * np.square(np.nan_to_num(fill))
+    norms = np.sqrt(squares)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        u_ideal = np.where(maximize, col_max, col_min) / norms
+        u_anti_ideal = np.where(maximize, col_min, col_max) / norms
+    W = np.asarray(W, dtype=float)[:n]
+    coef = np.square(W) if metric == "Default" else ((W > 0).astype(float) if metric == "Canberra" else W)
+    d_star = sparse_distances(S, u_ideal, metric, coef, fill, norms)
+    d_minus = sparse_distances(S, u_anti_ideal, metric, coef, fill, norms)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return d_minus / (d_minus + d_star)
+
+
+def sparse_rsm(S: SparseMatrix, W_max: Optional[List[bool]], metric: str, policy: str = "skip") -> np.ndarray:
+    """
+    Metoda RSM na macierzy rzadkiej. Punkty odniesienia (także mediana) pochodzą z obecnych wartości, a element
+    jest niezdominowany, gdy jego wartość albo wartość zastępcza braku przekracza punkt graniczny
+    :param S: (SparseMatrix) : macierz rzadka
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów (domyślnie każde)
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param policy: (str) : obsługa braków (skip, impute, penalize)
+    :return: (np.ndarray) : wektor współczynników skoringowych (inf dla elementów zdominowanych)
+    """
+    n, m = S.shape
+    maximize = _maximized(W_max, n)
+    col_max, col_min = sparse_extremes(S)
+    counts = S.counts()
+    ranks = median_ranks(counts, maximize)
+    median = np.full(n, np.nan)
+    for j in np.flatnonzero(counts):
+        median[j] = np.partition(S.values[S.indptr[j]:S.indptr[j + 1]], ranks[j])[ranks[j]]
+    points = points_from_bounds(maximize, col_max, col_min, median, col_min, col_max)
+    fill = fill_values(S, policy, maximize, col_max, col_min)
+
+    rows = S.criteria()
+    threshold = points.threshold
+    passed = np.where(maximize[rows], S.values >= threshold[rows], S.values <= threshold[rows])
+    pareto = np.bincount(S.items, passed, minlength=m) > 0
+    if fill is not None:  # brak kryterium, którego wartość zastępcza przekracza punkt graniczny
+        fill_passed = np.where(maximize, fill >= threshold, fill <= threshold) & (counts > 0) & (counts < m)
+        pareto |= np.bincount(S.items, fill_passed[rows], minlength=m) < fill_passed.sum()
+
+    coef = np.ones(n)
+    d = np.stack([sparse_distances(S, np.nan_to_num(reference), metric, coef, fill)
+                  for reference in (points.aspiration, points.quo_median, points.quo_mean)])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d = d / d[:, pareto].max(axis=1, initial=0.0)[:, None]
+    return np.where(pareto, d[0] - np.minimum(d[1], d[2]), np.inf)
+
+
+def compute_sparse(file_name: Union[str, DataSource], criteria: List[int], method: str, metric: str,
+                   policy: str = "skip", weights: Optional[List[float]] = None,
+                   filters: Optional[List[Filter]] = None, constraints: Optional[Constraints] = None) \
+        -> Tuple[str, List[str], List[str], SparseMatrix, List[float]]:
+    """
+    Funkcja wyliczająca z pliku ranking metodą topsis albo rsm dla danych z brakami wartości
+    :param file_name: (Union[str, DataSource]) : nazwa pliku (.xlsx lub baza SQLite) albo źródło danych
+    :param criteria: (List[int]) : lista wybranych kryteriów
+    :param method: (str) : nazwa metody (TOPSIS, RSM)
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param policy: (str) : obsługa braków (skip, impute, penalize)
+    :param weights: (List[float]) : lista wag (domyślnie z pliku, tylko TOPSIS)
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia odrzucające elementy przed wyliczeniem rankingu
+    :return: (Tuple[str, List[str], List[str], SparseMatrix, List[float]]) : ranking jako str, lista nazw kryteriów,
+    lista nazw elementów, macierz rzadka, wektor współczynników skoringowych
+    """
+    if method not in ("TOPSIS", "RSM"):
+        raise ValueError("Nieznana metoda: {}".format(method))
+    S, c_names, items_names, W_file, W_max = load_sparse(file_name, criteria, filters, constraints)
+    if method == "TOPSIS":
+        W = weights if weights else (W_file if len(W_file) == len(c_names) else [1.0] * len(c_names))
+        score = sparse_topsis(S, W, W_max, metric, policy)
+    else:
+        score = sparse_rsm(S, W_max, metric, policy)
+
+    rank_str = ''
+    key = np.nan_to_num(-score if HIGHER_IS_BETTER[method] else score, nan=np.inf)
+    for i in np.argsort(key, kind='stable'):  # posortowanie rankingu
+        rank_str += items_names[i] + ' : ' + '{0:1.3f}'.format(score[i]) + '\n'  # zapis rankingu jako str
+
+    return rank_str, c_names, items_names, S, score.tolist()
@@ -0,0 +1,275 @@
+from typing import List, Tuple, Optional, Union, Dict, NamedTuple
+import os
+import heapq
+from math import comb
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from topsis import topsis_cache
+
+Number = Union[float, int]
+SubsetTop = Tuple[Tuple[int, ...], Tuple[int, ...]]  # (indeksy kryteriów podzbioru, najlepsze elementy)
+
+ADDITIVE_METRICS = ("Default", "City Block")  # metryki, w których składniki kryteriów się sumują
+CHUNK = 4096  # liczba kolejnych podzbiorów w jednym zadaniu (ogranicza też narastanie błędów zaokrągleń)
+LIMIT = 20  # liczba zapamiętanych podzbiorów ze zmienioną czołówką
+
+_worker = {}  # stan procesu roboczego (składniki odległości kryteriów)
+
+
+class SubsetResult(NamedTuple):
+    """
+    Wyniki przeglądu podzbiorów kryteriów
+    """
+    full: Tuple[int, ...]  # najlepsze elementy dla wszystkich kryteriów
+    changed: List[SubsetTop]  # podzbiory najbliższe pełnemu zestawowi, dla których czołówka jest inna
+    changed_count: int  # liczba wszystkich podzbiorów ze zmienioną czołówką
+    evaluated: int  # liczba sprawdzonych podzbiorów
+    winners: Dict[int, int]  # liczba podzbiorów, w których wygrywa inny element
+
+
+def _topsis_terms(D: np.ndarray, W_max: List[bool], metric: str, W: List[Number]) -> np.ndarray:
+    """
+    Składniki odległości od punktu idealnego i antyidealnego dla każdego kryterium osobno. Normy i punkty
+    odniesienia kryterium nie zależą od pozostałych kryteriów, więc składniki podzbioru to suma wierszy
+    :return: (np.ndarray) : składniki [n x 2 x m]
+    """
+    cache = topsis_cache(D, W_max, metric)
+    W = np.asarray(W, dtype=float)[:D.shape[0], None]
+    scale = np.square(W) if metric == "Default" else W
+    return np.stack([scale * cache.parts_star[0], scale * cache.parts_minus[0]], axis=1)
+
+
+def _rsm_terms(D: np.ndarray, W_max: List[bool], metric: str) -> np.ndarray:
+    """
+    Składniki metody RSM dla każdego kryterium osobno: czy element przekracza punkt graniczny kryterium (element
+    jest niezdominowany, gdy przekracza go w dowolnym kryterium podzbioru) oraz składniki odległości od punktu
+    aspiracji i punktów quo, liczone tak samo jak w funkcji rsm
+    :return: (np.ndarray) : składniki [n x 4 x m]
+    """
+    n, m = D.shape
+    W_max = np.asarray([bool(W_max[j]) if j < len(W_max) else True for j in range(n)])
+    col_max, col_min = D.max(axis=1), D.min(axis=1)
+    best = np.where(W_max, col_max, col_min)
+    worst = np.where(W_max, col_min, col_max)
+    threshold = np.abs(best - worst) * 0.25 + np.where(W_max, worst, best)
+    ascending = np.sort(D, axis=1)
+    median = np.where(W_max, ascending[:, m - 1 - m // 2], ascending[:, m // 2])  # element m // 2 po sortowaniu
+    mean = np.abs(best - worst) / 2
+
+    passed = np.where(W_max[:, None], D >= threshold[:, None], D <= threshold[:, None]).astype(float)
+    power = 2 if metric == "Default" else 1
+    return np.stack([passed] + [np.abs(D - p[:, None]) ** power for p in (best, mean, median)], axis=1)
+
+
+def _init_worker(terms: np.ndarray, method: str, metric: str, max_size: int, top_k: int,
+                 full: Tuple[int, ...] = (), limit: int = LIMIT) -> None:
+    _worker.update(terms=terms, method=method, metric=metric, max_size=max_size, top_k=top_k, full=full, limit=limit)
+
+
+def _top(sums: np.ndarray) -> Tuple[int, ...]:
+    """
+    Najlepsze elementy dla zsumowanych składników podzbioru
+    :param sums: (np.ndarray) : sumy składników kryteriów podzbioru
+    :return: (Tuple[int, ...]) : indeksy top-k elementów od najlepszego
+    """
+    metric = _worker['metric']
+    sums = np.maximum(sums, 0.0)  # składniki są nieujemne, odejmowanie może dać -0.0000001
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if _worker['method'] == "TOPSIS":
+            d_star, d_minus = (np.sqrt(sums) if metric == "Default" else sums)
+            key = d_minus / (d_minus + d_star)  # współczynnik topsis, wyższy lepszy
+        else:
+            passed, d = sums[0] > 0.5, sums[1:]
+            if metric == "Default":
+                d = np.sqrt(d)
+            d = d / d[:, passed].max(axis=1, initial=0.0)[:, None]  # normalizacja po elementach niezdominowanych
+            key = np.where(passed, np.minimum(d[1], d[2]) - d[0], -np.inf)  # minus współczynnik rsm, wyższy lepszy
+    key = np.nan_to_num(key, nan=-np.inf)
+    k = min(_worker['top_k'], len(key))
+    if k < len(key):
+        idx = np.argpartition(-key, k - 1)[:k]
+    else:
+        idx = np.arange(len(key))
+    return tuple(int(i) for i in idx[np.lexsort((idx, -key[idx]))])
+
+
+class _Found:
+    """
+    Wyniki fragmentu podzbiorów w stałej pamięci: liczniki i ograniczony kopiec podzbiorów najbliższych pełnemu
+    zestawowi kryteriów, dla których zmienia się czołówka
+    """
+
+    def __init__(self):
+        self.evaluated = 0
+        self.changed = 0
+        self.winners = {}
+        self.closest = []  # kopiec (liczba kryteriów, podzbiór, czołówka), na wierzchu najmniejszy podzbiór
+
+    def add(self, subset: Tuple[int, ...], top: Tuple[int, ...]) -> None:
+        full = _worker['full']
+        self.evaluated += 1
+        if top == full:
+            return
+        self.changed += 1
+        if top[0] != full[0]:
+            self.winners[top[0]] = self.winners.get(top[0], 0) + 1
+        entry = (len(subset), subset, top)
+        if len(self.closest) < _worker['limit']:
+            heapq.heappush(self.closest, entry)
+        elif _worker['limit'] > 0 and entry > self.closest[0]:
+            heapq.heapreplace(self.closest, entry)
+
+    def merge(self, other: '_Found') -> None:
+        self.evaluated += other.evaluated
+        self.changed += other.changed
+        for i, count in other.winners.items():
+            self.winners[i] = self.winners.get(i, 0) + count
+        self.closest = heapq.nlargest(_worker['limit'], self.closest + other.closest)
+        heapq.heapify(self.closest)
+
+
+def _walk(bounds: Tuple[int, int]) -> _Found:
+    """
+    Przejście fragmentu kodu Graya: kolejne podzbiory różnią się jednym kryterium, więc sumy składników
+    aktualizuje się dodaniem lub odjęciem jednego wiersza
+    :param bounds: (Tuple[int, int]) : zakres kroków kodu Graya [początek, koniec)
+    :return: (_Found) : wyniki podzbiorów fragmentu
+    """
+    terms = _worker['terms']
+    start, end = bounds
+    gray = start ^ (start >> 1)
+    members = [j for j in range(len(terms)) if gray >> j & 1]
+    # pierwszy podzbiór fragmentu liczony w całości
+    sums = terms[members].sum(axis=0) if members else np.zeros(terms.shape[1:])
+    found = _Found()
+    for step in range(start, end):
+        if step > start:
+            j = (step & -step).bit_length() - 1  # kryterium zmienione w tym kroku
+            gray ^= 1 << j
+            if gray >> j & 1:
+                sums += terms[j]
+            else:
+                sums -= terms[j]
+        if gray:
+            found.add(tuple(j for j in range(len(terms)) if gray >> j & 1), _top(sums))
+    return found
+
+
+def _unrank(n: int, size: int, index: int) -> List[int]:
+    """
+    Podzbiór o zadanym numerze w porządku leksykograficznym podzbiorów danej wielkości
+    :param n: (int) : liczba kryteriów
+    :param size: (int) : wielkość podzbioru
+    :param index: (int) : numer podzbioru (od 0)
+    :return: (List[int]) : rosnące indeksy kryteriów
+    """
+    subset = []
+    j = 0
+    for position in range(size):
+        while True:
+            count = comb(n - j - 1, size - position - 1)  # podzbiory zaczynające się od kryterium j
+            if index < count:
+                break
+            index -= count
+            j += 1
+        subset.append(j)
+        j += 1
+    return subset
+
+
+def _walk_size(task: Tuple[int, int, int]) -> _Found:
+    """
+    Przejście fragmentu podzbiorów jednej wielkości w porządku leksykograficznym: kolejne podzbiory różnią się
+    zwykle ostatnim kryterium, więc sumy składników aktualizuje się wymianą zmienionych wierszy
+    :param task: (Tuple[int, int, int]) : wielkość podzbioru, zakres numerów podzbiorów [początek, koniec)
+    :return: (_Found) : wyniki podzbiorów fragmentu
+    """
+    terms = _worker['terms']
+    n = len(terms)
+    size, start, end = task
+    subset = _unrank(n, size, start)
+    sums = terms[subset].sum(axis=0)
+    found = _Found()
+    for _ in range(start, end):
+        found.add(tuple(subset), _top(sums))
+        i = size - 1
+        while i >= 0 and subset[i] == n - size + i:
+            i -= 1
+        if i < 0:
+            break
+        old = subset[i:]
+        subset[i:] = range(subset[i] + 1, subset[i] + 1 + size - i)
+        for j in set(old) - set(subset[i:]):
+            sums -= terms[j]
+        for j in set(subset[i:]) - set(old):
+            sums += terms[j]
+    return found
+
+
+def explore_subsets(D: List[List[Number]], W_max: List[bool], metric: str, method: str = "TOPSIS",
+                    W: Optional[List[Number]] = None, max_size: Optional[int] = None, top_k: int = 3,
+                    workers: Optional[int] = None, limit: int = LIMIT) -> SubsetResult:
+    """
+    Ranking dla każdego niepustego podzbioru kryteriów (lub podzbiorów do zadanej wielkości). Wszystkie podzbiory
+    są przeglądane w kolejności kodu Graya, a podzbiory do zadanej wielkości osobno dla każdej wielkości, we
+    fragmentach liczonych równolegle. Procesy zwracają tylko liczniki i ograniczoną liczbę podzbiorów
+    :param D: (List[List[Number]]) : macierz decyzyjna D[n x m]
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów
+    :param metric: (str) : nazwa metryki (Default lub City Block)
+    :param method: (str) : nazwa metody (TOPSIS, RSM)
+    :param W: (List[Number]) : wektor wag (tylko TOPSIS)
+    :param max_size: (int) : największa liczba kryteriów w podzbiorze (domyślnie wszystkie)
+    :param top_k: (int) : liczba porównywanych najlepszych elementów
+    :param workers: (int) : liczba procesów (domyślnie liczba rdzeni)
+    :param limit: (int) : liczba zapamiętanych podzbiorów ze zmienioną czołówką
+    :return: (SubsetResult) : wyniki przeglądu
+    """
+    if metric not in ADDITIVE_METRICS:
+        raise ValueError("Przegląd podzbiorów działa tylko dla metryk: {}".format(", ".join(ADDITIVE_METRICS)))
+    if method not in ("TOPSIS", "RSM"):
+        raise ValueError("Nieznana metoda: {}".format(method))
+    D = np.asarray(D, dtype=np.float64)
+    n = D.shape[0]
+    if method == "TOPSIS":
+        terms = _topsis_terms(D, W_max, metric, W if W is not None else [1.0 for _ in range(n)])
+    else:
+        terms = _rsm_terms(D, W_max, metric)
+    max_size = n if max_size is None else min(max_size, n)
+
+    _init_worker(terms, method, metric, max_size, top_k)
+    full = _top(terms.sum(axis=0))
+    _init_worker(terms, method, metric, max_size, top_k, full, limit)
+
+    found = _Found()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                             initargs=(terms, method, metric, max_size, top_k, full, limit)) as executor:
+        if max_size >= n:
+            total = 1 << n
+            parts = executor.map(_walk, [(start, min(start + CHUNK, total)) for start in range(0, total, CHUNK)])
+        else:  # tylko podzbiory do zadanej wielkości, bez przechodzenia wszystkich 2^n kroków
+            parts = executor.map(_walk_size, [(size, start, min(start + CHUNK, comb(n, size)))
+                                              for size in range(1, max_size + 1)
+                                              for start in range(0, comb(n, size), CHUNK)])
+        for part in parts:
+            found.merge(part)
+    changed = [(subset, top) for _, subset, top in sorted(found.closest, reverse=True)]
+    return SubsetResult(full, changed, found.changed, found.evaluated, found.winners)
+
+
+def subset_report(result: SubsetResult, c_names: List[str], items_names: List[str], limit: int = LIMIT) -> str:
+    """
+    Opis wyników przeglądu podzbiorów: podzbiory najbliższe pełnemu zestawowi kryteriów, dla których zmienia się
+    czołówka rankingu, oraz jak często wygrywają poszczególne elementy
+    :param result: (SubsetResult) : wyniki explore_subsets
+    :param c_names: (List[str]) : lista nazw kryteriów
+    :param items_names: (List[str]) : lista nazw elementów
+    :param limit: (int) : liczba opisanych podzbiorów
+    :return: (str) : raport tekstowy
+    """
+    report = 'Czołówka dla wszystkich kryteriów: {}\n'.format(', '.join(items_names[i] for i in result.full))
+    report += 'Czołówka zmienia się w {} z {} podzbiorów\n'.format(result.changed_count, result.evaluated)
+    for i, count in sorted(result.winners.items(), key=lambda tup: -tup[1])[:limit]:
+        report += 'Inny zwycięzca: {} ({} podzbiorów)\n'.format(items_names[i], count)
+    for subset, top in result.changed[:limit]:  # najmniejsze zmiany zestawu kryteriów
+        report += '{} : {}\n'.format(' + '.join(c_names[j] for j in subset), ', '.join(items_names[i] for i in top))
+    return report
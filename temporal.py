@@ -0,0 +1,97 @@
+from typing import List, Tuple, Optional, Union
+import numpy as np
+import pandas as pd
+from topsis import topsis_cache, topsis_scores
+from data_source import ExcelSource
+
+Number = Union[float, int]
+
+NORMALIZATIONS = ("period", "global")  # normalizacja osobno w każdym okresie albo wspólna dla wszystkich okresów
+
+
+def load_periods(file_name: str, criteria: List[int]) \
+        -> Tuple[np.ndarray, List[str], List[str], List[str], List[float], List[bool]]:
+    """
+    Wczytanie danych z wielu okresów: każdy arkusz pliku .xlsx to jeden okres w układzie Lp., Nazwa, kryteria...,
+    Wagi, Maksymalizacja. Elementy są dopasowywane po nazwie, brakujące wartości to NaN
+    :param file_name: (str) : nazwa pliku .xlsx
+    :param criteria: (List[int]) : lista wybranych kryteriów (numeracja od 1)
+    :return: (Tuple[np.ndarray, List[str], List[str], List[str], List[float], List[bool]]) : tensor danych
+    [okresy x n x m], nazwy okresów, lista nazw kryteriów, lista nazw elementów, wektor wag i wektor maksymalizacji
+    wybranych kryteriów (z pierwszego arkusza)
+    """
+    source = ExcelSource(file_name)
+    all_names = source.criteria_names()
+    criteria = sorted(criteria)
+    c_names = [all_names[k - 1] for k in criteria]
+    W_all, W_max_all = source.criteria_meta()
+    W = [W_all[k - 1] for k in criteria if k - 1 < len(W_all)]
+    W_max = [W_max_all[k - 1] for k in criteria if k - 1 < len(W_max_all)]
+
+    sheets = pd.read_excel(file_name, sheet_name=None)  # wszystkie arkusze naraz
+    frames = []
+    for period, df in sheets.items():
+        missing = [c for c in ['Nazwa'] + c_names if c not in df.columns]
+        if missing:
+            raise ValueError("Arkusz {} nie zawiera kolumn: {}".format(period, ', '.join(missing)))
+        df = df[df['Nazwa'].notna()]
+        frames.append(df.assign(Nazwa=df['Nazwa'].astype(str)).drop_duplicates('Nazwa').set_index('Nazwa')[c_names])
+    items_names = list(dict.fromkeys(name for df in frames for name in df.index))  # kolejność pierwszego wystąpienia
+    T = np.stack([df.reindex(items_names).to_numpy(dtype=float).T for df in frames])
+    return T, list(sheets), c_names, items_names, W, W_max
+
+
+def temporal_topsis(T: np.ndarray, W: List[Number], W_max: List[bool], metric: str,
+                    normalization: str = "period") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Metoda topsis dla wszystkich okresów naraz: normalizacja, punkty idealne i współczynniki są liczone jednym
+    przebiegiem na tensorze danych
+    :param T: (np.ndarray) : tensor danych [okresy x n x m] (NaN - brak elementu w okresie)
+    :param W: (List[Number]) : wektor wag
+    :param W_max: (List[bool]) : wektor maksymalizacji kryteriów
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param normalization: (str) : "period" - normy i punkty idealne każdego okresu osobno, "global" - wspólne dla
+    wszystkich okresów, dzięki czemu współczynniki z różnych okresów są porównywalne
+    :return: (Tuple[np.ndarray, np.ndarray]) : współczynniki [okresy x m] i pozycje w rankingu okresu [okresy x m]
+    (NaN dla elementów nieobecnych w okresie)
+    """
+    if normalization not in NORMALIZATIONS:
+        raise ValueError("Nieznana normalizacja: {}".format(normalization))
+    T = np.asarray(T, dtype=float)
+    present = ~np.isnan(T).any(axis=1)  # elementy z kompletem wartości w okresie [okresy x m]
+    T = np.where(present[:, None, :], T, np.nan)  # niepełne elementy nie wpływają na normy ani skrajne wartości
+    axes = -1 if normalization == "period" else (0, -1)
+    with np.errstate(invalid='ignore'):
+        norms = np.sqrt(np.nansum(np.square(T), axis=axes, keepdims=True))[..., 0]
+        col_max = np.nanmax(T, axis=axes, keepdims=True)[..., 0]
+        col_min = np.nanmin(T, axis=axes, keepdims=True)[..., 0]
+    shape = T.shape[:2]
+    cache = topsis_cache(T, W_max, metric, norms=np.broadcast_to(norms, shape),
+                         extremes=(np.broadcast_to(col_max, shape), np.broadcast_to(col_min, shape)))
+    C = np.where(present, topsis_scores(cache, W)[0], np.nan)
+
+    key = np.where(present, np.nan_to_num(C, nan=-np.inf), -np.inf)
+    order = np.argsort(-key, axis=1, kind='stable')
+    R = np.empty(C.shape)
+    np.put_along_axis(R, order, np.arange(1, C.shape[1] + 1, dtype=float)[None, :], axis=1)
+    R[~present] = np.nan
+    return C, R
+
+
+def compute_temporal(file_name: str, criteria: List[int], metric: str, weights: Optional[List[float]] = None,
+                     normalization: str = "period") -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Szeregi czasowe współczynników i pozycji w rankingu z pliku z arkuszem dla każdego okresu
+    :param file_name: (str) : nazwa pliku .xlsx
+    :param criteria: (List[int]) : lista wybranych kryteriów
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param weights: (List[float]) : lista wag (domyślnie z pliku)
+    :param normalization: (str) : "period" albo "global"
+    :return: (Tuple[pd.DataFrame, pd.DataFrame]) : współczynniki i pozycje (wiersze - elementy, kolumny - okresy)
+    """
+    T, periods, c_names, items_names, W_file, W_max = load_periods(file_name, criteria)
+    W = weights if weights else W_file
+    C, R = temporal_topsis(T, W, W_max, metric, normalization)
+    scores = pd.DataFrame(C.T, index=pd.Index(items_names, name='Nazwa'), columns=periods)
+    ranks = pd.DataFrame(R.T, index=pd.Index(items_names, name='Nazwa'), columns=periods).astype('Int64')
+    return scores, ranks
@@ -1,23 +1,155 @@
-from typing import List, Union, Optional, Tuple
-from math import sqrt
-import pandas as pd
+from typing import List, Union, Optional, Tuple, NamedTuple
 import numpy as np
-from scipy.spatial.distance import braycurtis, chebyshev, canberra, cityblock
+from data_source import DataSource, Filter, open_source
+from constraints import Constraints, load_screened
 
 Number = Union[float, int]
 
+METRICS = ("Default", "Bray-Curtis", "Canberra", "Chebyshev", "City Block")
 
-def euclid_norm(D: List[List], j: int) -> float:
+
+class TopsisCache(NamedTuple):
+    """
+    Dane metody topsis niezależne od wag. Przy zmianie wag wystarczy przeskalować składniki odległości
+    """
+    U: np.ndarray  # macierz znormalizowana bez wag [n x m]
+    W_max: np.ndarray  # wektor maksymalizacji kryteriów
+    u_ideal: np.ndarray  # punkt idealny macierzy bez wag
+    u_anti_ideal: np.ndarray  # punkt antyidealny macierzy bez wag
+    metric: str  # nazwa metryki
+    parts_star: Tuple[np.ndarray, ...]  # składniki odległości od punktu idealnego [n x m]
+    parts_minus: Tuple[np.ndarray, ...]  # składniki odległości od punktu antyidealnego [n x m]
+
+
+def _distance_parts(U: np.ndarray, p: np.ndarray, metric: str) -> Tuple[np.ndarray, ...]:
+    """
+    Składniki odległości elementów od punktu, z których odległość dla dowolnych nieujemnych wag liczy się
+    jednym mnożeniem macierzy
+    :param U: (np.ndarray) : macierz znormalizowana bez wag [n x m]
+    :param p: (np.ndarray) : punkt odniesienia bez wag (albo osobny punkt każdego elementu [n x m])
+    :param metric: (str) : nazwa metryki
+    :return: (Tuple[np.ndarray, ...]) : składniki odległości
+    """
+    p = p if p.shape == U.shape else p[..., None]
+    diff = np.abs(U - p)
+    if metric == "Default":
+        return np.square(diff),
+    if metric in ("City Block", "Chebyshev"):
+        return diff,
+    if metric == "Bray-Curtis":
+        return diff, np.abs(U + p)
+    if metric == "Canberra":  # waga skraca się w każdym składniku |u - v| / (|u| + |v|)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = diff / (np.abs(U) + np.abs(p))
+        return np.nan_to_num(ratio, nan=0.0, posinf=0.0),
+    raise ValueError("Nieznana metryka: {}".format(metric))
+
+
+def point_distances(X: np.ndarray, p: np.ndarray, metric: str) -> np.ndarray:
+    """
+    Odległości wszystkich elementów od punktu, liczone jak w scipy.spatial.distance
+    :param X: (np.ndarray) : współrzędne elementów [n x m]
+    :param p: (np.ndarray) : punkt odniesienia (albo osobny punkt każdego elementu [n x m])
+    :param metric: (str) : nazwa metryki
+    :return: (np.ndarray) : wektor odległości
+    """
+    p = p if p.shape == X.shape else p[:, None]
+    diff = np.abs(X - p)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if metric == "Default":
+            return np.sqrt(np.einsum('ij,ij->j', diff, diff))
+        if metric == "City Block":
+            return diff.sum(axis=0)
+        if metric == "Chebyshev":
+            return diff.max(axis=0, initial=0.0)
+        if metric == "Bray-Curtis":
+            return diff.sum(axis=0) / np.abs(X + p).sum(axis=0)
+        if metric == "Canberra":
+            ratio = diff / (np.abs(X) + np.abs(p))
+            return np.nan_to_num(ratio, nan=0.0).sum(axis=0)
+    raise ValueError("Nieznana metryka: {}".format(metric))
+
+
+def weighted_norms(D: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Normy euklidesowe kolumn kryteriów, w których element scalony z kilku elementów liczy się tyle razy, ile
+    elementów reprezentuje (DataSource.multiplicity), więc normy są takie jak bez scalania
+    :param D: (np.ndarray) : macierz decyzyjna D[n x m]
+    :param counts: (np.ndarray) : liczebności elementów
+    :return: (np.ndarray) : wektor norm
+    """
+    return np.sqrt(np.einsum('j,ij,ij->i', counts, D, D))
+
+
+def topsis_cache(D: List[List[Number]], W_max: Optional[List[bool]], metric: str,
+                 norms: Optional[np.ndarray] = None,
+                 extremes: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> TopsisCache:
+    """
+    Przygotowanie danych metody topsis niezależnych od wag
+    :param D: (List[List[Number]]) : macierz decyzjna D[m x N] (albo stos macierzy [... x m x N] liczonych naraz)
+    :param W_max: (List[bool]) : wektor logiczny określający, które maksymalizujemy kryterium (domyślnie każde)
+    :param metric: str : nazwa wykorzystywanej metryki
+    :param norms: (np.ndarray) : gotowe normy kolumn kryteriów (domyślnie liczone z D)
+    :param extremes: (Tuple[np.ndarray, np.ndarray]) : gotowe maksima i minima kryteriów przed normalizacją
+    (domyślnie liczone z D)
+    :return: (TopsisCache) : macierz znormalizowana, punkty odniesienia i składniki odległości
+    """
+    D = np.asarray(D, dtype=float)
+    if norms is None:
+        norms = np.sqrt(np.einsum('...ij,...ij->...i', D, D))  # normy euklidesowe kolumn kryteriów
+    with np.errstate(divide='ignore', invalid='ignore'):
+        U = D / norms[..., None]
+    n = U.shape[-2]
+    if W_max is None:
+        W_max = [True for _ in range(n)]  # uzupełnienie parametru domyślnego
+    W_max = np.asarray([bool(W_max[j]) if j < len(W_max) else True for j in range(n)])
+    if extremes is None:
+        col_max = U.max(axis=-1)
+        col_min = U.min(axis=-1)
+    else:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            col_max = extremes[0] / norms
+            col_min = extremes[1] / norms
+    u_ideal = np.where(W_max, col_max, col_min)  # punkty idealne
+    u_anti_ideal = np.where(W_max, col_min, col_max)  # punkty antyidealne
+    return TopsisCache(U, W_max, u_ideal, u_anti_ideal, metric,
+                       _distance_parts(U, u_ideal, metric), _distance_parts(U, u_anti_ideal, metric))
+
+
+def _distance(parts: Tuple[np.ndarray, ...], W: np.ndarray, metric: str) -> np.ndarray:
+    """
+    Odległości wszystkich elementów od punktu dla wektora wag
+    :param parts: (Tuple[np.ndarray, ...]) : składniki odległości
+    :param W: (np.ndarray) : nieujemny wektor wag
+    :param metric: (str) : nazwa metryki
+    :return: (np.ndarray) : wektor odległości
+    """
+    if metric == "Default":
+        return np.sqrt(np.square(W) @ parts[0])
+    if metric == "City Block":
+        return W @ parts[0]
+    if metric == "Chebyshev":
+        return np.max(W[:, None] * parts[0], axis=-2)
+    if metric == "Bray-Curtis":
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (W @ parts[0]) / (W @ parts[1])
+    return (W > 0).astype(float) @ parts[0]  # Canberra
+
+
+def topsis_scores(cache: TopsisCache, W: List[Number]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    Norma euklidesowa kolumny j z macierzy D
-    :param D: (List[List[Number]]) : macierz decyzyjna
-    :param j: (int) : indeks kolumny kryterium
-    :return: pierwiastek sumy kwadratów
+    Współczynniki skoringowe dla wektora wag na podstawie danych niezależnych od wag
+    :param cache: (TopsisCache) : dane z topsis_cache
+    :param W: (List[Number]) : wektor wag
+    :return: (Tuple[np.ndarray, np.ndarray, np.ndarray]) : wektor współczynników skoringowych, punkty idealne,
+    punkty antyidealne
     """
-    s = 0.0  # suma kwadratów elementów z kolumny
-    for i in range(len(D)):
-        s += D[j][i] ** 2
-    return sqrt(s)
+    W = np.asarray(W, dtype=float)[:cache.U.shape[-2]]
+    d_star = _distance(cache.parts_star, W, cache.metric)  # odległości od punktu idealnego
+    d_minus = _distance(cache.parts_minus, W, cache.metric)  # odległości od punktu antyidealnego
+    with np.errstate(divide='ignore', invalid='ignore'):
+        c = d_minus / (d_minus + d_star)
+    return c, W * cache.u_ideal, W * cache.u_anti_ideal
 
 
 def topsis(D: List[List[Number]], W: List[Number], metric: str, W_max: Optional[List[bool]] = None) \
@@ -31,131 +163,61 @@ def topsis(D: List[List[Number]], W: List[Number], metric: str, W_max: Optional[
     :return: (Tuple[List[float], int, List[List[float]], List[float], List[float]]) : wektor współczynników skoringowych
     liczba kryetriów, macierz znormalizowana, punkty idealne, punkty antyidealne
     """
-    print(D)
-    m = len(D[0])  # liczba elementów
-    n = len(D)  # liczba kryteriow
-    N = [[0.0 for _ in range(m)] for _ in range(n)]  # macierz znormalizowana
-    p_ideal = [0.0 for _ in range(n)]  # tablica punktów idealnych
-    p_anti_ideal = [float('inf') for _ in range(n)]  # tablica punktów antyidealnych
-    d_star = [0.0 for __ in range(m)]  # tablica odległości od punktu idealnego
-    d_minus = [0.0 for __ in range(m)]  # tablica odległości od punktu nieidealnego
-    c = [0.0 for __ in range(m)]  # współczynnik skoringowy
-
-    if W_max is not None:  # minimalizacja czy maksymalizacja kryterium
-        for i in range(len(W_max)):
-            if not W_max[i] and i < n:
-                p_ideal[i] = float('inf')
-                p_anti_ideal[i] = 0
-    else:
-        W_max = [True for _ in range(n)]  # uzupełnienie parametru domyślnego
+    cache = topsis_cache(D, W_max, metric)
+    c, p_ideal, p_anti_ideal = topsis_scores(cache, W)
+    N = np.asarray(W, dtype=float)[:cache.U.shape[0], None] * cache.U  # macierz znormalizowana z wagami
+    return c.tolist(), cache.U.shape[0], N, p_ideal.tolist(), p_anti_ideal.tolist()
 
 
-    for j in range(n):
-        en = euclid_norm(D, j)
-        for i in range(m):
-            N[j][i] = W[j] * D[j][i] / en  # normalizacja macierzy
-            if W_max[j] and p_ideal[j] < N[j][i]:  # znalezienie punktów idealnych
-                p_ideal[j] = N[j][i]
-            if not W_max[j] and p_ideal[j] > N[j][i]:
-                p_ideal[j] = N[j][i]
-            if W_max[j] and p_anti_ideal[j] > N[j][i]:
-                p_anti_ideal[j] = N[j][i]
-            if not W_max[j] and p_anti_ideal[j] < N[j][i]:
-                p_anti_ideal[j] = N[j][i]
+def load_topsis_cache(file_name: Union[str, DataSource], criteria: List[int], metric: str,
+                      filters: Optional[List[Filter]] = None, constraints: Optional[Constraints] = None) \
+        -> Tuple[TopsisCache, np.ndarray, List[str], List[str], List[float]]:
+    """
+    Wczytanie danych z pliku i przygotowanie danych metody topsis niezależnych od wag
+    :param file_name: (Union[str, DataSource]) : nazwa pliku (.xlsx lub baza SQLite) albo źródło danych
+    :param criteria: (List[int]) : lista wybranych kryteriów
+    :param metric: str : metryki
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia odrzucające elementy przed wyliczeniem rankingu
+    :return: (Tuple[TopsisCache, np.ndarray, List[str], List[str], List[float]]) : dane metody topsis, macierz
+    decyzyjna, lista nazw kryteriów, lista nazw sprzętów, wektor wag z pliku
+    """
+    # wczytanie tylko wybranych kryteriów i nazw, bez elementów odrzuconych przez ograniczenia
+    source = open_source(file_name)
+    D, c_names, items_names, W_file, W_max = load_screened(source, criteria, filters, constraints)
+    norms = weighted_norms(D, source.multiplicity(items_names))  # ranking po scaleniu duplikatów jak bez scalania
+    return topsis_cache(D, W_max, metric, norms=norms), D, c_names, items_names, W_file
 
-    if metric == "Default":
-        for i in range(m):  # obliczenie odległości
-            s_star = 0.0  # suma kwadratów róznicy punktu od punktu idealnego
-            s_minus = 0.0  # suma kwadratów róznicy punktu od punktu antyidealnego
-            for j in range(n):
-                s_star += (N[j][i] - p_ideal[j]) ** 2
-                s_minus += (N[j][i] - p_anti_ideal[j]) ** 2
-            d_star[i] = sqrt(s_star)
-            d_minus[i] = sqrt(s_minus)
-            c[i] = d_minus[i] / (d_minus[i] + d_star[i])
-
-    elif metric == "Bray-Curtis":
-        N_as_array = np.asarray(N)
-        p_ideal_as_vector = np.asarray(p_ideal)
-        p_anti_ideal_as_vector = np.asarray(p_anti_ideal)
-        for i in range(m):
-            d_star[i] = braycurtis(N_as_array[:, i], p_ideal_as_vector)
-            d_minus[i] = braycurtis(N_as_array[:, i], p_anti_ideal_as_vector)
-            c[i] = d_minus[i] / (d_minus[i] + d_star[i])
-
-    elif metric == "Canberra":
-        N_as_array = np.asarray(N)
-        p_ideal_as_vector = np.asarray(p_ideal)
-        p_anti_ideal_as_vector = np.asarray(p_anti_ideal)
-        for i in range(m):
-            d_star[i] = canberra(N_as_array[:, i], p_ideal_as_vector)
-            d_minus[i] = canberra(N_as_array[:, i], p_anti_ideal_as_vector)
-            c[i] = d_minus[i] / (d_minus[i] + d_star[i])
-
-    elif metric == "Chebyshev":
-        N_as_array = np.asarray(N)
-        p_ideal_as_vector = np.asarray(p_ideal)
-        p_anti_ideal_as_vector = np.asarray(p_anti_ideal)
-        for i in range(m):
-            d_star[i] = chebyshev(N_as_array[:, i], p_ideal_as_vector)
-            d_minus[i] = chebyshev(N_as_array[:, i], p_anti_ideal_as_vector)
-            c[i] = d_minus[i] / (d_minus[i] + d_star[i])
-
-    elif metric == "City Block":
-        N_as_array = np.asarray(N)
-        p_ideal_as_vector = np.asarray(p_ideal)
-        p_anti_ideal_as_vector = np.asarray(p_anti_ideal)
-        for i in range(m):
-            d_star[i] = cityblock(N_as_array[:, i], p_ideal_as_vector)
-            d_minus[i] = cityblock(N_as_array[:, i], p_anti_ideal_as_vector)
-            c[i] = d_minus[i] / (d_minus[i] + d_star[i])
-
-    return c, n, N, p_ideal, p_anti_ideal
-
-
-def compute_topsis(file_name: str, criteria: List[int], metric: str, weights: List[float]) -> Tuple[str, int, List[List[float]], List[float], List[float], List[str], List[str]]:
+
+def compute_topsis(file_name: Union[str, DataSource], criteria: List[int], metric: str, weights: List[float],
+                   filters: Optional[List[Filter]] = None, constraints: Optional[Constraints] = None) \
+        -> Tuple[str, int, List[List[float]], List[float], List[float], List[str], List[str], np.ndarray,
+                 List[float]]:
     """
     Funkcja wyliczająca z pliku ranking metodą topsis
-    :param file_name: (str) : nazwa pliku
+    :param file_name: (Union[str, DataSource]) : nazwa pliku (.xlsx lub baza SQLite) albo źródło danych
     :param criteria: (List[int]) : lista wybranych kryteriów
     :param metric: str : metryki
     :param weights: List[float] : lista wag podana przez użytkownika
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia odrzucające elementy przed wyliczeniem rankingu
     :return: (Tuple[str, int, List[List[float]], List[float], List[float]], str, str, List[str]) : wektor współczynników
     skoringowych jako str, liczba kryetriów, macierz znormalizowana, punkty idealne, punkty antyidealne,
-    lista nazw kryetriów, lista nazw sprzętów
+    lista nazw kryetriów, lista nazw sprzętów, macierz decyzyjna, wektor współczynników skoringowych
     """
-    df = pd.read_excel(file_name)  # wczytanie excel z bazą słuchawek
+    cache, D, c_names, items_names, W_file = load_topsis_cache(file_name, criteria, metric, filters, constraints)
 
     if not weights or weights is None:  # jeśli użytkownik nie podał wag (na razie się tak nie da) to wybierz je z pliku
-        W = df['Wagi'].dropna().tolist()  # wektor wag
+        W = W_file  # wektor wag
     else:
         W = weights
 
-    W_max = df['Maksymalizacja'].dropna().tolist()  # wektor logiczny określający, które maksymalizujemy kryterium
-    D = []  # macierz decyzyjna
-    c_names = []  # wektor nazw kryteriów
-    criteria = sorted(criteria)
-    for j in df.columns:
-
-        if j == 'Lp.' or j == 'Nazwa' or df.columns.get_loc(j) - 1 not in criteria:
-            continue
-        if j == 'Wagi':
-            break
-        D.append(df[j].tolist())
-        c_names.append(j)
-
-    c, n, N, p_ideal, p_anti_ideal = topsis(D, W, metric, W_max)  # tworzenie rankingu
-
-    rank = []
-    items_names = []
-    for i in range(len(D[0])):
-        rank.append((df['Nazwa'][i], c[i]))
-        items_names.append(df['Nazwa'][i])
-
-    rank.sort(key=lambda tup: tup[1], reverse=True)  # posortowanie rankingu
+    c, p_ideal, p_anti_ideal = topsis_scores(cache, W)  # tworzenie rankingu
+    n = cache.U.shape[0]
+    N = np.asarray(W, dtype=float)[:n, None] * cache.U  # macierz znormalizowana z wagami
 
     rank_str = ''
-    for name, score in rank:
-        rank_str += name + ' : ' + '{0:1.3f}'.format(score) + '\n'  # zapis rankingu jako str
+    for i in np.argsort(-c, kind='stable'):  # posortowanie rankingu
+        rank_str += items_names[i] + ' : ' + '{0:1.3f}'.format(c[i]) + '\n'  # zapis rankingu jako str
 
-    return rank_str, n, N, p_ideal, p_anti_ideal, c_names, items_names
+    return rank_str, n, N, p_ideal.tolist(), p_anti_ideal.tolist(), c_names, items_names, D, c.tolist()
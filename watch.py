@@ -0,0 +1,238 @@
+from typing import List, Tuple, Optional, Union
+import os
+import random
+import numpy as np
+import pandas as pd
+from topsis import TopsisCache, topsis_cache, topsis_scores
+from rsm import rsm
+from sp_cs import sp_cs
+from promethee import promethee
+from constraints import Constraints, load_screened
+from export import HIGHER_IS_BETTER, rank_order
+
+Number = Union[float, int]
+RankChange = Tuple[str, Optional[int], Optional[int]]  # (nazwa, poprzednia pozycja, nowa pozycja), None - brak
+
+NORM_TOLERANCE = 1e-6  # względna zmiana normy kolumny, poniżej której normy nie są przeliczane od nowa
+
+
+def row_hashes(D: np.ndarray) -> np.ndarray:
+    """
+    Skróty wartości kryteriów każdego elementu
+    :param D: (np.ndarray) : macierz decyzyjna D[n x m]
+    :return: (np.ndarray) : wektor skrótów długości m
+    """
+    return pd.util.hash_pandas_object(pd.DataFrame(D.T), index=False).to_numpy()
+
+
+def rank_diff(old_names: List[str], old_score: np.ndarray, new_names: List[str], new_score: np.ndarray,
+              method: str) -> List[RankChange]:
+    """
+    Elementy, których pozycja w rankingu się zmieniła, oraz elementy dodane i usunięte
+    :param old_names: (List[str]) : nazwy elementów poprzedniego rankingu
+    :param old_score: (np.ndarray) : poprzednie współczynniki skoringowe
+    :param new_names: (List[str]) : nazwy elementów nowego rankingu
+    :param new_score: (np.ndarray) : nowe współczynniki skoringowe
+    :param method: (str) : nazwa metody (wyznacza kierunek rankingu)
+    :return: (List[RankChange]) : zmiany posortowane według nowej pozycji
+    """
+    _, old_rank = rank_order(old_score, HIGHER_IS_BETTER[method])
+    _, new_rank = rank_order(new_score, HIGHER_IS_BETTER[method])
+    old_positions = dict(zip(old_names, old_rank.tolist()))
+    changes = []
+    for name, position in zip(new_names, new_rank.tolist()):
+        before = old_positions.pop(name, None)
+        if before != position:
+            changes.append((name, before, position))
+    changes.sort(key=lambda tup: tup[2])
+    changes += [(name, position, None) for name, position in old_positions.items()]  # usunięte elementy
+    return changes
+
+
+def rank_diff_report(changes: List[RankChange], limit: int = 20) -> str:
+    """
+    Zwięzły opis zmian rankingu
+    :param changes: (List[RankChange]) : wynik funkcji rank_diff
+    :param limit: (int) : liczba opisanych zmian
+    :return: (str) : raport tekstowy
+    """
+    if not changes:
+        return 'Ranking bez zmian\n'
+    report = ''
+    for name, before, after in changes[:limit]:
+        if before is None:
+            report += '+ {} (nowy, pozycja {})\n'.format(name, after)
+        elif after is None:
+            report += '- {} (usunięty, była pozycja {})\n'.format(name, before)
+        else:
+            report += '{} : {} -> {}\n'.format(name, before, after)
+    if len(changes) > limit:
+        report += '... ({} pozostałych zmian)\n'.format(len(changes) - limit)
+    return report
+
+
+class RankingWatcher:
+    """
+    Obserwacja pliku z danymi. Po zmianie pliku wiersze są porównywane po skrótach z poprzednim wczytaniem,
+    a metoda topsis przelicza tylko zmienione i nowe elementy, dopóki normy i skrajne wartości kolumn się
+    nie zmienią. Sumy kwadratów kolumn są aktualizowane o usunięte, zmienione i nowe wiersze, więc zmiana norm
+    jest porównywana z normami użytymi w cache, a nie z normami poprzedniego wczytania
+    """
+
+    def __init__(self, file_name: str, criteria: List[int], metric: str, method: str = "TOPSIS",
+                 weights: Optional[List[float]] = None, constraints: Optional[Constraints] = None,
+                 tolerance: float = NORM_TOLERANCE, preference: str = "usual", classes: str = "points"):
+        """
+        :param file_name: (str) : nazwa pliku (.xlsx lub baza SQLite)
+        :param criteria: (List[int]) : lista wybranych kryteriów
+        :param metric: (str) : nazwa wykorzystywanej metryki
+        :param method: (str) : nazwa metody (TOPSIS, RSM, SP-CS, PROMETHEE II)
+        :param weights: (List[float]) : wektor wag (domyślnie z pliku, TOPSIS i PROMETHEE II)
+        :param constraints: (Constraints) : twarde ograniczenia
+        :param tolerance: (float) : dopuszczalna względna zmiana norm kolumn bez pełnego przeliczenia
+        :param preference: (str) : funkcja preferencji metody PROMETHEE II
+        :param classes: (str) : klasy odniesienia metody RSM
+        """
+        self.file_name = file_name
+        self.criteria = list(criteria)
+        self.metric = metric
+        self.method = method
+        self.weights = weights
+        self.constraints = constraints
+        self.tolerance = tolerance
+        self.preference = preference
+        self.classes = classes
+        self.stamp = None  # czas modyfikacji i rozmiar pliku przy ostatnim wczytaniu
+        self.c_names = []
+        self.items_names = []
+        self.D = np.empty((0, 0))
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.scores = np.empty(0)
+        self.cache = None  # dane metody topsis dla wszystkich elementów
+        self.norms = None  # normy kolumn użyte w cache
+        self.squares = None  # sumy kwadratów kolumn bieżącej macierzy
+        self.extremes = None  # maksima i minima kolumn użyte w cache
+        self.points = ()  # punkty odniesienia metody RSM albo SP-CS z ostatniego przeliczenia (do wykresów)
+        self.full_recomputes = 0  # liczba pełnych przeliczeń (do diagnostyki)
+
+    def _stamp(self) -> Tuple[int, int]:
+        stat = os.stat(self.file_name)
+        return stat.st_mtime_ns, stat.st_size
+
+    def changed(self) -> bool:
+        """
+        Czy plik zmienił się od ostatniego wczytania
+        :return: (bool)
+        """
+        try:
+            return self._stamp() != self.stamp
+        except OSError:  # plik w trakcie nadpisywania
+            return False
+
+    def _load(self) -> Tuple[np.ndarray, List[str], List[str], List[float], List[bool]]:
+        stamp = self._stamp()
+        loaded = load_screened(self.file_name, self.criteria, constraints=self.constraints)
+        self.stamp = stamp  # po nieudanym wczytaniu (plik w trakcie zapisu) kolejna próba wczyta plik ponownie
+        return loaded
+
+    def _full(self, D: np.ndarray, W_max: List[bool]) -> np.ndarray:
+        """
+        Pełne przeliczenie rankingu
+        :return: (np.ndarray) : wektor współczynników skoringowych
+        """
+        self.full_recomputes += 1
+        if self.method == "TOPSIS":
+            self.squares = np.einsum('ij,ij->i', D, D)
+            self.norms = np.sqrt(self.squares)
+            self.extremes = (D.max(axis=1), D.min(axis=1))
+            self.cache = topsis_cache(D, W_max, self.metric, norms=self.norms, extremes=self.extremes)
+            return topsis_scores(self.cache, self.weights)[0]
+        if self.method == "RSM":
+            score, *points = rsm(D, W_max, self.metric, self.classes)
+            self.points = tuple(points)  # punkt aspiracji, antyidealny, quo mediana, quo średnia
+            return np.asarray(score, dtype=float)
+        if self.method == "PROMETHEE II":
+            return promethee(D, W_max, self.weights, self.preference)
+        random.seed(0)  # te same losowe punkty odniesienia przy każdym przeliczeniu
+        score, *points = sp_cs(D, W_max, self.metric)
+        self.points = tuple(points)  # punkty elementów x i y, punkty quo, punkty aspiracji
+        return np.asarray(score, dtype=float)
+
+    def load(self) -> np.ndarray:
+        """
+        Pierwsze wczytanie pliku i wyliczenie rankingu
+        :return: (np.ndarray) : wektor współczynników skoringowych
+        """
+        D, self.c_names, self.items_names, W_file, W_max = self._load()
+        if self.weights is None or len(self.weights) != len(self.c_names):
+            self.weights = W_file if len(W_file) == len(self.c_names) else [1.0] * len(self.c_names)
+        self.D, self.hashes = D, row_hashes(D)
+        self.scores = self._full(D, W_max)
+        return self.scores
+
+    def _incremental(self, D: np.ndarray, W_max: List[bool], old_idx: np.ndarray, affected: np.ndarray) \
+            -> Optional[np.ndarray]:
+        """
+        Przeliczenie metodą topsis tylko zmienionych elementów przy zachowanych normach i skrajnych wartościach
+        :param D: (np.ndarray) : nowa macierz decyzyjna
+        :param W_max: (List[bool]) : wektor maksymalizacji kryteriów
+        :param old_idx: (np.ndarray) : indeks elementu w poprzednim wczytaniu (-1 - nowy element)
+        :param affected: (np.ndarray) : maska elementów nowych lub zmienionych
+        :return: (Optional[np.ndarray]) : wektor współczynników albo None, gdy potrzebne jest pełne przeliczenie
+        """
+        if self.method != "TOPSIS" or self.cache is None:
+            return None
+        extremes = (D.max(axis=1), D.min(axis=1))
+        if not (np.array_equal(extremes[0], self.extremes[0]) and np.array_equal(extremes[1], self.extremes[1])):
+            return None  # zmiana punktu idealnego lub antyidealnego dotyczy wszystkich elementów
+        dropped = np.ones(self.D.shape[1], dtype=bool)  # usunięte i zmienione wiersze poprzedniego wczytania
+        dropped[old_idx[~affected]] = False
+        squares = self.squares - np.einsum('ij,ij->i', self.D[:, dropped], self.D[:, dropped]) + \
+            np.einsum('ij,ij->i', D[:, affected], D[:, affected])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drift = np.abs(np.sqrt(np.maximum(squares, 0.0)) - self.norms) / self.norms
+        if np.any(np.nan_to_num(drift, nan=np.inf) > self.tolerance):
+            return None
+        self.squares = squares
+
+        # tylko nowe i zmienione elementy przechodzą przez metodę, z zachowanymi normami i punktami odniesienia
+        part = topsis_cache(D[:, affected], W_max, self.metric, norms=self.norms, extremes=self.extremes)
+        kept = ~affected
+        old = self.cache
+
+        def merge(new_values: np.ndarray, old_values: np.ndarray) -> np.ndarray:
+            merged = np.empty(old_values.shape[:-1] + (len(affected),))
+            merged[..., affected] = new_values
+            merged[..., kept] = old_values[..., old_idx[kept]]
+            return merged
+
+        self.cache = TopsisCache(merge(part.U, old.U), old.W_max, old.u_ideal, old.u_anti_ideal, old.metric,
+                                 tuple(merge(a, b) for a, b in zip(part.parts_star, old.parts_star)),
+                                 tuple(merge(a, b) for a, b in zip(part.parts_minus, old.parts_minus)))
+        scores = topsis_scores(part, self.weights)[0] if affected.any() else np.empty(0)
+        return merge(scores, self.scores)
+
+    def refresh(self) -> Optional[List[RankChange]]:
+        """
+        Ponowne wczytanie zmienionego pliku i przeliczenie rankingu
+        :return: (Optional[List[RankChange]]) : zmiany rankingu albo None, gdy plik się nie zmienił
+        """
+        if not self.changed():
+            return None
+        D, c_names, items_names, _, W_max = self._load()
+        hashes = row_hashes(D)
+        positions = {name: idx for idx, name in enumerate(self.items_names)}
+        old_idx = np.asarray([positions.get(name, -1) for name in items_names], dtype=np.int64)
+        affected = old_idx < 0
+        affected[~affected] = hashes[~affected] != self.hashes[old_idx[~affected]]
+
+        scores = None
+        unique = len(positions) == len(self.items_names) and len(set(items_names)) == len(items_names)
+        if c_names == self.c_names and unique:  # porównanie po nazwach wymaga unikalnych nazw
+            scores = self._incremental(D, W_max, old_idx, affected)
+        if scores is None:
+            scores = self._full(D, W_max)
+
+        changes = rank_diff(self.items_names, self.scores, items_names, scores, self.method)
+        self.c_names, self.items_names, self.D, self.hashes, self.scores = c_names, items_names, D, hashes, scores
+        return changes
@@ -0,0 +1,145 @@
+from typing import List, Tuple, Optional, Union, NamedTuple
+import numpy as np
+from topsis import topsis_cache, topsis_scores, _distance_parts, _distance
+from data_source import DataSource, Filter
+from constraints import Constraints, load_screened
+
+Number = Union[float, int]
+
+SHIFT_TOLERANCE = 0.01  # przesunięcie punktu idealnego lub antyidealnego (ułamek rozstępu kryterium) do przeliczenia
+NORM_TOLERANCE = 0.05  # względna zmiana normy kryterium wymagająca przeliczenia
+
+
+class Placement(NamedTuple):
+    """
+    Miejsce hipotetycznego elementu w gotowym rankingu
+    """
+    score: float  # współczynnik skoringowy względem zapamiętanych norm i punktów odniesienia
+    position: int  # pozycja (od 1) po dołączeniu elementu; przy remisie element trafia za równe mu elementy
+    total: int  # liczba elementów rankingu po dołączeniu
+    above: Optional[int]  # element bezpośrednio wyżej
+    below: Optional[int]  # element bezpośrednio niżej
+    shifted: List[int]  # kryteria, w których element przesuwa punkt idealny lub antyidealny ponad tolerancję
+    norm_drift: float  # największa względna zmiana normy kryterium po dołączeniu elementu
+    recompute: bool  # czy wynik przybliżony wymaga pełnego przeliczenia rankingu
+
+
+class PlacementIndex:
+    """
+    Gotowy ranking metody topsis z posortowanymi współczynnikami. Hipotetyczny element jest oceniany względem
+    zapamiętanych norm i punktów odniesienia w czasie O(n), a jego pozycja wyszukiwana binarnie w czasie O(log m)
+    """
+
+    def __init__(self, D: List[List[Number]], W_max: Optional[List[bool]], metric: str, W: List[Number],
+                 tolerance: float = SHIFT_TOLERANCE, norm_tolerance: float = NORM_TOLERANCE):
+        """
+        :param D: (List[List[Number]]) : macierz decyzyjna D[n x m]
+        :param W_max: (List[bool]) : wektor maksymalizacji kryteriów (domyślnie każde)
+        :param metric: (str) : nazwa wykorzystywanej metryki
+        :param W: (List[Number]) : wektor wag
+        :param tolerance: (float) : dopuszczalne przesunięcie punktu odniesienia jako ułamek rozstępu kryterium
+        :param norm_tolerance: (float) : dopuszczalna względna zmiana normy kryterium
+        """
+        D = np.asarray(D, dtype=float)
+        self.norms = np.sqrt(np.einsum('ij,ij->i', D, D))  # normy euklidesowe kolumn kryteriów
+        self.cache = topsis_cache(D, W_max, metric, norms=self.norms)
+        self.W = np.asarray(W, dtype=float)[:D.shape[0]]
+        self.c = topsis_scores(self.cache, self.W)[0]
+        self.order = np.argsort(-self.c, kind='stable')  # kolejność rankingu (NaN na końcu)
+        self.ranked = self.c[self.order[:np.count_nonzero(~np.isnan(self.c))]][::-1]  # współczynniki rosnąco
+        self.col_max = D.max(axis=1)
+        self.col_min = D.min(axis=1)
+        self.tolerance = tolerance
+        self.norm_tolerance = norm_tolerance
+
+    def scores(self, X: List[List[Number]]) -> np.ndarray:
+        """
+        Współczynniki skoringowe hipotetycznych elementów bez zmiany rankingu
+        :param X: (List[List[Number]]) : wartości kryteriów elementów [n x q]
+        :return: (np.ndarray) : wektor współczynników
+        """
+        X = np.asarray(X, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            U = X / self.norms[:, None]
+        metric = self.cache.metric
+        d_star = _distance(_distance_parts(U, self.cache.u_ideal, metric), self.W, metric)
+        d_minus = _distance(_distance_parts(U, self.cache.u_anti_ideal, metric), self.W, metric)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return d_minus / (d_minus + d_star)
+
+    def place_many(self, X: List[List[Number]]) -> List[Placement]:
+        """
+        Miejsca wielu hipotetycznych elementów, każdego dołączanego osobno do gotowego rankingu
+        :param X: (List[List[Number]]) : wartości kryteriów elementów [n x q]
+        :return: (List[Placement]) : miejsca elementów
+        """
+        X = np.asarray(X, dtype=float)
+        c = self.scores(X)
+        m = len(self.order)
+        better = len(self.ranked) - np.searchsorted(self.ranked, c, side='right')  # elementy ściśle lepsze
+        better[np.isnan(c)] = m
+        used = (self.W > 0)[:, None]  # kryteria z zerową wagą nie wpływają na współczynniki
+        with np.errstate(divide='ignore', invalid='ignore'):
+            beyond = np.maximum(np.maximum(X - self.col_max[:, None], self.col_min[:, None] - X), 0)
+            shift = np.where(beyond > 0, beyond / (self.col_max - self.col_min)[:, None], 0.0)
+            drift = np.sqrt(1 + np.square(X / self.norms[:, None])) - 1
+        shift = np.where(used, shift, 0.0)
+        drift = np.where(used, np.nan_to_num(drift, nan=np.inf), 0.0).max(axis=0)
+        placements = []
+        for i in range(X.shape[1]):
+            b = int(better[i])
+            shifted = np.flatnonzero(shift[:, i] > self.tolerance).tolist()
+            placements.append(Placement(float(c[i]), b + 1, m + 1, int(self.order[b - 1]) if b > 0 else None,
+                                        int(self.order[b]) if b < m else None, shifted, float(drift[i]),
+                                        bool(shifted) or bool(drift[i] > self.norm_tolerance)))
+        return placements
+
+    def place(self, x: List[Number]) -> Placement:
+        """
+        Miejsce hipotetycznego elementu w gotowym rankingu
+        :param x: (List[Number]) : wartości kryteriów elementu
+        :return: (Placement) : miejsce elementu
+        """
+        return self.place_many(np.asarray(x, dtype=float)[:, None])[0]
+
+
+def load_placement(file_name: Union[str, DataSource], criteria: List[int], metric: str,
+                   weights: Optional[List[float]] = None, filters: Optional[List[Filter]] = None,
+                   constraints: Optional[Constraints] = None) -> Tuple[PlacementIndex, List[str], List[str]]:
+    """
+    Wczytanie danych z pliku i przygotowanie gotowego rankingu metody topsis do zapytań o hipotetyczne elementy
+    :param file_name: (Union[str, DataSource]) : nazwa pliku (.xlsx lub baza SQLite) albo źródło danych
+    :param criteria: (List[int]) : lista wybranych kryteriów
+    :param metric: (str) : nazwa wykorzystywanej metryki
+    :param weights: (List[float]) : lista wag (domyślnie z pliku)
+    :param filters: (List[Filter]) : filtry przekazywane do źródła danych
+    :param constraints: (Constraints) : twarde ograniczenia odrzucające elementy przed wyliczeniem rankingu
+    :return: (Tuple[PlacementIndex, List[str], List[str]]) : gotowy ranking, lista nazw kryteriów (kolejność wartości
+    elementu), lista nazw elementów
+    """
+    D, c_names, items_names, W_file, W_max = load_screened(file_name, criteria, filters, constraints)
+    W = weights if weights else W_file
+    return PlacementIndex(D, W_max, metric, W), c_names, items_names
+
+
+def placement_report(placement: Placement, c_names: List[str], items_names: List[str]) -> str:
+    """
+    Opis miejsca hipotetycznego elementu
+    :param placement: (Placement) : wynik zapytania
+    :param c_names: (List[str]) : lista nazw kryteriów
+    :param items_names: (List[str]) : lista nazw elementów
+    :return: (str) : raport tekstowy
+    """
+    report = 'Współczynnik: {0:1.3f}, pozycja {1} z {2}\n'.format(placement.score, placement.position,
+                                                                 placement.total)
+    if placement.above is not None:
+        report += 'Wyżej: {}\n'.format(items_names[placement.above])
+    if placement.below is not None:
+        report += 'Niżej: {}\n'.format(items_names[placement.below])
+    if placement.shifted:
+        report += 'Element przesuwa punkt idealny lub antyidealny: {}\n'.format(
+            ', '.join(c_names[j] for j in placement.shifted))
+    if placement.recompute:
+        report += 'Wynik przybliżony - zalecane pełne przeliczenie rankingu (zmiana norm do {:.1%})\n'.format(
+            placement.norm_drift)
+    return report